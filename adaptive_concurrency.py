@@ -0,0 +1,263 @@
+"""
+Adaptive (AIMD) concurrency control for the evaluation runners.
+
+With --adaptive_concurrency every stage (answer, judge) gets an AdaptiveConcurrency
+controller that caps its requests in flight. The cap grows additively (about +1
+per `limit` successful requests) while the smoothed success latency stays under
+the latency target, and is cut multiplicatively on 429s and timeouts, at most
+once per cool-down so one burst of errors counts once. A Retry-After hint (HTTP
+header, or a Gemini error's retry_delay block or "retry in Ns") pauses the whole
+stage until it expires; the same hint replaces tenacity's exponential backoff via
+wait_retry_after.
+"""
+
+import re
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterator, AsyncIterator, Optional
+
+# Poll interval for asyncio waiters; API calls take seconds, so this costs nothing noticeable
+ASYNC_POLL_SECONDS = 0.05
+OVERLOAD_STATUS_CODES = (429, 503, 504)
+# "retry in 31.5s", "retryDelay": "31s" (the number must be followed by its unit)
+RETRY_DELAY_PATTERN = re.compile(r"retry(?:[ _-]?delay)?\W{0,4}(?:in|after)?\s*(\d+(?:\.\d+)?) ?(ms|s)\b",
+                                 re.IGNORECASE)
+# The structured protobuf form: retry_delay { seconds: 31 nanos: 500000000 }
+RETRY_DELAY_BLOCK_PATTERN = re.compile(r"retry_delay\s*\{\s*(?:seconds:\s*(\d+))?\s*(?:nanos:\s*(\d+))?\s*\}")
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Server-suggested delay from a Retry-After(-ms) header or a Gemini retry_delay / "retry in Ns" hint."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if headers is not None:
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            try:
+                return max(0.0, float(retry_after_ms) / 1000)
+            except ValueError:
+                pass
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                try:
+                    return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+    message = str(exc)
+    match = RETRY_DELAY_BLOCK_PATTERN.search(message)
+    if match and (match.group(1) or match.group(2)):
+        return int(match.group(1) or 0) + int(match.group(2) or 0) / 1e9
+    match = RETRY_DELAY_PATTERN.search(message)
+    if match is None:
+        return None
+    return float(match.group(1)) / (1000 if match.group(2).lower() == "ms" else 1)
+
+
+def is_overload(exc: BaseException) -> bool:
+    """True for rate-limit (429), overload (503) and timeout errors from any of the clients."""
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    if isinstance(status, int) and status in OVERLOAD_STATUS_CODES:
+        return True
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    name = type(exc).__name__
+    return "RateLimit" in name or "Timeout" in name or name in ("ResourceExhausted", "DeadlineExceeded",
+                                                                "TooManyRequests", "ServiceUnavailable")
+
+
+class wait_retry_after:
+    """tenacity wait: the error's Retry-After when it has one, else the fallback wait."""
+
+    def __init__(self, fallback, max_wait: float = 120.0):
+        self.fallback = fallback
+        self.max_wait = max_wait
+
+    def __call__(self, retry_state) -> float:
+        exc = retry_state.outcome.exception() if retry_state.outcome is not None else None
+        retry_after = retry_after_seconds(exc) if exc is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_wait)
+        return self.fallback(retry_state)
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on requests in flight for one stage, shared by threads and coroutines."""
+
+    def __init__(self, name: str, initial: int, max_limit: int, min_limit: int = 1,
+                 latency_target: Optional[float] = None, latency_tolerance: float = 2.0,
+                 decrease_factor: float = 0.5, logger: Optional[logging.Logger] = None):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self._limit = float(min(self.max_limit, max(self.min_limit, initial)))
+        self.latency_target = latency_target
+        self.latency_tolerance = latency_tolerance
+        self.decrease_factor = decrease_factor
+        self.logger = logger or logging.getLogger(__name__)
+        self._condition = threading.Condition()
+        self.in_flight = 0
+        self.smoothed_latency: Optional[float] = None
+        self.best_latency: Optional[float] = None
+        self._paused_until = 0.0
+        self._cooldown_until = 0.0
+        self.successes = 0
+        self.overloads = 0
+        self.decreases = 0
+        self.peak_limit = int(self._limit)
+        self.lowest_limit = int(self._limit)
+        self.slot_wait_seconds = 0.0
+        self.retry_after_pause_seconds = 0.0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def _target(self) -> Optional[float]:
+        if self.latency_target:
+            return self.latency_target
+        return self.best_latency * self.latency_tolerance if self.best_latency is not None else None
+
+    def _try_acquire(self) -> float:
+        """Take a slot and return 0, or return how long to wait before trying again (lock held)."""
+        pause = self._paused_until - time.time()
+        if pause > 0:
+            return pause
+        if self.in_flight < self.limit:
+            self.in_flight += 1
+            return 0.0
+        return ASYNC_POLL_SECONDS
+
+    def acquire(self) -> float:
+        """Block until a request may be sent; return the seconds waited."""
+        started = time.perf_counter()
+        with self._condition:
+            while True:
+                wait = self._try_acquire()
+                if wait == 0:
+                    break
+                self._condition.wait(timeout=wait)
+            waited = time.perf_counter() - started
+            self.slot_wait_seconds += waited
+        return waited
+
+    async def acquire_async(self) -> float:
+        """Asyncio variant of acquire that does not block the event loop."""
+        started = time.perf_counter()
+        while True:
+            with self._condition:
+                wait = self._try_acquire()
+                if wait == 0:
+                    waited = time.perf_counter() - started
+                    self.slot_wait_seconds += waited
+                    return waited
+            await asyncio.sleep(min(wait, 1.0))
+
+    def release(self, latency: Optional[float] = None, error: Optional[BaseException] = None):
+        """Free the slot and adapt the limit to how the request went."""
+        with self._condition:
+            self.in_flight -= 1
+            previous = self.limit
+            if error is None and latency is not None:
+                self._on_success(latency)
+            elif error is not None and is_overload(error):
+                self._on_overload(retry_after_seconds(error))
+            self._condition.notify_all()
+            current = self.limit
+        if current > previous:
+            self.logger.info(f"🔺 {self.name} concurrency {previous} → {current}")
+        elif current < previous:
+            self.logger.warning(f"🔻 {self.name} concurrency {previous} → {current} after "
+                                f"{type(error).__name__}")
+
+    def _on_success(self, latency: float):
+        self.successes += 1
+        self.smoothed_latency = latency if self.smoothed_latency is None else (
+            0.8 * self.smoothed_latency + 0.2 * latency)
+        self.best_latency = self.smoothed_latency if self.best_latency is None else min(
+            self.best_latency, self.smoothed_latency)
+        target = self._target()
+        if target is None or self.smoothed_latency <= target:
+            self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+            self.peak_limit = max(self.peak_limit, self.limit)
+
+    def _on_overload(self, retry_after: Optional[float]):
+        self.overloads += 1
+        now = time.time()
+        if retry_after:
+            self.retry_after_pause_seconds += max(0.0, now + retry_after - max(now, self._paused_until))
+            self._paused_until = max(self._paused_until, now + retry_after)
+        if now < self._cooldown_until:
+            return
+        self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+        self.decreases += 1
+        self.lowest_limit = min(self.lowest_limit, self.limit)
+        # Requests already in flight were sent at the old limit; let them drain before cutting again
+        self._cooldown_until = now + max(retry_after or 0.0, self.smoothed_latency or 1.0)
+
+    @contextmanager
+    def slot(self) -> Iterator[float]:
+        """Hold a slot for one API attempt; yields the seconds spent waiting for it."""
+        waited = self.acquire()
+        started = time.perf_counter()
+        try:
+            yield waited
+        except BaseException as e:
+            self.release(error=e)
+            raise
+        self.release(latency=time.perf_counter() - started)
+
+    @asynccontextmanager
+    async def slot_async(self) -> AsyncIterator[float]:
+        """Asyncio variant of slot."""
+        waited = await self.acquire_async()
+        started = time.perf_counter()
+        try:
+            yield waited
+        except BaseException as e:
+            self.release(error=e)
+            raise
+        self.release(latency=time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        """Summary of controller activity for run metadata."""
+        with self._condition:
+            return {
+                "limit": self.limit,
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "peak_limit": self.peak_limit,
+                "lowest_limit": self.lowest_limit,
+                "successes": self.successes,
+                "overloads": self.overloads,
+                "decreases": self.decreases,
+                "smoothed_latency_seconds": self.smoothed_latency,
+                "latency_target_seconds": self._target(),
+                "slot_wait_seconds": self.slot_wait_seconds,
+                "retry_after_pause_seconds": self.retry_after_pause_seconds
+            }
+
+
+@contextmanager
+def concurrency_slot(controller: Optional[AdaptiveConcurrency]) -> Iterator[float]:
+    """controller.slot(), or a no-op yielding 0 when adaptive concurrency is off."""
+    if controller is None:
+        yield 0.0
+        return
+    with controller.slot() as waited:
+        yield waited
+
+
+@asynccontextmanager
+async def concurrency_slot_async(controller: Optional[AdaptiveConcurrency]) -> AsyncIterator[float]:
+    """Asyncio variant of concurrency_slot."""
+    if controller is None:
+        yield 0.0
+        return
+    async with controller.slot_async() as waited:
+        yield waited
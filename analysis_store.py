@@ -0,0 +1,145 @@
+"""
+Columnar on-disk store for the performance analyzer's comprehensive analysis data.
+
+The analysis dataframe is split by what it depends on:
+- question_features.parquet: one row per question with its dataset, decomposition,
+  operator and token-count features. Operator lists are stored as list<dictionary<string>>
+  columns rather than Python reprs. Each row carries the hash of the inputs it was
+  computed from (input_hash), and the file metadata records the fingerprints of the
+  source files (sources), so the analyzer recomputes only questions that are new or
+  whose inputs changed.
+- scores/<run>.parquet: one row per scored question of one results file
+  (judge_score, precision, recall, f1_score).
+
+Adding a new model's results only writes its score file. Readers load just the columns
+they need with load_analysis().
+"""
+
+import os
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+FEATURES_FILE = "question_features.parquet"
+SCORES_DIR = "scores"
+
+# Column order of comprehensive_analysis_data
+ANALYSIS_COLUMNS = [
+    "question", "ex_num", "judge_score", "precision", "recall", "f1_score", "num_docs",
+    "cumulative_context_tokens", "cumulative_context_words", "question_tokens",
+    "num_intermediate_answers", "operators", "unique_operators", "num_operators",
+    "num_unique_operators", "count_aggregate", "count_group", "count_filter", "count_arithmetic",
+    "count_comparison", "count_boolean", "count_qa_model", "count_total_ops", "num_decomp_steps",
+    "num_subquestions", "gpt5_score", "gemini25_pro_score", "gemini25_flash_score",
+]
+SCORE_COLUMNS = ["judge_score", "precision", "recall", "f1_score"]
+FEATURE_COLUMNS = [c for c in ANALYSIS_COLUMNS if c not in SCORE_COLUMNS]
+LIST_COLUMNS = ("operators", "unique_operators")
+INPUT_HASH_COLUMN = "input_hash"
+
+# Column types, explicit so every write has the same schema (missing ex_num, operator categories)
+FLOAT_COLUMNS = ("judge_score", "precision", "recall", "f1_score",
+                 "gpt5_score", "gemini25_pro_score", "gemini25_flash_score")
+LIST_TYPE = pa.list_(pa.dictionary(pa.int32(), pa.string()))
+COLUMN_TYPES = {
+    c: pa.string() if c in ("question", INPUT_HASH_COLUMN) else LIST_TYPE if c in LIST_COLUMNS
+    else pa.float64() if c in FLOAT_COLUMNS else pa.int64()
+    for c in ANALYSIS_COLUMNS + [INPUT_HASH_COLUMN]
+}
+
+
+def _to_table(rows: List[Dict[str, Any]], columns: List[str],
+              metadata: Optional[Dict[str, str]] = None) -> pa.Table:
+    arrays = [pa.array([row.get(c) for row in rows], type=COLUMN_TYPES[c]) for c in columns]
+    table = pa.Table.from_arrays(arrays, names=columns)
+    return table.replace_schema_metadata(metadata) if metadata else table
+
+
+def _write_table(table: pa.Table, path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_file = path + ".tmp"
+    pq.write_table(table, tmp_file)
+    os.replace(tmp_file, path)
+
+
+def _read_frame(path: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Parquet file as a dataframe with only the requested (existing) columns; lists as Python lists."""
+    if columns is not None:
+        available = set(pq.read_schema(path).names)
+        columns = [c for c in columns if c in available]
+    df = pq.read_table(path, columns=columns).to_pandas()
+    for column in LIST_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].map(list)
+    return df
+
+
+class AnalysisStore:
+    """Question features and per-run score tables under one directory."""
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        self.features_file = os.path.join(store_dir, FEATURES_FILE)
+        self.scores_dir = os.path.join(store_dir, SCORES_DIR)
+
+    def scores_file(self, run_name: str) -> str:
+        return os.path.join(self.scores_dir, f"{run_name}.parquet")
+
+    def runs(self) -> List[str]:
+        """Names of the runs with stored scores."""
+        if not os.path.isdir(self.scores_dir):
+            return []
+        return sorted(f[:-len(".parquet")] for f in os.listdir(self.scores_dir) if f.endswith(".parquet"))
+
+    def load_features(self, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Stored question features and their input hashes (empty if none were stored yet)."""
+        if not os.path.exists(self.features_file):
+            return pd.DataFrame(columns=list(columns) if columns is not None else FEATURE_COLUMNS)
+        if columns is not None:
+            columns = ["question"] + [c for c in columns if c != "question"]
+        return _read_frame(self.features_file, columns)
+
+    def sources(self) -> Optional[Dict[str, Any]]:
+        """Source file fingerprints the stored features were last validated against."""
+        if not os.path.exists(self.features_file):
+            return None
+        metadata = pq.read_schema(self.features_file).metadata or {}
+        return json.loads(metadata[b"sources"]) if b"sources" in metadata else None
+
+    def update_features(self, rows: List[Dict[str, Any]], sources: Dict[str, Any], remove: Iterable[str] = ()):
+        """Insert or replace feature rows, drop the questions in remove and record the source fingerprints."""
+        replaced = {row["question"] for row in rows} | set(remove)
+        table = _to_table(rows, FEATURE_COLUMNS + [INPUT_HASH_COLUMN], {"sources": json.dumps(sources)})
+        if os.path.exists(self.features_file):
+            stored = pq.read_table(self.features_file)
+            if INPUT_HASH_COLUMN not in stored.column_names:
+                # Store written before input hashes: every row is revalidated and rewritten
+                stored = stored.append_column(INPUT_HASH_COLUMN, pa.nulls(len(stored), pa.string()))
+            stored = stored.filter(pc.invert(pc.is_in(stored["question"], pa.array(list(replaced), pa.string()))))
+            table = pa.concat_tables([stored.select(table.column_names).cast(table.schema), table])
+            table = table.replace_schema_metadata({"sources": json.dumps(sources)})
+        _write_table(table, self.features_file)
+
+    def write_scores(self, run_name: str, rows: List[Dict[str, Any]], results_file: str = ""):
+        """Replace the score table of a run."""
+        _write_table(_to_table(rows, ["question"] + SCORE_COLUMNS, {"results_file": results_file}),
+                     self.scores_file(run_name))
+
+    def load(self, run_name: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """One run's scores joined with the question features, reading only the requested columns."""
+        columns = list(columns) if columns is not None else ANALYSIS_COLUMNS
+        scores = _read_frame(self.scores_file(run_name), ["question"] + [c for c in columns if c in SCORE_COLUMNS])
+        feature_columns = [c for c in columns if c in FEATURE_COLUMNS and c != "question"]
+        df = scores
+        if feature_columns:
+            df = scores.merge(self.load_features(feature_columns), on="question", how="left")
+        return df[[c for c in columns if c in df.columns]]
+
+
+def load_analysis(store_dir: str, run_name: str, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Comprehensive analysis data of one run from an analysis store."""
+    return AnalysisStore(store_dir).load(run_name, columns)
@@ -0,0 +1,269 @@
+"""
+Provider Batch API submission for offline judge runs (--mode batch).
+
+Instead of one rate-limited API call per request, every request is written as a line
+of a batch-input JSONL ({"custom_id", "method", "url", "body"}) and submitted as a
+batch job. The provider runs the job within its completion window on a separate,
+larger quota at a discount. BatchRunner polls the jobs until they finish and maps
+their output lines back to requests by custom_id.
+
+Submitted batch ids and every collected output line are kept in a state directory.
+An interrupted run resumes by polling the batches it already submitted and only
+submits requests that have no successful output yet.
+
+Backends:
+- "openai": the Files + Batches API (any compatible --base_url that implements it)
+- "local": a file-based stand-in that runs each batch line through the chat
+  completions client itself when polled, for offline runs against mock_llm_server.py
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+import openai
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+# Provider limit on requests per batch input file
+BATCH_MAX_REQUESTS = 50000
+BATCH_BACKENDS = ("openai", "local")
+
+
+def batch_request(custom_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    """One batch-input line for a chat completion request."""
+    return {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+
+@dataclass
+class BatchOutput:
+    """Response text and usage of one batch request, or the error it failed with."""
+    custom_id: str
+    content: Optional[str] = None
+    usage: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.content is not None
+
+
+def parse_output_line(line: Dict[str, Any]) -> BatchOutput:
+    """BatchOutput from one line of a batch output or error file."""
+    custom_id = line["custom_id"]
+    response = line.get("response") or {}
+    body = response.get("body") or {}
+    if line.get("error") or response.get("status_code") != 200:
+        error = line.get("error") or body.get("error") or f"HTTP {response.get('status_code')}"
+        return BatchOutput(custom_id, error=error.get("message", str(error)) if isinstance(error, dict) else str(error))
+    try:
+        content = body["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        return BatchOutput(custom_id, error="response has no message content")
+    return BatchOutput(custom_id, content=content, usage=body.get("usage"))
+
+
+class OpenAIBatchBackend:
+    """Batch jobs through the OpenAI Files and Batches API."""
+
+    def __init__(self, client: openai.OpenAI, completion_window: str = "24h"):
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, input_file: str) -> str:
+        with open(input_file, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(input_file_id=uploaded.id, endpoint=BATCH_ENDPOINT,
+                                           completion_window=self.completion_window)
+        return batch.id
+
+    def poll(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def outputs(self, batch_id: str) -> Iterator[Dict[str, Any]]:
+        batch = self.client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                for line in self.client.files.content(file_id).text.splitlines():
+                    if line.strip():
+                        yield json.loads(line)
+
+
+class LocalBatchBackend:
+    """File-based stand-in: each batch is a directory, run line by line through the client when first polled."""
+
+    def __init__(self, client: openai.OpenAI, root: str):
+        self.client = client
+        self.root = root
+
+    def _batch_dir(self, batch_id: str) -> str:
+        return os.path.join(self.root, batch_id)
+
+    def submit(self, input_file: str) -> str:
+        batch_id = f"local_batch_{uuid.uuid4().hex[:12]}"
+        os.makedirs(self._batch_dir(batch_id))
+        os.replace(input_file, os.path.join(self._batch_dir(batch_id), "input.jsonl"))
+        return batch_id
+
+    def poll(self, batch_id: str) -> str:
+        output_file = os.path.join(self._batch_dir(batch_id), "output.jsonl")
+        if not os.path.exists(output_file):
+            self._run(batch_id, output_file)
+        return "completed"
+
+    def _run(self, batch_id: str, output_file: str):
+        with open(os.path.join(self._batch_dir(batch_id), "input.jsonl"), encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        lines = []
+        for i, request in enumerate(requests):
+            line = {"id": f"{batch_id}_req_{i}", "custom_id": request["custom_id"], "response": None, "error": None}
+            try:
+                completion = self.client.chat.completions.create(**request["body"])
+                line["response"] = {"status_code": 200, "body": completion.model_dump()}
+            except openai.APIStatusError as e:
+                line["response"] = {"status_code": e.status_code, "body": {"error": {"message": str(e)}}}
+            except openai.APIError as e:
+                line["error"] = {"code": type(e).__name__, "message": str(e)}
+            lines.append(json.dumps(line, ensure_ascii=False))
+        tmp_file = output_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_file, output_file)
+
+    def outputs(self, batch_id: str) -> Iterator[Dict[str, Any]]:
+        with open(os.path.join(self._batch_dir(batch_id), "output.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def make_batch_backend(name: str, client: openai.OpenAI, state_dir: str):
+    if name not in BATCH_BACKENDS:
+        raise ValueError(f"Unknown batch backend: {name} (expected one of {BATCH_BACKENDS})")
+    if name == "local":
+        return LocalBatchBackend(client, os.path.join(state_dir, "local_batches"))
+    return OpenAIBatchBackend(client)
+
+
+class BatchRunner:
+    """Submit requests as batch jobs, wait for them and collect outputs by custom_id, resumably."""
+
+    def __init__(self, backend, state_dir: str, poll_interval: float = 60.0,
+                 max_requests_per_batch: int = BATCH_MAX_REQUESTS, logger: Optional[logging.Logger] = None):
+        self.backend = backend
+        self.state_dir = state_dir
+        self.poll_interval = poll_interval
+        self.max_requests_per_batch = max_requests_per_batch
+        self.logger = logger or logging.getLogger(__name__)
+        self.state_file = os.path.join(state_dir, "batches.json")
+        self.outputs_file = os.path.join(state_dir, "outputs.jsonl")
+        os.makedirs(state_dir, exist_ok=True)
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.state_file):
+            with open(self.state_file, encoding="utf-8") as f:
+                self.batches = json.load(f)["batches"]
+        self.submitted_requests = 0
+        self.reused_outputs = 0
+        self.resumed_batches = 0
+        self.failed_requests = 0
+        self.wait_seconds = 0.0
+
+    def _save_state(self):
+        tmp_file = self.state_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"batches": self.batches}, f, indent=2)
+        os.replace(tmp_file, self.state_file)
+
+    def _load_outputs(self) -> Dict[str, BatchOutput]:
+        """Successful outputs collected by earlier runs; failed requests are submitted again."""
+        outputs = {}
+        if os.path.exists(self.outputs_file):
+            with open(self.outputs_file, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        output = parse_output_line(json.loads(line))
+                    except (json.JSONDecodeError, KeyError):
+                        continue  # torn line from an interrupted run
+                    if output.ok:
+                        outputs[output.custom_id] = output
+        return outputs
+
+    def _submit(self, requests: List[Dict[str, Any]]):
+        for start in range(0, len(requests), self.max_requests_per_batch):
+            chunk = requests[start:start + self.max_requests_per_batch]
+            input_file = os.path.join(self.state_dir, f"input_{len(self.batches)}.jsonl")
+            with open(input_file, "w", encoding="utf-8") as f:
+                for request in chunk:
+                    f.write(json.dumps(request, ensure_ascii=False) + "\n")
+            batch_id = self.backend.submit(input_file)
+            self.batches[batch_id] = {"custom_ids": [r["custom_id"] for r in chunk], "status": "submitted",
+                                      "collected": False, "submitted_at": time.time()}
+            self._save_state()
+            self.submitted_requests += len(chunk)
+            self.logger.info(f"📤 Submitted batch {batch_id} with {len(chunk)} requests")
+
+    def _collect(self, batch_id: str, status: str, outputs: Dict[str, BatchOutput]):
+        custom_ids = set(self.batches[batch_id]["custom_ids"])
+        with open(self.outputs_file, "a", encoding="utf-8") as f:
+            for line in self.backend.outputs(batch_id):
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+                output = parse_output_line(line)
+                outputs[output.custom_id] = output
+                custom_ids.discard(output.custom_id)
+        # Requests of an expired or cancelled batch may have no output line at all
+        for custom_id in custom_ids:
+            outputs[custom_id] = BatchOutput(custom_id, error=f"batch {batch_id} {status} without output")
+        self.batches[batch_id].update(status=status, collected=True)
+        self._save_state()
+        self.logger.info(f"📥 Batch {batch_id} {status}: collected {len(self.batches[batch_id]['custom_ids'])} requests")
+
+    def run(self, requests: List[Dict[str, Any]]) -> Dict[str, BatchOutput]:
+        """Outputs for the given batch-input lines, by custom_id; reuses outputs and batches of earlier runs."""
+        outputs = self._load_outputs()
+        pending = {batch_id for batch_id, batch in self.batches.items() if not batch["collected"]}
+        in_flight = {custom_id for batch_id in pending for custom_id in self.batches[batch_id]["custom_ids"]}
+        self.reused_outputs = sum(1 for r in requests if r["custom_id"] in outputs)
+        self.resumed_batches = len(pending)
+        if outputs or pending:
+            self.logger.info(f"♻️  Resuming: {self.reused_outputs} outputs already collected, "
+                             f"{len(pending)} batches still pending")
+        self._submit([r for r in requests if r["custom_id"] not in outputs and r["custom_id"] not in in_flight])
+
+        started = time.perf_counter()
+        while True:
+            pending = [batch_id for batch_id, batch in self.batches.items() if not batch["collected"]]
+            for batch_id in pending:
+                status = self.backend.poll(batch_id)
+                if status in BATCH_FINAL_STATUSES:
+                    self._collect(batch_id, status, outputs)
+                elif status != self.batches[batch_id]["status"]:
+                    self.batches[batch_id]["status"] = status
+                    self._save_state()
+                    self.logger.info(f"⏳ Batch {batch_id}: {status}")
+            if not any(not batch["collected"] for batch in self.batches.values()):
+                break
+            time.sleep(self.poll_interval)
+        self.wait_seconds = time.perf_counter() - started
+
+        results = {}
+        for request in requests:
+            custom_id = request["custom_id"]
+            results[custom_id] = outputs.get(custom_id) or BatchOutput(custom_id, error="no output collected")
+        self.failed_requests = sum(1 for output in results.values() if not output.ok)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch activity for run metadata."""
+        return {
+            "state_dir": self.state_dir,
+            "batches": len(self.batches),
+            "resumed_batches": self.resumed_batches,
+            "submitted_requests": self.submitted_requests,
+            "reused_outputs": self.reused_outputs,
+            "failed_requests": self.failed_requests,
+            "wait_seconds": self.wait_seconds
+        }
@@ -0,0 +1,130 @@
+"""
+Batched LLM-as-judge helpers.
+
+Instead of one judge request per question, several (question, response,
+correct_answer) items are packed into a single batched_llm_judge_prompt, so the
+judging instructions are sent once per batch. The model answers with one
+"=== JUDGMENT <n> ===" section per item; each section uses the same fields as the
+single/multi judge prompts and is scored with compute_llm_judge_score_V2. Items
+whose section is missing or malformed come back as None so the caller can
+re-judge them one at a time.
+"""
+
+import os
+import re
+import sys
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompts'))
+
+from prompts.answer_judgement_prompt_V2 import batched_llm_judge_prompt, batched_llm_judge_item
+from prompts.evaluate_final_answers import compute_llm_judge_score_V2
+
+# (question, response, correct_answer, gold_answers_length)
+JudgeItem = Tuple[str, str, str, int]
+
+JUDGMENT_HEADER_PATTERN = re.compile(r"^\s*=+\s*JUDGMENT\s+(\d+)\s*=+\s*$", re.MULTILINE | re.IGNORECASE)
+FINAL_PRECISION_PATTERN = re.compile(r"final[ _]precision:[ \t]*-?\d+(?:\.\d+)?[ \t]*$", re.MULTILINE)
+
+# Completion tokens budgeted per item, matching the single-item judge's max_tokens
+JUDGE_TOKENS_PER_ITEM = 500
+
+
+def chunked(items: Sequence[Any], size: int) -> Iterator[List[Any]]:
+    """Yield consecutive chunks of at most size items."""
+    size = max(1, size)
+    for start in range(0, len(items), size):
+        yield list(items[start:start + size])
+
+
+def build_batched_judge_prompt(items: Sequence[JudgeItem]) -> str:
+    """Pack several judge items into one batched_llm_judge_prompt."""
+    item_blocks = [
+        batched_llm_judge_item.format(
+            item_number=i + 1,
+            item_type="single" if gold_answers_length == 1 else "multi",
+            question=question,
+            response=response,
+            correct_answer=correct_answer
+        )
+        for i, (question, response, correct_answer, gold_answers_length) in enumerate(items)
+    ]
+    return batched_llm_judge_prompt.format(num_items=len(items), items="\n".join(item_blocks))
+
+
+def split_batched_judgment(judgment: str) -> Dict[int, str]:
+    """Map item number -> that item's judgment text."""
+    headers = list(JUDGMENT_HEADER_PATTERN.finditer(judgment))
+    sections = {}
+    for i, header in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(judgment)
+        item_number = int(header.group(1))
+        if item_number not in sections:
+            sections[item_number] = judgment[header.end():end].strip()
+    return sections
+
+
+def score_item_judgment(item_judgment: str, gold_answers_length: int) -> Optional[Dict[str, Any]]:
+    """Score one item's judgment, or None if it does not have the expected fields."""
+    if gold_answers_length == 1 and not FINAL_PRECISION_PATTERN.search(item_judgment):
+        return None
+    # compute_llm_judge_score_V2 looks for multi-answer fields after a newline
+    try:
+        scores = compute_llm_judge_score_V2("\n" + item_judgment, gold_answers_length)
+    except (ValueError, IndexError):
+        return None
+    return scores
+
+
+def parse_batched_judgment(judgment: str, gold_answers_lengths: Sequence[int]) -> List[Optional[Dict[str, Any]]]:
+    """Per-item evaluations ({"judgment", "scores"}) in item order; None for items that failed to parse."""
+    sections = split_batched_judgment(judgment)
+    evaluations = []
+    for i, gold_answers_length in enumerate(gold_answers_lengths):
+        item_judgment = sections.get(i + 1)
+        scores = score_item_judgment(item_judgment, gold_answers_length) if item_judgment else None
+        if scores is None:
+            evaluations.append(None)
+            continue
+        evaluations.append({
+            "judgment": item_judgment,
+            "scores": scores,
+            "judged_by": f"batch:{len(gold_answers_lengths)}"
+        })
+    return evaluations
+
+
+class BatchJudgeStats:
+    """Thread-safe counters for batched judging, for run metadata."""
+
+    def __init__(self, batch_size: int):
+        self._lock = threading.Lock()
+        self.batch_size = batch_size
+        self.batched_requests = 0
+        self.batched_items = 0
+        self.single_fallbacks = 0
+        self.unbatched_items = 0
+
+    def record_batch(self, items: int, failed: int):
+        """A batch request of items answers, failed of which were not parsed and are re-judged singly."""
+        with self._lock:
+            self.batched_requests += 1
+            self.batched_items += items - failed
+            self.single_fallbacks += failed
+
+    def record_unbatched(self):
+        """An answer judged on its own because no other answer was left to batch it with."""
+        with self._lock:
+            self.unbatched_items += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "judge_batch_size": self.batch_size,
+                "batched_requests": self.batched_requests,
+                "batched_items": self.batched_items,
+                "single_fallbacks": self.single_fallbacks,
+                "unbatched_items": self.unbatched_items
+            }
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Conformance check and timing for the compiled QDMR operator classifier.
+
+Classifies every decomposition step of the dataset with identify_operation (compiled
+grammars, cached) and with identify_operation_by_predicates (the is_* reference
+predicates), reports any step where they disagree and exits non-zero if there is one.
+Also times both, and the batch API with a cold and a warm cache.
+
+Usage:
+    python benchmarks/bench_operation_identifier.py --qa_file monaco_version_1_release.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import Counter
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_ROOT)
+
+import operation_identifier
+from decomposition_utils import decomposition_to_steps
+from operation_identifier import identify_operation, identify_operations, identify_operation_by_predicates
+
+
+def dataset_steps(qa_file):
+    with open(qa_file, encoding="utf-8") as f:
+        dataset = json.load(f)
+    steps = []
+    for example in dataset.values():
+        decomposition = example.get("decomposition", [])
+        steps += decomposition_to_steps(decomposition) if isinstance(decomposition, str) else decomposition
+    return steps
+
+
+def timed(fn, steps):
+    started = time.perf_counter()
+    result = fn(steps)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conformance check and timing for identify_operation")
+    parser.add_argument("--qa_file", default=os.path.join(REPO_ROOT, "monaco_version_1_release.json"))
+    parser.add_argument("--show", type=int, default=20, help="Mismatching steps to print")
+    args = parser.parse_args()
+
+    steps = dataset_steps(args.qa_file)
+    print(f"📖 {len(steps)} decomposition steps ({len(set(steps))} unique) from {args.qa_file}")
+
+    reference, reference_seconds = timed(lambda s: [identify_operation_by_predicates(x) for x in s], steps)
+    operation_identifier._classify.cache_clear()
+    compiled, cold_seconds = timed(identify_operations, steps)
+    _, warm_seconds = timed(identify_operations, steps)
+    single = [identify_operation(step) for step in steps]
+
+    mismatches = [(step, ref, new) for step, ref, new, one in zip(steps, reference, compiled, single)
+                  if not ref == new == one]
+    print(f"⏱️  reference predicates: {reference_seconds * 1000:.1f} ms")
+    print(f"⏱️  identify_operations (cold cache): {cold_seconds * 1000:.1f} ms "
+          f"({reference_seconds / max(cold_seconds, 1e-9):.1f}x)")
+    print(f"⏱️  identify_operations (warm cache): {warm_seconds * 1000:.1f} ms")
+    print(f"📊 Operations: {dict(Counter(op or 'qa_model' for op in compiled).most_common())}")
+
+    if mismatches:
+        print(f"❌ {len(mismatches)} steps classified differently:")
+        for step, ref, new in mismatches[:args.show]:
+            print(f"   {step!r}: reference={ref} compiled={new}")
+        sys.exit(1)
+    print("✅ Compiled classifier agrees with the reference predicates on every step")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmark for the Oracle evaluation runners.
+
+Drives the full answer -> judge -> checkpoint -> output path of
+run_oracle_retrieval_scalable.py and run_gemini_oracle.py against in-process fake
+OpenAI/Gemini clients with simulated latency (judge replies come from
+mock_llm_server.generate_reply, so they parse like real ones). Every configuration
+in the matrix runs in its own subprocess so peak RSS and I/O are measured per run,
+and the results are written as JSON for comparison across commits.
+
+Usage:
+    python benchmarks/bench_pipeline.py --questions 200 --workers 4 16 --engines batch pipeline \\
+        --checkpoint_modes json journal --latency_ms 200 --output benchmarks/results/latest.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import itertools
+import resource
+import subprocess
+import tempfile
+import types
+from typing import Any, Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_ROOT)
+sys.path.append(os.path.join(REPO_ROOT, 'prompts'))
+
+from rate_limiter import estimate_tokens
+from mock_llm_server import MockConfig, generate_reply
+from prompts.retrieval_augmented_setup import DocumentStore
+
+RUNNERS = ("scalable", "gemini")
+RUNNER_ENGINES = {"scalable": ("batch", "pipeline", "async"), "gemini": ("batch", "pipeline")}
+
+
+class FakeLatency:
+    """Lognormal latency around latency_ms, shared by the fake clients."""
+
+    def __init__(self, latency_ms: float, spread: float, seed: int):
+        self.latency_ms = latency_ms
+        self.spread = spread
+        self.rng = random.Random(seed)
+        self.mock_config = MockConfig(seed=seed)
+
+    def sample(self) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        return self.latency_ms / 1000 * self.rng.lognormvariate(0, self.spread)
+
+    def reply(self, prompt: str) -> str:
+        return generate_reply(prompt, self.mock_config, self.rng)
+
+
+def chat_completion(prompt: str, reply: str):
+    usage = types.SimpleNamespace(prompt_tokens=estimate_tokens(prompt), completion_tokens=estimate_tokens(reply))
+    usage.total_tokens = usage.prompt_tokens + usage.completion_tokens
+    message = types.SimpleNamespace(content=reply, role="assistant")
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=usage)
+
+
+class FakeOpenAI:
+    """Stands in for openai.OpenAI: chat.completions.create sleeps and returns a canned completion."""
+
+    def __init__(self, latency: FakeLatency):
+        self.latency = latency
+        self.chat = types.SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        prompt = kwargs["messages"][0]["content"]
+        time.sleep(self.latency.sample())
+        return chat_completion(prompt, self.latency.reply(prompt))
+
+
+class FakeAsyncOpenAI(FakeOpenAI):
+    """Stands in for openai.AsyncOpenAI."""
+
+    async def create(self, **kwargs):
+        prompt = kwargs["messages"][0]["content"]
+        await asyncio.sleep(self.latency.sample())
+        return chat_completion(prompt, self.latency.reply(prompt))
+
+    async def close(self):
+        pass
+
+
+class FakeGemini:
+    """Stands in for genai.GenerativeModel."""
+
+    model_name = "models/gemini-fake"
+
+    def __init__(self, latency: FakeLatency):
+        self.latency = latency
+
+    def generate_content(self, prompt, generation_config=None, **kwargs):
+        time.sleep(self.latency.sample())
+        reply = self.latency.reply(prompt)
+        usage = types.SimpleNamespace(total_token_count=estimate_tokens(prompt) + estimate_tokens(reply))
+        return types.SimpleNamespace(text=reply, usage_metadata=usage)
+
+
+def write_dataset(work_dir: str, qa_file: str, questions: int, docs_per_question: int, doc_chars: int):
+    """Write a QA file with the first N MoNaCo questions and synthetic Oracle documents for them."""
+    with open(qa_file, "r", encoding="utf-8") as f:
+        qa_data = json.load(f)
+    selected = list(qa_data)[:questions]
+    qa_path = os.path.join(work_dir, "qa.json")
+    docs_path = os.path.join(work_dir, "docs.json")
+    with open(qa_path, "w", encoding="utf-8") as f:
+        json.dump({q: qa_data[q] for q in selected}, f)
+    filler = ("lorem ipsum dolor sit amet " * (doc_chars // 27 + 1))[:doc_chars]
+    with open(docs_path, "w", encoding="utf-8") as f:
+        json.dump({q: [{"section_path": f"Article {i} >> Section {j}", "text": f"{q} {filler}"}
+                       for j in range(docs_per_question)] for i, q in enumerate(selected)}, f)
+    return qa_path, docs_path
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def read_io_counters() -> Dict[str, int]:
+    """Bytes written by this process (Linux /proc/self/io; empty elsewhere)."""
+    try:
+        with open("/proc/self/io", "r") as f:
+            return {k: int(v) for k, v in (line.split(": ") for line in f.read().splitlines())}
+    except OSError:
+        return {}
+
+
+def run_single(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one benchmark configuration in this process and return its metrics."""
+    work_dir = params["work_dir"]
+    os.chdir(work_dir)
+    qa_path, docs_path = params["qa_path"], params["docs_path"]
+    output_file = os.path.join(work_dir, "output.json")
+    checkpoint_file = os.path.join(work_dir, "checkpoint.json" if params["checkpoint_mode"] == "json"
+                                   else "checkpoint.jsonl")
+    latency = FakeLatency(params["latency_ms"], params["latency_spread"], params["seed"])
+
+    if params["runner"] == "scalable":
+        import run_oracle_retrieval_scalable as runner
+        runner.setup_openai_client = lambda *args, **kwargs: FakeOpenAI(latency)
+        runner.setup_async_openai_client = lambda *args, **kwargs: FakeAsyncOpenAI(latency)
+        config = runner.EvaluationConfig(qa_file=qa_path, oracle_docs_file=docs_path, api_key="fake")
+    else:
+        import run_gemini_oracle as runner
+        runner.setup_clients = lambda config: (FakeOpenAI(latency), FakeGemini(latency))
+        config = runner.EvaluationConfig(qa_file=qa_path, oracle_docs_file=docs_path,
+                                         openai_api_key="fake", google_api_key="fake")
+    config.output_file = output_file
+    config.checkpoint_file = checkpoint_file
+    config.engine = params["engine"]
+    config.max_workers = config.answer_workers = config.judge_workers = params["workers"]
+    config.checkpoint_interval = params["checkpoint_interval"]
+    config.checkpoint_mode = params["checkpoint_mode"]
+    config.requests_per_minute = config.answer_requests_per_minute = config.judge_requests_per_minute = 10 ** 9
+    config.burst = 10 ** 6
+
+    # Per-question latency: first answer call to result built, across all engines
+    started, finished = {}, {}
+    for name in ("answer_single_question", "answer_single_question_async"):
+        original = getattr(runner, name, None)
+        if original is None:
+            continue
+        if asyncio.iscoroutinefunction(original):
+            async def timed(question, *args, _original=original, **kwargs):
+                started.setdefault(question, time.perf_counter())
+                return await _original(question, *args, **kwargs)
+        else:
+            def timed(question, *args, _original=original, **kwargs):
+                started.setdefault(question, time.perf_counter())
+                return _original(question, *args, **kwargs)
+        setattr(runner, name, timed)
+    original_build_result = runner.build_result
+
+    def timed_build_result(answer, *args, **kwargs):
+        finished[answer["question"]] = time.perf_counter()
+        return original_build_result(answer, *args, **kwargs)
+    runner.build_result = timed_build_result
+
+    io_before = read_io_counters()
+    start = time.perf_counter()
+    output = runner.run_oracle_retrieval_evaluation_scalable(config)
+    wall_seconds = time.perf_counter() - start
+    io_after = read_io_counters()
+
+    latencies = [finished[q] - started[q] for q in finished if q in started]
+    processed = output["metadata"]["processed_questions"] if output else 0
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_rss_kb //= 1024
+    return {
+        "params": {k: v for k, v in params.items() if k not in ("work_dir", "qa_path", "docs_path")},
+        "processed_questions": processed,
+        "wall_seconds": wall_seconds,
+        "questions_per_second": processed / wall_seconds if wall_seconds else None,
+        "latency_seconds": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else None
+        },
+        "peak_rss_mb": peak_rss_kb / 1024,
+        "bytes_written": {
+            "syscall": io_after.get("wchar", 0) - io_before.get("wchar", 0) if io_after else None,
+            "storage": io_after.get("write_bytes", 0) - io_before.get("write_bytes", 0) if io_after else None,
+            "output_file": os.path.getsize(output_file) if os.path.exists(output_file) else 0
+        },
+        "pipeline": output["metadata"].get("pipeline") if output else None
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end throughput benchmark for the evaluation runners")
+    parser.add_argument("--runners", nargs="+", choices=RUNNERS, default=list(RUNNERS))
+    parser.add_argument("--engines", nargs="+", default=["batch", "pipeline", "async"],
+                       help="Engines to run (async only applies to the scalable runner)")
+    parser.add_argument("--questions", nargs="+", type=int, default=[200],
+                       help="Question counts (first N MoNaCo questions; default: 200)")
+    parser.add_argument("--workers", nargs="+", type=int, default=[8], help="Worker counts (default: 8)")
+    parser.add_argument("--latency_ms", nargs="+", type=float, default=[200.0],
+                       help="Median simulated API latency in ms (default: 200)")
+    parser.add_argument("--latency_spread", type=float, default=0.5, help="Lognormal sigma (default: 0.5)")
+    parser.add_argument("--checkpoint_intervals", nargs="+", type=int, default=[10],
+                       help="Checkpoint intervals (default: 10)")
+    parser.add_argument("--checkpoint_modes", nargs="+", choices=["json", "journal"], default=["json", "journal"])
+    parser.add_argument("--docs_per_question", type=int, default=5)
+    parser.add_argument("--doc_chars", type=int, default=2000, help="Characters per synthetic document")
+    parser.add_argument("--qa_file", default=os.path.join(REPO_ROOT, "monaco_version_1_release.json"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None,
+                       help="Results JSON (default: benchmarks/results/bench_<revision>_<timestamp>.json)")
+    parser.add_argument("--single_run", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single_run:
+        with open(args.single_run, "r", encoding="utf-8") as f:
+            params = json.load(f)
+        result = run_single(params)
+        with open(params["result_file"], "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    revision = git_revision()
+    output_file = args.output or os.path.join(
+        REPO_ROOT, "benchmarks", "results", f"bench_{revision or 'unknown'}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    runs = []
+    with tempfile.TemporaryDirectory(prefix="monaco_bench_") as tmp_dir:
+        datasets = {}
+        for questions in sorted(set(args.questions)):
+            datasets[questions] = write_dataset(tempfile.mkdtemp(dir=tmp_dir), args.qa_file, questions,
+                                                args.docs_per_question, args.doc_chars)
+            # Build the document store up front so the first run does not pay for it
+            DocumentStore(datasets[questions][1]).close()
+        matrix = itertools.product(args.runners, args.engines, args.questions, args.workers, args.latency_ms,
+                                   args.checkpoint_intervals, args.checkpoint_modes)
+        for runner, engine, questions, workers, latency_ms, checkpoint_interval, checkpoint_mode in matrix:
+            if engine not in RUNNER_ENGINES[runner]:
+                continue
+            work_dir = tempfile.mkdtemp(dir=tmp_dir)
+            qa_path, docs_path = datasets[questions]
+            params = {
+                "runner": runner, "engine": engine, "questions": questions, "workers": workers,
+                "latency_ms": latency_ms, "latency_spread": args.latency_spread,
+                "checkpoint_interval": checkpoint_interval, "checkpoint_mode": checkpoint_mode,
+                "seed": args.seed, "work_dir": work_dir, "qa_path": qa_path, "docs_path": docs_path,
+                "result_file": os.path.join(work_dir, "bench_result.json")
+            }
+            params_file = os.path.join(work_dir, "bench_params.json")
+            with open(params_file, "w", encoding="utf-8") as f:
+                json.dump(params, f)
+            label = (f"{runner}/{engine} q={questions} workers={workers} latency={latency_ms:g}ms "
+                     f"checkpoint={checkpoint_mode}@{checkpoint_interval}")
+            print(f"⏱️  {label}")
+            env = dict(os.environ, TQDM_DISABLE="1")
+            completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--single_run", params_file],
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, env=env)
+            if completed.returncode != 0 or not os.path.exists(params["result_file"]):
+                print(f"❌ Run failed:\n{completed.stderr[-2000:]}")
+                continue
+            with open(params["result_file"], "r", encoding="utf-8") as f:
+                result = json.load(f)
+            result["params"].pop("result_file", None)
+            runs.append(result)
+            latency = result["latency_seconds"]
+            print(f"   {result['questions_per_second']:.2f} q/s, p50 {latency['p50']:.3f}s, "
+                  f"p95 {latency['p95']:.3f}s, p99 {latency['p99']:.3f}s, "
+                  f"peak RSS {result['peak_rss_mb']:.0f} MB, wrote {result['bytes_written']['syscall']} bytes")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump({"revision": revision, "created": time.strftime("%Y-%m-%d %H:%M:%S"), "runs": runs}, f, indent=2)
+    print(f"💾 Benchmark results saved to: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
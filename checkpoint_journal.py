@@ -0,0 +1,108 @@
+"""
+Append-only JSONL checkpoint journal for the evaluation runners.
+
+Instead of re-serializing every result collected so far at each checkpoint, the
+journal appends each finished result as one JSON line and fsyncs it, so the cost
+per question is constant and a crash can only lose the line being written.
+Resuming streams the journal back, dropping a torn trailing line if present
+and skipping any other line that cannot be read.
+"""
+
+import os
+import json
+import logging
+from typing import Any, Dict, Optional
+
+
+class CheckpointJournal:
+    """Append finished results to a JSONL journal, one fsync'd line per result."""
+
+    def __init__(self, journal_file: str):
+        self.journal_file = journal_file
+        directory = os.path.dirname(os.path.abspath(journal_file))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(journal_file, "a", encoding="utf-8")
+        self.bytes_written = 0
+
+    def append(self, result: Dict[str, Any]):
+        """Durably append one result."""
+        line = json.dumps(result, ensure_ascii=False) + "\n"
+        self._file.write(line)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.bytes_written += len(line.encode("utf-8"))
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def _journal_score(record: Any) -> Optional[float]:
+    """Judge score of a journal record, or None if the record is not a scored result."""
+    if not isinstance(record, dict) or "question" not in record:
+        return None
+    score = ((record.get("evaluation") or {}).get("scores") or {}).get("judge_score")
+    if not isinstance(score, (int, float)) or isinstance(score, bool):
+        return None
+    return float(score)
+
+
+def load_journal(journal_file: str) -> Optional[Dict[str, Any]]:
+    """Stream a journal back into checkpoint form.
+
+    Returns the same keys as the JSON checkpoint (processed_questions, results,
+    total_score, processed_count), or None if there is no journal. Only an
+    unterminated final line (a crash mid-write) is truncated away so appending can
+    resume cleanly; unreadable or unscored lines elsewhere are skipped and logged,
+    and their questions are processed again. Raises ValueError without touching the
+    file if it is not a journal (e.g. an existing JSON checkpoint).
+    """
+    if not os.path.exists(journal_file):
+        return None
+
+    processed_questions = []
+    results = []
+    total_score = 0.0
+    skipped_lines = []
+    valid_bytes = 0
+    torn_tail = False
+    with open(journal_file, "rb") as f:
+        for line_number, raw_line in enumerate(f, start=1):
+            if not raw_line.endswith(b"\n"):
+                torn_tail = True
+                break
+            valid_bytes += len(raw_line)
+            try:
+                record = json.loads(raw_line)
+            except json.JSONDecodeError:
+                record = None
+            if line_number == 1 and not (isinstance(record, dict) and "question" in record):
+                raise ValueError(f"{journal_file} is not a checkpoint journal (first line is not a result); "
+                                 f"use --checkpoint_mode json or a different --checkpoint file")
+            score = _journal_score(record)
+            if score is None:
+                skipped_lines.append(line_number)
+                continue
+            results.append(record)
+            processed_questions.append(record["question"])
+            total_score += score
+
+    if torn_tail and valid_bytes == 0:
+        raise ValueError(f"{journal_file} holds no complete checkpoint journal line; "
+                         f"remove it to start over or use a different --checkpoint file")
+    if skipped_lines:
+        logging.warning(f"Skipped {len(skipped_lines)} unreadable or unscored entries in checkpoint journal "
+                        f"{journal_file} (lines {skipped_lines[:20]}{' ...' if len(skipped_lines) > 20 else ''}); "
+                        f"their questions will be processed again")
+    if torn_tail:
+        logging.warning(f"Dropping torn trailing entry from checkpoint journal {journal_file}")
+        with open(journal_file, "r+b") as f:
+            f.truncate(valid_bytes)
+
+    logging.info(f"Checkpoint journal loaded: {len(results)} questions already processed")
+    return {
+        "processed_questions": processed_questions,
+        "results": results,
+        "total_score": total_score,
+        "processed_count": len(results)
+    }
@@ -29,6 +29,72 @@ REASONING_LLMS = [O1, O3, O1_MINI, O3_MINI, O4_MINI, DEEPSEEK_R1, GEMINI_25_PRO,
                   CLAUDE4_SONNET]
 MAX_LEN_RETRIEVAL_PROMPT = 1020000
 MAX_TOKENS_GPT4_O = 128000
+MAX_TOKENS_GPT4 = 8192
+GPT4 = "gpt-4"
+# Context window (in tokens) per model, for packing Oracle prompts; models are matched by longest prefix
+MODEL_CONTEXT_TOKENS = {
+    GPT4: MAX_TOKENS_GPT4,
+    GPT4_TURBO: MAX_TOKENS_GPT4_O,
+    # Other 128k GPT-4 variants, listed so the longest-prefix lookup doesn't fall back to 8k gpt-4
+    "gpt-4-turbo": MAX_TOKENS_GPT4_O,
+    "gpt-4-0125-preview": MAX_TOKENS_GPT4_O,
+    "gpt-4-32k": 32768,
+    GPT4_OMNI: MAX_TOKENS_GPT4_O,
+    GPT_41: 1047576,
+    GPT_5: 272000,
+    O1: 200000,
+    O3: 200000,
+    O1_MINI: MAX_TOKENS_GPT4_O,
+    O3_MINI: 200000,
+    O4_MINI: 200000,
+    GEMINI_25_PRO: MAX_LEN_RETRIEVAL_PROMPT,
+    GEMINI_25_FLASH: MAX_LEN_RETRIEVAL_PROMPT,
+    CLAUDE4_OPUS: 200000,
+    CLAUDE4_SONNET: 200000,
+    LLAMA3_70B_INSTRUCT: 8192,
+    LLAMA31_405B_INSTRUCT: MAX_TOKENS_GPT4_O,
+    QWEN2_72B_INSTRUCT: 32768,
+    QWEN25_72B_INSTRUCT: 32768,
+    GEMMA3_27B: MAX_TOKENS_GPT4_O,
+    DEEPSEEK_R1: MAX_TOKENS_GPT4_O,
+    DEEPSEEK_V3: MAX_TOKENS_GPT4_O,
+}
+DEFAULT_CONTEXT_TOKENS = MAX_TOKENS_GPT4_O
+# Tokens kept free for the answer (and reasoning) when packing the prompt
+CONTEXT_OUTPUT_RESERVE_TOKENS = 8192
+# List prices in USD per million (input, output) tokens, for cost estimates; models are matched by longest prefix
+MODEL_PRICES_PER_MILLION_TOKENS = {
+    GPT4: (30.00, 60.00),
+    GPT4_TURBO: (10.00, 30.00),
+    GPT4_OMNI: (2.50, 10.00),
+    GPT_41: (2.00, 8.00),
+    GPT_5: (1.25, 10.00),
+    O1: (15.00, 60.00),
+    O3: (2.00, 8.00),
+    O1_MINI: (1.10, 4.40),
+    O3_MINI: (1.10, 4.40),
+    O4_MINI: (1.10, 4.40),
+    GEMINI_25_PRO: (1.25, 10.00),  # prompts up to 200k tokens
+    GEMINI_25_FLASH: (0.30, 2.50),
+    # Other tiers, listed so they aren't priced at their base model's rate
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4-0125-preview": (10.00, 30.00),
+    "gpt-4-32k": (60.00, 120.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-5-mini": (0.25, 2.00),
+    "gpt-5-nano": (0.05, 0.40),
+    "o1-pro": (150.00, 600.00),
+    "o3-pro": (20.00, 80.00),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    CLAUDE4_OPUS: (15.00, 75.00),
+    CLAUDE4_SONNET: (3.00, 15.00),
+}
+# A price match is rejected if the rest of the model name names one of these tiers (e.g. o3 for o3-pro)
+MODEL_TIER_NAMES = ("mini", "nano", "pro", "lite")
+# Batch API requests are billed at this fraction of the list price
+BATCH_PRICE_FACTOR = 0.5
 
 WORKER_ANSWER_OVERLAP_THRESHOLD = 0.77
 WORKER_NUM_ANSWERS_DELTA_THRESHOLD = 0.25
@@ -0,0 +1,169 @@
+"""
+Token-budgeted packing of Oracle documents into answer prompts.
+
+Each model's prompt budget comes from consts.MODEL_CONTEXT_TOKENS minus room for
+the answer. Documents are then packed with one of these strategies:
+- "keep_all": send every document; prompts over budget are rejected
+- "truncate_longest": cut the longest documents down to a common length until the prompt fits
+- "drop_lowest_overlap": drop the documents sharing the fewest words with the question until it fits
+
+Prompts that still do not fit are rejected before any API call is made.
+"""
+
+import os
+import re
+import sys
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompts'))
+
+from consts import MODEL_CONTEXT_TOKENS, DEFAULT_CONTEXT_TOKENS, CONTEXT_OUTPUT_RESERVE_TOKENS
+from rate_limiter import CHARS_PER_TOKEN
+from utils import lookup_by_model
+from prompts.retrieval_augmented_setup import count_tokens, get_tokenizer
+
+PACKING_STRATEGIES = ("keep_all", "truncate_longest", "drop_lowest_overlap")
+
+# Tokens for the "Document N:" header and blank lines around each document in the prompt
+DOCUMENT_SEPARATOR_TOKENS = 8
+TRUNCATION_MARKER = "\n[...]"
+WORD_PATTERN = re.compile(r"\w+")
+STOPWORDS = {"the", "and", "for", "are", "was", "were", "what", "which", "who", "how", "many", "much", "with",
+             "from", "that", "this", "have", "has", "had", "did", "does", "all", "any", "each", "their", "its"}
+
+
+def get_context_budget(model: str, budget_override: Optional[int] = None) -> int:
+    """Prompt token budget for a model: its context window minus room for the answer."""
+    if budget_override:
+        return budget_override
+    context_tokens = lookup_by_model(MODEL_CONTEXT_TOKENS, model, DEFAULT_CONTEXT_TOKENS)
+    return context_tokens - min(CONTEXT_OUTPUT_RESERVE_TOKENS, context_tokens // 4)
+
+
+def content_words(text: str) -> set:
+    return {w for w in WORD_PATTERN.findall(text.lower()) if len(w) > 2 and w not in STOPWORDS}
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to about max_tokens tokens, marking the cut."""
+    max_tokens = max(0, max_tokens - count_tokens(TRUNCATION_MARKER))
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return text[:max_tokens * CHARS_PER_TOKEN] + TRUNCATION_MARKER
+    return tokenizer.decode(tokenizer.encode(text, disallowed_special=())[:max_tokens]) + TRUNCATION_MARKER
+
+
+@dataclass
+class PackedContext:
+    """Documents chosen for a prompt and the prompt's packed token count."""
+    documents: List[str]
+    prompt_tokens: int
+    budget: int
+    strategy: str
+    dropped: int = 0
+    truncated: int = 0
+
+    @property
+    def fits(self) -> bool:
+        return self.prompt_tokens <= self.budget
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "strategy": self.strategy,
+            "packed_prompt_tokens": self.prompt_tokens,
+            "budget": self.budget,
+            "dropped_documents": self.dropped,
+            "truncated_documents": self.truncated
+        }
+
+
+def _prompt_tokens(document_tokens: Sequence[int], prompt_overhead_tokens: int) -> int:
+    return prompt_overhead_tokens + sum(document_tokens) + DOCUMENT_SEPARATOR_TOKENS * len(document_tokens)
+
+
+def _truncation_cap(document_tokens: Sequence[int], available: int) -> int:
+    """Largest per-document cap L with sum(min(tokens, L)) <= available."""
+    remaining = available
+    ordered = sorted(document_tokens)
+    for i, tokens in enumerate(ordered):
+        share = remaining // (len(ordered) - i)
+        if tokens > share:
+            return share
+        remaining -= tokens
+    return ordered[-1] if ordered else 0
+
+
+def pack_documents(question: str, documents: List[str], budget: int, strategy: str = "keep_all",
+                   document_tokens: Optional[List[int]] = None,
+                   prompt_overhead_tokens: int = 0) -> PackedContext:
+    """Pack documents into the budget with the given strategy; check .fits before sending the prompt."""
+    if strategy not in PACKING_STRATEGIES:
+        raise ValueError(f"Unknown packing strategy: {strategy} (expected one of {PACKING_STRATEGIES})")
+    if document_tokens is None:
+        document_tokens = [count_tokens(doc) for doc in documents]
+    documents = list(documents)
+    document_tokens = list(document_tokens)
+    total = _prompt_tokens(document_tokens, prompt_overhead_tokens)
+    if total <= budget or strategy == "keep_all":
+        return PackedContext(documents, total, budget, strategy)
+
+    if strategy == "truncate_longest":
+        available = budget - _prompt_tokens([], prompt_overhead_tokens) - DOCUMENT_SEPARATOR_TOKENS * len(documents)
+        if available <= 0:
+            return PackedContext(documents, total, budget, strategy)
+        cap = _truncation_cap(document_tokens, available)
+        truncated = 0
+        for i, tokens in enumerate(document_tokens):
+            if tokens > cap:
+                documents[i] = truncate_to_tokens(documents[i], cap)
+                document_tokens[i] = cap
+                truncated += 1
+        return PackedContext(documents, _prompt_tokens(document_tokens, prompt_overhead_tokens), budget, strategy,
+                             truncated=truncated)
+
+    # drop_lowest_overlap: drop least relevant documents first (later ones on ties), keeping prompt order
+    question_words = content_words(question)
+    overlap = [len(question_words & content_words(doc)) / max(1, len(question_words)) for doc in documents]
+    keep = set(range(len(documents)))
+    for i in sorted(range(len(documents)), key=lambda i: (overlap[i], -i)):
+        if total <= budget or len(keep) == 1:
+            break
+        keep.discard(i)
+        total -= document_tokens[i] + DOCUMENT_SEPARATOR_TOKENS
+    kept = sorted(keep)
+    return PackedContext([documents[i] for i in kept], total, budget, strategy, dropped=len(documents) - len(kept))
+
+
+class PackingStats:
+    """Thread-safe packing counters for run metadata."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.packed_prompts = 0
+        self.rejected_prompts = 0
+        self.dropped_documents = 0
+        self.truncated_documents = 0
+        self.max_prompt_tokens = 0
+
+    def record(self, packed: PackedContext):
+        with self._lock:
+            if packed.fits:
+                self.packed_prompts += 1
+                self.max_prompt_tokens = max(self.max_prompt_tokens, packed.prompt_tokens)
+            else:
+                self.rejected_prompts += 1
+            self.dropped_documents += packed.dropped
+            self.truncated_documents += packed.truncated
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "packed_prompts": self.packed_prompts,
+                "rejected_prompts": self.rejected_prompts,
+                "dropped_documents": self.dropped_documents,
+                "truncated_documents": self.truncated_documents,
+                "max_prompt_tokens": self.max_prompt_tokens
+            }
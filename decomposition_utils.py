@@ -1,52 +1,141 @@
+import re
 import csv
+import heapq
+from functools import lru_cache
+from typing import NamedTuple
 
-from utils import read_csv_to_dict, remove_empty_string_from_list, remove_duplicates_from_list
+from utils import read_csv_to_dict, remove_empty_string_from_list
 
 REF = "#"
 LIST_STEP_IDENTIFIER = "[list]"
 
 
-def is_step_dependent_on_other(step_idx, depend_on_idx, decomposition_list):
+class QDMRGraph:
+    """A QDMR decomposition parsed once into a DAG of steps.
 
-    def all_dependent_steps(steps, idx):
-        step = steps[idx - 1]
-        dependent_indices = extract_references(step)
-        if not dependent_indices:
-            return dependent_indices
-        else:
-            for ref in dependent_indices:
-                dependent_indices += all_dependent_steps(steps, ref)
-            return remove_duplicates_from_list(dependent_indices)
+    Steps are 1-indexed, like their #references. Each step's references are parsed once,
+    and its operator (identify_operation, None for question steps) when first needed.
+    The transitive references of every step are precomputed as bitsets (bit i set:
+    depends on step i), so depends_on is O(1) and column_attributes is O(n * targets).
+    References to steps outside the decomposition are ignored.
+    """
 
-    return depend_on_idx in all_dependent_steps(decomposition_list, step_idx)
+    def __init__(self, steps):
+        self.steps = list(steps)
+        n = len(self.steps)
+        self.references = [tuple(dict.fromkeys(r for r in extract_references(step) if 1 <= r <= n))
+                           for step in self.steps]
+        self._reference_bits = [sum(1 << r for r in refs) for refs in self.references]
+        # Transitive closure; one pass for well-formed QDMR (references point to earlier steps)
+        self._dependency_bits = list(self._reference_bits)
+        changed = True
+        while changed:
+            changed = False
+            for i, refs in enumerate(self.references):
+                bits = self._dependency_bits[i]
+                for r in refs:
+                    bits |= self._dependency_bits[r - 1]
+                if bits != self._dependency_bits[i]:
+                    self._dependency_bits[i] = bits
+                    changed = True
+        self._operators = None
+
+    @classmethod
+    def from_decomposition(cls, decomposition):
+        """Graph of a numbered QDMR string or a list of steps."""
+        return cls(decomposition_to_steps(decomposition) if isinstance(decomposition, str) else decomposition)
+
+    def __len__(self):
+        return len(self.steps)
+
+    @property
+    def operators(self):
+        if self._operators is None:
+            from operation_identifier import identify_operations
+            self._operators = identify_operations(self.steps)
+        return self._operators
+
+    def operator(self, idx):
+        return self.operators[idx - 1]
+
+    def depends_on(self, step_idx, other_idx):
+        """Whether step_idx refers to other_idx, directly or through other steps."""
+        return bool(self._dependency_bits[step_idx - 1] >> other_idx & 1)
+
+    def dependencies(self, step_idx):
+        """All steps step_idx depends on, in index order."""
+        bits = self._dependency_bits[step_idx - 1]
+        return [i for i in range(1, len(self.steps) + 1) if bits >> i & 1]
+
+    def dependents(self, step_idx):
+        """Steps referring to step_idx directly."""
+        return [i + 1 for i, refs in enumerate(self.references) if step_idx in refs]
+
+    def fan_in(self, step_idx):
+        return len(self.references[step_idx - 1])
+
+    def fan_out(self, step_idx):
+        return len(self.dependents(step_idx))
+
+    def column_attributes(self, target_steps_indices):
+        """Whether all target steps refer to, or depend on, one single step (potentially one of them)."""
+        for index in range(1, len(self.steps) + 1):
+            others = [x for x in target_steps_indices if x != index]
+            if all(self._reference_bits[o - 1] >> index & 1 for o in others) or \
+                    all(self._dependency_bits[o - 1] >> index & 1 for o in others):
+                return True
+        return False
 
+    def topological_order(self):
+        """Step indices with every step after the steps it refers to (index order among ready steps)."""
+        remaining = [len(refs) for refs in self.references]
+        ready = [i + 1 for i, count in enumerate(remaining) if count == 0]
+        dependents = [[] for _ in self.steps]
+        for i, refs in enumerate(self.references):
+            for r in refs:
+                dependents[r - 1].append(i + 1)
+        order = []
+        while ready:
+            idx = heapq.heappop(ready)
+            order.append(idx)
+            for dependent in dependents[idx - 1]:
+                remaining[dependent - 1] -= 1
+                if remaining[dependent - 1] == 0:
+                    heapq.heappush(ready, dependent)
+        if len(order) != len(self.steps):
+            raise ValueError("QDMR decomposition has cyclic references")
+        return order
+
+    def depths(self):
+        """Length of the longest reference chain ending at each step (1 for steps without references)."""
+        depth = {}
+        for idx in self.topological_order():
+            depth[idx] = 1 + max((depth[r] for r in self.references[idx - 1]), default=0)
+        return [depth[i] for i in range(1, len(self.steps) + 1)]
+
+    def critical_path_depth(self):
+        """Longest chain of dependent steps in the decomposition."""
+        return max(self.depths(), default=0)
+
+
+@lru_cache(maxsize=4096)
+def _cached_qdmr_graph(steps):
+    return QDMRGraph(steps)
+
+
+def qdmr_graph(decomposition_list):
+    """QDMRGraph of a list of steps, parsed once per distinct decomposition."""
+    return _cached_qdmr_graph(tuple(decomposition_list))
 
-def steps_are_column_attributes(decomposition_list, target_steps_indices):
-    """given two decomposition steps, we regard them as column attributed if they all refer to one of the input steps
-    or if all refer to the same previous step."""
 
-    def all_steps_refer_to_target(target_step_idx, other_steps):
-        for other in other_steps:
-            if target_step_idx not in step_to_references_map[other]:
-                return False
-        return True
+def is_step_dependent_on_other(step_idx, depend_on_idx, decomposition_list):
+    return qdmr_graph(decomposition_list).depends_on(step_idx, depend_on_idx)
 
-    def all_steps_depend_on_target(target_step_idx, other_steps):
-        for other in other_steps:
-            if not is_step_dependent_on_other(other, target_step_idx, decomposition_list):
-                return False
-        return True
 
-    step_to_references_map = {}
-    for index in target_steps_indices:
-        step_to_references_map[index] = extract_references(decomposition_list[index - 1])
-    for index in range(1, len(decomposition_list) + 1):
-        # check if all target steps refer to one single step (potentially one of them)
-        steps_excluding_idx = [x for x in target_steps_indices if x != index]
-        if all_steps_refer_to_target(index, steps_excluding_idx) or \
-                all_steps_depend_on_target(index, steps_excluding_idx):
-            return True
-    return False
+def steps_are_column_attributes(decomposition_list, target_steps_indices):
+    """given two decomposition steps, we regard them as column attributed if they all refer to one of the input steps
+    or if all refer to the same previous step."""
+    return qdmr_graph(decomposition_list).column_attributes(target_steps_indices)
 
 
 def remove_list_step_identifier(qdmr_step):
@@ -83,33 +172,37 @@ def is_discrete_qdmr_step(qdmr_step):
     return qdmr_step.lower().startswith("return ")
 
 
+class ReferenceSpan(NamedTuple):
+    """A #reference in a QDMR step: its position in the step text and the step it refers to."""
+    start: int
+    end: int
+    ref: int
+
+
+# '#' directly followed by a step number; '# ' and other '#'s are not references
+REFERENCE_PATTERN = re.compile(r"#(\d+)")
+
+
+@lru_cache(maxsize=65536)
+def scan_references(qdmr_step):
+    """References of a step with their spans, in order, from a single scan of the text."""
+    return tuple(ReferenceSpan(m.start(), m.end(), int(m.group(1))) for m in REFERENCE_PATTERN.finditer(qdmr_step))
+
+
 def extract_references(qdmr_step):
     """Extracts a list of references to previous steps"""
-    # make sure decomposition does not contain a mere '# ' other than a reference.
-    qdmr_step = qdmr_step.replace("# ", "hashtag ").replace(",", "").replace("?", "").replace(";", "").replace(")",
-                                                                                                               "").replace(
-        "(", "")
-    references = []
-    l = qdmr_step.split(REF)
-    for chunk in l[1:]:
-        if len(chunk) > 1:
-            ref = chunk.split()[0].replace("'s", "")
-            ref = int(ref)
-            references += [ref]
-        if len(chunk) == 1:
-            ref = int(chunk)
-            references += [ref]
-    return references
+    return [span.ref for span in scan_references(qdmr_step)]
 
 
 def populate_qdmr_step(qdmr_step, assignment):
-    ref_idxs = extract_references(qdmr_step)
-    populated_step = qdmr_step
-    for ref in [str(r) for r in ref_idxs]:
-        if assignment[ref] is None:
-            assignment[ref] = "None"
-        populated_step = populated_step.replace(f"{REF}{ref}", str(assignment[ref]))
-    return populated_step
+    """Replace each #reference with its assigned value (assignment is keyed by the step number as a string)."""
+    pieces = []
+    position = 0
+    for span in scan_references(qdmr_step):
+        pieces += [qdmr_step[position:span.start], str(assignment[str(span.ref)])]
+        position = span.end
+    pieces.append(qdmr_step[position:])
+    return "".join(pieces)
 
 
 def is_reference_token(tok):
@@ -10,13 +10,22 @@ import seaborn as sns
 from pathlib import Path
 from collections import Counter
 
+from analysis_store import AnalysisStore
+
+ANALYSIS_STORE_DIR = 'analysis_store'
+
 def load_both_analyses():
     """Load analysis data for both models and original results."""
     import json
     
-    # Load comprehensive analysis
-    gpt5_df = pd.read_csv('performance_analysis_results_gpt5_gpt41judge/comprehensive_analysis_data.csv')
-    gemini_df = pd.read_csv('performance_analysis_results_gemini25pro_gpt41judge/comprehensive_analysis_data.csv')
+    # Load comprehensive analysis (Parquet store written by llm_performance_breakdown.py, else the old CSVs)
+    store = AnalysisStore(ANALYSIS_STORE_DIR)
+    if {'monaco_gpt5_gpt41judge', 'monaco_gemini25pro_gpt41judge'} <= set(store.runs()):
+        gpt5_df = store.load('monaco_gpt5_gpt41judge')
+        gemini_df = store.load('monaco_gemini25pro_gpt41judge')
+    else:
+        gpt5_df = pd.read_csv('performance_analysis_results_gpt5_gpt41judge/comprehensive_analysis_data.csv')
+        gemini_df = pd.read_csv('performance_analysis_results_gemini25pro_gpt41judge/comprehensive_analysis_data.csv')
     
     # Load original results to get generated answers
     with open('merged_results/monaco_gpt5_gpt41judge.json', 'r') as f:
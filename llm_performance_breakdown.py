@@ -6,18 +6,36 @@ Adds:
 - Oracle docs loading
 - Raw doc count
 - Cumulative context length (tokens + words)
+
+Token counts use one cl100k_base encoder per analyzer. All document and question texts
+are tokenized up front in multi-threaded batches, once per unique text, and the counts
+are kept in a sidecar cache next to the Oracle docs file (token_count_cache.py), so
+re-analyzing the same corpus for another results file skips tokenization.
+
+Question features and each run's scores are stored as Parquet in an analysis store
+(analysis_store.py, --store_dir): features are computed once per question, and
+analyzing another model's results only computes and writes its score columns.
+
+The store is incremental. Each feature row records a hash of the inputs it was computed
+from (dataset entry, question stats, Oracle docs, tokenizer, FEATURES_VERSION), and the
+store records the size/mtime of the source files. While the source files are unchanged
+and every question of the results file is stored, the dataset, stats and docs are not
+even loaded. When a source file changes, only questions whose input hash differs are
+recomputed.
 """
 
 import json
+import hashlib
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from collections import Counter
 import os
 import sys
+import argparse
 import warnings
 import tiktoken
 
@@ -25,8 +43,13 @@ warnings.filterwarnings("ignore")
 
 # Import local modules
 from decomposition_utils import decomposition_to_steps
-from operation_identifier import identify_operation
+from operation_identifier import identify_operations
 from utils import load_json
+from token_count_cache import TokenCountCache
+from analysis_store import AnalysisStore, ANALYSIS_COLUMNS, INPUT_HASH_COLUMN
+
+# Bump when compute_question_features changes so stored features are recomputed
+FEATURES_VERSION = 1
 
 
 class MoNaCoPerformanceAnalyzer:
@@ -38,12 +61,20 @@ class MoNaCoPerformanceAnalyzer:
         dataset_file: str = "/mnt/nlpgridio3/data/anirudh2/monaco/monaco_version_1_release.json",
         question_stats_file: str = "/mnt/nlpgridio3/data/anirudh2/monaco/question_stats_breakdown.json",
         oracle_docs_file: str = "/mnt/nlpgridio3/data/anirudh2/monaco/docs_oracle_retrieval_2025.jsonl",
+        token_cache_file: Optional[str] = None,
+        tokenizer_threads: int = os.cpu_count() or 8,
+        store_dir: Optional[str] = None,
+        run_name: Optional[str] = None,
     ):
         """Initialize the analyzer with data files."""
         self.dataset_file = dataset_file
         self.question_stats_file = question_stats_file
         self.results_file = results_file
         self.oracle_docs_file = oracle_docs_file
+        self.token_cache_file = token_cache_file or f"{oracle_docs_file}.tokens.json"
+        self.tokenizer_threads = tokenizer_threads
+        self.store = AnalysisStore(store_dir) if store_dir else None
+        self.run_name = run_name or Path(results_file).stem
 
         # Validate files
         for f in [self.dataset_file, self.results_file, self.oracle_docs_file]:
@@ -61,13 +92,25 @@ class MoNaCoPerformanceAnalyzer:
         self.results_data = None
         self.oracle_docs = None
         self.analysis_df = None
+        self.encoder = tiktoken.get_encoding("cl100k_base")
+        self.tokenizer_name = f"tiktoken:{self.encoder.name}"
+        self.token_cache = None
 
     def load_data(self):
-        """Load dataset, stats, results, and oracle docs."""
+        """Load results, and dataset, stats and oracle docs unless an analysis store may make them unnecessary."""
         print("🔄 Loading data files...")
 
-        self.dataset = load_json(self.dataset_file)
         self.results_data = load_json(self.results_file)
+        print(f"✅ Loaded {len(self.results_data.get('results', []))} results")
+        if self.store is None:
+            self.load_inputs()
+
+    def load_inputs(self):
+        """Load dataset, stats, and oracle docs (the inputs of question features)."""
+        if self.dataset is not None:
+            return
+        self.dataset = load_json(self.dataset_file)
+        self.token_cache = TokenCountCache(self.token_cache_file, self.tokenizer_name)
         if self.has_question_stats:
             self.question_stats = load_json(self.question_stats_file)
         else:
@@ -83,27 +126,62 @@ class MoNaCoPerformanceAnalyzer:
                 self.oracle_docs[question] = docs
 
         print(f"✅ Loaded {len(self.dataset)} dataset Qs")
-        print(f"✅ Loaded {len(self.results_data.get('results', []))} results")
         print(f"✅ Loaded oracle docs for {len(self.oracle_docs)} questions")
 
+    def source_fingerprints(self) -> Dict[str, Any]:
+        """Size and mtime of every feature input file, plus the feature code and tokenizer versions."""
+        def fingerprint(path):
+            if not os.path.exists(path):
+                return None
+            stat = os.stat(path)
+            return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+        return {
+            "dataset": fingerprint(self.dataset_file),
+            "question_stats": fingerprint(self.question_stats_file),
+            "oracle_docs": fingerprint(self.oracle_docs_file),
+            "features_version": FEATURES_VERSION,
+            "tokenizer": self.tokenizer_name,
+        }
+
+    def question_input_hash(self, question_text: str) -> str:
+        """Hash of everything a question's features are computed from."""
+        inputs = [FEATURES_VERSION, self.tokenizer_name, self.dataset.get(question_text),
+                  self.question_stats.get(question_text), self.oracle_docs.get(question_text)]
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True, ensure_ascii=False,
+                                         default=str).encode("utf-8")).hexdigest()
+
     def extract_operator_types(self, decomposition_steps: List[str]) -> List[str]:
         """Extract operator types from decomposition steps."""
-        operators = []
-        for step in decomposition_steps:
-            op = identify_operation(step)
-            operators.append(op if op else "qa_model")
-        return operators
+        return [op if op else "qa_model" for op in identify_operations(decomposition_steps)]
+
+    @staticmethod
+    def _doc_text(doc) -> str:
+        return doc.get('text', '') if isinstance(doc, dict) else str(doc)
+
+    def count_tokens(self, text: str) -> int:
+        """Token count of a text, from the token cache when already counted."""
+        count = self.token_cache.get(text)
+        if count is None:
+            self.token_cache.count_all([text], self.encoder, self.tokenizer_threads)
+            count = self.token_cache.get(text)
+        return count
+
+    def precompute_token_counts(self, questions: List[str]):
+        """Tokenize the questions and all their docs in batches, skipping texts counted before."""
+        texts = list(questions)
+        for question in questions:
+            texts.extend(self._doc_text(doc) for doc in self.oracle_docs.get(question, []))
+        self.token_cache.count_all(texts, self.encoder, self.tokenizer_threads)
+        self.token_cache.save()
+        stats = self.token_cache.stats()
+        print(f"🔢 Token counts: {stats['tokenized']} texts tokenized, "
+              f"{len(set(texts)) - stats['tokenized']} from cache ({self.token_cache_file})")
 
     def compute_context_tokens(self, docs: List[Dict]) -> int:
         """Compute cumulative token length for docs using tiktoken."""
         if not docs:
             return 0
-        enc = tiktoken.get_encoding("cl100k_base")
-        total_tokens = 0
-        for doc in docs:
-            text = doc.get('text', '') if isinstance(doc, dict) else str(doc)
-            total_tokens += len(enc.encode(text))
-        return total_tokens
+        return sum(self.count_tokens(self._doc_text(doc)) for doc in docs)
 
     def compute_context_words(self, docs: List[Dict]) -> int:
         """Compute cumulative word length for docs."""
@@ -111,121 +189,158 @@ class MoNaCoPerformanceAnalyzer:
             return 0
         total_words = 0
         for doc in docs:
-            text = doc.get('text', '') if isinstance(doc, dict) else str(doc)
-            total_words += len(text.split())
+            total_words += len(self._doc_text(doc).split())
         return total_words
 
+    def compute_question_features(self, question_text: str) -> Dict[str, Any]:
+        """Question-level features: dataset fields, decomposition operators, docs and token counts."""
+        question_data = self.dataset.get(question_text, {})
+        stats = self.question_stats.get(question_text, {})
+
+        # Oracle docs
+        docs = self.oracle_docs.get(question_text, [])
+
+        # Decomposition
+        decomposition_list = question_data.get("decomposition", [])
+        if isinstance(decomposition_list, str):
+            decomposition_steps = decomposition_to_steps(decomposition_list)
+        else:
+            decomposition_steps = decomposition_list
+        operators = self.extract_operator_types(decomposition_steps)
+        unique_operators = sorted(set(operators))
+        op_counts = Counter(operators)
+
+        return {
+            "question": question_text,
+            "ex_num": question_data.get("ex_num"),
+            "num_docs": len(docs),
+            "cumulative_context_tokens": self.compute_context_tokens(docs),
+            "cumulative_context_words": self.compute_context_words(docs),
+            "question_tokens": self.count_tokens(question_text),
+            "num_intermediate_answers": stats.get("num_intermediate_answers", 0),
+            "operators": operators,
+            "unique_operators": unique_operators,
+            "num_operators": len(operators),
+            "num_unique_operators": len(unique_operators),
+            "count_aggregate": op_counts.get("aggregate", 0),
+            "count_group": op_counts.get("group", 0),
+            "count_filter": sum(op_counts[o] for o in op_counts if "filter" in o),
+            "count_arithmetic": op_counts.get("arithmetic", 0),
+            "count_comparison": op_counts.get("comparison", 0),
+            "count_boolean": op_counts.get("boolean", 0),
+            "count_qa_model": op_counts.get("qa_model", 0),
+            "count_total_ops": sum(op_counts.values()),
+            "num_decomp_steps": len(decomposition_steps),
+            "num_subquestions": stats.get("num_subquestions", 0),
+            "gpt5_score": stats.get("llm_scores", {}).get("gpt5_zs_no_cot", 0.0),
+            "gemini25_pro_score": stats.get("llm_scores", {}).get("gemini25-pro_zs_no_cot", 0.0),
+            "gemini25_flash_score": stats.get("llm_scores", {}).get("gemini25-flash_zs_no_cot", 0.0),
+        }
+
+    @staticmethod
+    def compute_scores(scores: Dict[str, Any]) -> Dict[str, float]:
+        """Per-run performance metrics of one result."""
+        judge_score = scores.get("judge_score", 0.0)
+        precision = scores.get("precision", 0.0)
+        recall = scores.get("recall", np.nan)
+        f1_score = scores.get("f1", np.nan)
+
+        # Calculate F1 only if we have valid precision and recall
+        if pd.isna(f1_score) and not pd.isna(recall) and precision >= 0 and recall >= 0:
+            if precision + recall > 0:
+                f1_score = 2 * (precision * recall) / (precision + recall)
+            else:
+                f1_score = 0.0
+        elif pd.isna(recall):
+            # If recall is NaN, F1 should also be NaN
+            f1_score = np.nan
+
+        return {"judge_score": judge_score, "precision": precision, "recall": recall, "f1_score": f1_score}
+
+    def load_stored_features(self, questions) -> tuple:
+        """Stored features of the given questions that are still current.
+
+        Returns (features by question, questions to compute, stale stored questions to drop).
+        Input hashes are only checked (which needs the dataset, stats and docs) when a
+        source file changed since the store was last written.
+        """
+        if self.store is None:
+            return {}, list(questions), []
+        stored = {row["question"]: row for row in self.store.load_features().to_dict("records")}
+        stale = []
+        if stored and self.store.sources() != self.source_fingerprints():
+            print("🔄 Feature inputs changed since the analysis store was written, checking input hashes...")
+            self.load_inputs()
+            stale = [q for q, row in stored.items() if row.get(INPUT_HASH_COLUMN) != self.question_input_hash(q)]
+            for question in stale:
+                del stored[question]
+            print(f"   {len(stale)} stored questions have changed inputs")
+        features = {q: stored[q] for q in questions if q in stored}
+        return features, [q for q in questions if q not in stored], stale
+
     def create_comprehensive_analysis_dataframe(self) -> pd.DataFrame:
-        """Create comprehensive dataframe combining all analysis dimensions."""
+        """Create comprehensive dataframe combining all analysis dimensions.
+
+        With an analysis store, question features come from the store and only questions
+        that are new or whose inputs changed are computed (and stored); this run's scores
+        are written to it.
+        """
         print("🔄 Creating comprehensive analysis dataframe...")
 
-        rows = []
         results_by_question = {
             r.get("question", "").strip(): r
             for r in self.results_data.get("results", [])
         }
-
+        run_scores = {}
         for question_text, result in results_by_question.items():
-            evaluation = result.get("evaluation", {})
-            scores = evaluation.get("scores", {})
-            if not scores:
-                continue
-
-            question_data = self.dataset.get(question_text, {})
-            stats = self.question_stats.get(question_text, {})
-
-            # Oracle docs
-            docs = self.oracle_docs.get(question_text, [])
-            num_docs = len(docs)
-            context_tokens = self.compute_context_tokens(docs)
-            context_words = self.compute_context_words(docs)
-
-            # Decomposition
-            decomposition_list = question_data.get("decomposition", [])
-            if isinstance(decomposition_list, str):
-                decomposition_steps = decomposition_to_steps(decomposition_list)
-            else:
-                decomposition_steps = decomposition_list
-            operators = self.extract_operator_types(decomposition_steps)
-            unique_operators = list(set(operators))
-            op_counts = Counter(operators)
-
-            # Performance metrics
-            judge_score = scores.get("judge_score", 0.0)
-            precision = scores.get("precision", 0.0)
-            recall = scores.get("recall", np.nan)
-            f1_score = scores.get("f1", np.nan)
-            
-            # Calculate F1 only if we have valid precision and recall
-            if pd.isna(f1_score) and not pd.isna(recall) and precision >= 0 and recall >= 0:
-                if precision + recall > 0:
-                    f1_score = 2 * (precision * recall) / (precision + recall)
-                else:
-                    f1_score = 0.0
-            elif pd.isna(recall):
-                # If recall is NaN, F1 should also be NaN
-                f1_score = np.nan
-
-            # Calculate question tokens
-            enc = tiktoken.get_encoding("cl100k_base")
-            question_tokens = len(enc.encode(question_text))
-
-            # Row - focused on operation counts and core metrics
-            row = {
-                "question": question_text,
-                "ex_num": question_data.get("ex_num", ""),
-                "judge_score": judge_score,
-                "precision": precision,
-                "recall": recall,
-                "f1_score": f1_score,
-                "num_docs": num_docs,
-                "cumulative_context_tokens": context_tokens,
-                "cumulative_context_words": context_words,
-                "question_tokens": question_tokens,
-                "num_intermediate_answers": stats.get("num_intermediate_answers", 0),
-                "operators": operators,
-                "unique_operators": unique_operators,
-                "num_operators": len(operators),
-                "num_unique_operators": len(unique_operators),
-                "count_aggregate": op_counts.get("aggregate", 0),
-                "count_group": op_counts.get("group", 0),
-                "count_filter": sum(op_counts[o] for o in op_counts if "filter" in o),
-                "count_arithmetic": op_counts.get("arithmetic", 0),
-                "count_comparison": op_counts.get("comparison", 0),
-                "count_boolean": op_counts.get("boolean", 0),
-                "count_qa_model": op_counts.get("qa_model", 0),
-                "count_total_ops": sum(op_counts.values()),
-                "num_decomp_steps": len(decomposition_steps),
-                "num_subquestions": stats.get("num_subquestions", 0),
-                "gpt5_score": stats.get("llm_scores", {}).get("gpt5_zs_no_cot", 0.0),
-                "gemini25_pro_score": stats.get("llm_scores", {}).get(
-                    "gemini25-pro_zs_no_cot", 0.0
-                ),
-                "gemini25_flash_score": stats.get("llm_scores", {}).get(
-                    "gemini25-flash_zs_no_cot", 0.0
-                ),
-            }
-            rows.append(row)
-
-        df = pd.DataFrame(rows)
+            scores = result.get("evaluation", {}).get("scores", {})
+            if scores:
+                run_scores[question_text] = {"question": question_text, **self.compute_scores(scores)}
+
+        features, missing, stale = self.load_stored_features(run_scores)
+        new_features = []
+        if missing:
+            self.load_inputs()
+            self.precompute_token_counts(missing)
+            new_features = [self.compute_question_features(q) for q in missing]
+            if self.store is not None:
+                for row in new_features:
+                    row[INPUT_HASH_COLUMN] = self.question_input_hash(row["question"])
+            features.update((row["question"], row) for row in new_features)
+        if self.store is not None:
+            print(f"🗃️ Question features: {len(run_scores) - len(missing)} from {self.store.features_file}, "
+                  f"{len(missing)} computed")
+            if new_features or stale or self.store.sources() != self.source_fingerprints():
+                self.store.update_features(new_features, self.source_fingerprints(), remove=stale)
+            self.store.write_scores(self.run_name, list(run_scores.values()), self.results_file)
+            print(f"💾 Saved scores of run '{self.run_name}' → {self.store.scores_file(self.run_name)}")
+
+        rows = [{c: {**features[q], **scores}[c] for c in ANALYSIS_COLUMNS} for q, scores in run_scores.items()]
+        df = pd.DataFrame(rows, columns=ANALYSIS_COLUMNS)
 
         print(f"✅ Created analysis dataframe with {len(df)} rows, {len(df.columns)} cols")
         return df
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python monaco_analysis.py <results_file>")
-        sys.exit(1)
-
-    results_file = sys.argv[1]
-    analyzer = MoNaCoPerformanceAnalyzer(results_file)
+    parser = argparse.ArgumentParser(description="MoNaCo LLM performance breakdown analysis")
+    parser.add_argument("results_file", help="Evaluation results file to analyze")
+    parser.add_argument("--store_dir", default="analysis_store",
+                        help="Parquet analysis store (question features + per-run scores); '' to disable")
+    parser.add_argument("--run_name", default=None,
+                        help="Name of this run's scores in the store (default: results file name)")
+    parser.add_argument("--csv", default="comprehensive_analysis_data.csv",
+                        help="Also write the joined dataframe as CSV; '' to skip")
+    args = parser.parse_args()
+
+    analyzer = MoNaCoPerformanceAnalyzer(args.results_file, store_dir=args.store_dir or None,
+                                         run_name=args.run_name)
     analyzer.load_data()
     df = analyzer.create_comprehensive_analysis_dataframe()
 
-    out_csv = "comprehensive_analysis_data.csv"
-    df.to_csv(out_csv, index=False)
-    print(f"💾 Saved analysis dataframe → {out_csv}")
+    if args.csv:
+        df.to_csv(args.csv, index=False)
+        print(f"💾 Saved analysis dataframe → {args.csv}")
 
 
 if __name__ == "__main__":
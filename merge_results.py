@@ -2,93 +2,220 @@
 """
 Merge multiple MoNaCo Oracle evaluation result files.
 Usage: python merge_results.py file1.json file2.json ... --output merged_results.json
+
+Result files are streamed with ijson instead of loaded whole, so merging many shard
+files needs memory for one result at a time plus a small per-question index:
+- Pass 1 streams every file and keeps, per question, only where its winning result
+  lives (file, position) with that result's scores and model.
+- Metrics are recomputed exactly from the winners' per-result scores.
+- Pass 2 streams the files again and writes the winning results one by one.
+
+A question found in several files (overlapping shards, re-runs) is kept once, picked by
+--policy:
+- latest: the result from the most recently modified file (later position on ties)
+- highest: the result with the highest judge score (latest on ties)
+- preferred: the result from the first --prefer file that has the question (latest otherwise)
+
+Without ijson installed the files are read with json.load (same output, more memory).
 """
 
+import os
 import json
+import math
 import argparse
 import sys
-from typing import List, Dict, Any
-
-def merge_oracle_results(input_files: List[str], output_file: str):
-    """Merge multiple Oracle evaluation result files."""
-    
-    merged_results = []
-    total_processed = 0
-    total_score = 0.0
-    models_used = set()
-    
-    print(f"📂 Merging {len(input_files)} result files...")
-    
-    for i, file_path in enumerate(input_files):
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+MERGE_POLICIES = ("latest", "highest", "preferred")
+
+
+@dataclass
+class _Winner:
+    """Location and scores of the result kept for one question."""
+    rank: Tuple
+    file_index: int
+    position: int
+    scores: Dict[str, float] = field(default_factory=dict)
+    model: str = "unknown"
+
+
+def _get_ijson():
+    try:
+        import ijson
+        return ijson
+    except Exception:
+        return None
+
+
+def _iter_results(file_path: str) -> Iterator[Dict[str, Any]]:
+    """Results of one file, one at a time."""
+    ijson = _get_ijson()
+    with open(file_path, 'rb') as f:
+        if ijson is None:
+            yield from json.load(f).get("results", [])
+        else:
+            yield from ijson.items(f, "results.item", use_float=True)
+
+
+def _read_metadata(file_path: str) -> Dict[str, Any]:
+    ijson = _get_ijson()
+    with open(file_path, 'rb') as f:
+        if ijson is None:
+            return json.load(f).get("metadata", {})
+        return next(ijson.items(f, "metadata", use_float=True), {})
+
+
+def _result_scores(result: Dict[str, Any]) -> Dict[str, float]:
+    """Numeric judge scores of a result ({} if it was never judged)."""
+    scores = ((result.get("evaluation") or {}).get("scores")) or {}
+    return {k: float(v) for k, v in scores.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}
+
+
+def _indented(value: Any, prefix: str) -> str:
+    """json.dumps(value, indent=2) nested under the given indentation, as json.dump(indent=2) would write it."""
+    return json.dumps(value, indent=2, ensure_ascii=False).replace("\n", "\n" + prefix)
+
+
+def merge_oracle_results(input_files: List[str], output_file: str, policy: str = "latest",
+                         preferred_files: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Merge multiple Oracle evaluation result files; returns the merged metadata."""
+    if policy not in MERGE_POLICIES:
+        raise ValueError(f"Unknown merge policy: {policy} (expected one of {MERGE_POLICIES})")
+    preferred_files = [os.path.abspath(p) for p in (preferred_files or [])]
+
+    print(f"📂 Merging {len(input_files)} result files (dedup policy: {policy})...")
+    if _get_ijson() is None:
+        print("⚠️  ijson not installed, reading each file fully with json.load")
+
+    # Files ordered oldest to newest; later argument order breaks mtime ties
+    by_age = sorted(range(len(input_files)), key=lambda i: (os.path.getmtime(input_files[i]), i))
+    file_age = {file_index: age for age, file_index in enumerate(by_age)}
+
+    def preference(file_index: int) -> int:
+        path = os.path.abspath(input_files[file_index])
+        return len(preferred_files) - preferred_files.index(path) if path in preferred_files else 0
+
+    # Pass 1: pick the winning result of every question
+    winners: Dict[str, _Winner] = {}
+    file_counts = []
+    readable_files = []
+    skipped_results = 0
+    for file_index, file_path in enumerate(input_files):
         print(f"📖 Reading {file_path}...")
-        
+        # Winners of this file are only merged once the whole file parsed, so a truncated
+        # shard neither displaces other files' results nor leaves results pass 2 never writes
+        file_winners: Dict[str, _Winner] = {}
+        file_skipped = 0
         try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-            
-            # Extract results and metadata
-            results = data.get("results", [])
-            metadata = data.get("metadata", {})
-            
-            print(f"   Found {len(results)} results")
-            
-            # Append results
-            merged_results.extend(results)
-            
-            # Accumulate totals
-            total_processed += metadata.get("processed_questions", 0)
-            total_score += metadata.get("average_judge_score", 0) * metadata.get("processed_questions", 0)
-            models_used.add(metadata.get("model", "unknown"))
-            
+            file_model = _read_metadata(file_path).get("model", "unknown")
+            count = 0
+            for position, result in enumerate(_iter_results(file_path)):
+                count += 1
+                question = result.get("question")
+                if question is None:
+                    file_skipped += 1
+                    continue
+                scores = _result_scores(result)
+                latest = (file_age[file_index], position)
+                if policy == "highest":
+                    rank = (scores.get("judge_score", -math.inf),) + latest
+                elif policy == "preferred":
+                    rank = (preference(file_index),) + latest
+                else:
+                    rank = latest
+                current = file_winners.get(question)
+                if current is None or rank > current.rank:
+                    file_winners[question] = _Winner(rank, file_index, position, scores,
+                                                     result.get("model_used") or file_model)
         except Exception as e:
-            print(f"❌ Error reading {file_path}: {e}")
+            print(f"❌ Error reading {file_path}, skipping the whole file: {e}")
             continue
-    
-    # Calculate final average score
-    final_avg_score = total_score / total_processed if total_processed > 0 else 0.0
-    
-    # Create merged output
-    merged_data = {
-        "metadata": {
-            "total_questions": len(merged_results),
-            "processed_questions": total_processed,
-            "average_judge_score": final_avg_score,
-            "models_used": list(models_used),
-            "source_files": input_files,
-            "merged_from": len(input_files)
-        },
-        "results": merged_results
+        for question, candidate in file_winners.items():
+            current = winners.get(question)
+            if current is None or candidate.rank > current.rank:
+                winners[question] = candidate
+        skipped_results += file_skipped
+        file_counts.append(count)
+        readable_files.append(file_index)
+        print(f"   Found {count} results")
+
+    # Exact metrics from the winning results' own scores
+    scored = [w for w in winners.values() if "judge_score" in w.scores]
+    score_keys = sorted({k for w in scored for k in w.scores})
+    average_scores = {k: math.fsum(w.scores[k] for w in scored if k in w.scores) /
+                      sum(1 for w in scored if k in w.scores) for k in score_keys}
+    models: Dict[str, Dict[str, Any]] = {}
+    for model in sorted({w.model for w in winners.values()}):
+        model_scored = [w.scores["judge_score"] for w in scored if w.model == model]
+        models[model] = {
+            "questions": sum(1 for w in winners.values() if w.model == model),
+            "scored_questions": len(model_scored),
+            "average_judge_score": math.fsum(model_scored) / len(model_scored) if model_scored else 0.0
+        }
+    total_read = sum(file_counts)
+    metadata = {
+        "total_questions": len(winners),
+        "processed_questions": len(scored),
+        "average_judge_score": average_scores.get("judge_score", 0.0),
+        "average_scores": average_scores,
+        "unscored_results": len(winners) - len(scored),
+        "models_used": list(models),
+        "models": models,
+        "merge_policy": policy,
+        "preferred_files": [input_files[i] for i in range(len(input_files)) if preference(i)],
+        "results_read": total_read,
+        "duplicates_dropped": total_read - skipped_results - len(winners),
+        "results_without_question": skipped_results,
+        "source_files": input_files,
+        "merged_from": len(readable_files)
     }
-    
-    # Save merged results
-    with open(output_file, 'w') as f:
-        json.dump(merged_data, f, indent=2, ensure_ascii=False)
-    
+
+    # Pass 2: stream the winners into the output, in input order
+    keep = {(w.file_index, w.position) for w in winners.values()}
+    tmp_file = output_file + ".tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as out:
+        out.write('{\n  "metadata": ' + _indented(metadata, "  ") + ',\n  "results": [')
+        written = 0
+        for file_index in readable_files:
+            for position, result in enumerate(_iter_results(input_files[file_index])):
+                if (file_index, position) in keep:
+                    out.write(("," if written else "") + "\n    " + _indented(result, "    "))
+                    written += 1
+        out.write("\n  ]\n}" if written else "]\n}")
+    os.replace(tmp_file, output_file)
+
     print(f"\n✅ Merged results saved to: {output_file}")
-    print(f"📊 Total questions: {len(merged_results)}")
-    print(f"🏆 Average judge score: {final_avg_score:.3f}")
-    
-    return merged_data
+    print(f"📊 Total questions: {len(winners)} ({metadata['duplicates_dropped']} duplicates dropped)")
+    print(f"🏆 Average judge score: {metadata['average_judge_score']:.3f} over {len(scored)} scored questions")
+
+    return metadata
 
 def main():
     parser = argparse.ArgumentParser(description="Merge MoNaCo Oracle evaluation results")
     parser.add_argument("input_files", nargs="+", help="Input result files to merge")
-    parser.add_argument("--output", default="merged_oracle_results.json", 
+    parser.add_argument("--output", default="merged_oracle_results.json",
                        help="Output file for merged results")
-    
+    parser.add_argument("--policy", choices=MERGE_POLICIES, default="latest",
+                       help="Which result to keep for a question found in several files")
+    parser.add_argument("--prefer", action="append", default=[], metavar="FILE",
+                       help="Input file whose results win for --policy preferred (repeat to rank several)")
+
     args = parser.parse_args()
-    
+
     # Validate input files exist
-    for file_path in args.input_files:
+    for file_path in args.input_files + args.prefer:
         try:
             with open(file_path, 'r') as f:
                 pass
         except FileNotFoundError:
             print(f"❌ Error: File not found: {file_path}")
             sys.exit(1)
-    
+    if args.policy == "preferred" and not args.prefer:
+        parser.error("--policy preferred needs at least one --prefer FILE")
+
     # Merge the results
-    merge_oracle_results(args.input_files, args.output)
+    merge_oracle_results(args.input_files, args.output, args.policy, args.prefer)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
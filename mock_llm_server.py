@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI and Gemini APIs, for load-testing the runners offline.
+
+Speaks two wire formats:
+- OpenAI chat completions: POST /v1/chat/completions (SSE chunks with "stream": true)
+- Gemini generate content:  POST /v1beta/models/<model>:generateContent (and :streamGenerateContent)
+
+Answer prompts get a canned answer. Judge prompts (single, multi and batched) get a
+templated judgment in the judge prompt's format, so compute_llm_judge_score_V2 and
+the batched parser score it like a real one. Latency, 429s, hung requests and
+request/token-per-minute caps can be configured to exercise the runners' worker
+pools, rate limiters and retry policies. Streamed replies send the first chunk after
+the sampled latency and the rest at --ms_per_output_token.
+
+Usage:
+    python mock_llm_server.py --port 8000 --latency lognormal --latency_ms 800 --error_rate 0.05 --tokens_per_minute 200000
+    python run_oracle_retrieval_scalable.py --api_key mock --base_url http://localhost:8000/v1 ...
+    python run_gemini_oracle.py --openai_api_key mock --google_api_key mock \\
+        --base_url http://localhost:8000/v1 --gemini_base_url http://localhost:8000 ...
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from rate_limiter import estimate_tokens
+
+ITEM_HEADER_PATTERN = re.compile(r"^--- ITEM (\d+) \((single|multi)\) ---$", re.MULTILINE)
+CORRECT_ANSWER_PATTERN = re.compile(r"^\[correct_answer\]: (.*)$", re.MULTILINE)
+GEMINI_PATH_PATTERN = re.compile(r"^/v1beta/models/([^/:]+):(generateContent|streamGenerateContent)$")
+STREAM_PIECE_PATTERN = re.compile(r"\S+\s*|\s+")
+
+
+@dataclass
+class MockConfig:
+    """Behaviour of the mock server."""
+    latency: str = "fixed"  # "fixed", "uniform" or "lognormal"
+    latency_ms: float = 200.0  # Fixed latency, uniform mean or lognormal median
+    latency_spread: float = 0.5  # Uniform: +/- fraction of latency_ms; lognormal: sigma
+    ms_per_output_token: float = 0.0  # Extra latency per generated token
+    error_rate: float = 0.0  # Fraction of requests answered with 429
+    timeout_rate: float = 0.0  # Fraction of requests that hang for hang_seconds before answering
+    hang_seconds: float = 120.0
+    requests_per_minute: Optional[int] = None  # 429 once exceeded (sliding 60s window)
+    tokens_per_minute: Optional[int] = None  # 429 once exceeded (sliding 60s window)
+    judge_correct_rate: float = 0.5  # Fraction of judged answers marked correct
+    answer_text: str = "Based on the provided documents, the answer is 42."
+    answer_repeat: int = 1  # Repeat the canned answer (long answers for streaming early-abort tests)
+    seed: Optional[int] = None
+
+
+class MinuteWindow:
+    """Sliding 60s window of (time, requests, tokens) used to enforce the server-side caps."""
+
+    def __init__(self, requests_per_minute: Optional[int], tokens_per_minute: Optional[int]):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._events = deque()
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+    def admit(self, tokens: int) -> Optional[float]:
+        """Record the request and return None, or return the seconds to wait if it is over a cap."""
+        with self._lock:
+            now = time.time()
+            while self._events and self._events[0][0] <= now - 60:
+                self._tokens -= self._events.popleft()[1]
+            over_requests = self.requests_per_minute and len(self._events) + 1 > self.requests_per_minute
+            over_tokens = self.tokens_per_minute and self._tokens + tokens > self.tokens_per_minute
+            if over_requests or over_tokens:
+                return max(0.0, self._events[0][0] + 60 - now) if self._events else 1.0
+            self._events.append((now, tokens))
+            self._tokens += tokens
+            return None
+
+
+class MockStats:
+    """Thread-safe request counters, served at GET /stats."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+        self.started = time.time()
+
+    def count(self, key: str):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"uptime_seconds": time.time() - self.started, **self.counts}
+
+
+def _judgment_for(correct_answer: str, multi: bool, correct: bool) -> str:
+    """Judgment text in the single/multi judge prompt format."""
+    if not multi:
+        precision = 1 if correct else 0
+        return (f"extracted_final_answer: {correct_answer if correct else 'None'}\n"
+                f"reasoning: Mock judgment.\n"
+                f"correct: {'yes' if correct else 'no'}\n"
+                f"precision: {precision}\n"
+                f"final precision: {precision}")
+    gold_answers = [a.strip() for a in correct_answer.split(" | ") if a.strip()] or ["NULL"]
+    overlapping = gold_answers[:max(1, len(gold_answers) // 2)] if correct else []
+    return (f"extracted_final_answer: {', '.join(gold_answers)}\n"
+            f"final answer length: {len(gold_answers)}\n"
+            f"reasoning: Mock judgment.\n"
+            f"correct: {'yes' if correct else 'no'}\n"
+            f"overlapping answers: {'###'.join(overlapping) if overlapping else 'NULL'}")
+
+
+def generate_reply(prompt: str, config: MockConfig, rng: random.Random) -> str:
+    """Canned answer or templated judgment for a prompt."""
+    if prompt.startswith("Judge each of the"):
+        items = ITEM_HEADER_PATTERN.findall(prompt)
+        correct_answers = CORRECT_ANSWER_PATTERN.findall(prompt)
+        sections = []
+        for (item_number, item_type), correct_answer in zip(items, correct_answers):
+            judgment = _judgment_for(correct_answer, item_type == "multi", rng.random() < config.judge_correct_rate)
+            sections.append(f"=== JUDGMENT {item_number} ===\n{judgment}")
+        return "\n\n".join(sections)
+    if prompt.startswith("Judge whether"):
+        correct_answers = CORRECT_ANSWER_PATTERN.findall(prompt)
+        multi = "final answer length:" in prompt
+        return _judgment_for(correct_answers[0] if correct_answers else "", multi,
+                             rng.random() < config.judge_correct_rate)
+    return " ".join([config.answer_text] * max(1, config.answer_repeat))
+
+
+def sample_latency(config: MockConfig, rng: random.Random, output_tokens: int) -> float:
+    """Seconds to wait before replying."""
+    base = config.latency_ms / 1000
+    if config.latency == "uniform":
+        seconds = rng.uniform(base * (1 - config.latency_spread), base * (1 + config.latency_spread))
+    elif config.latency == "lognormal":
+        seconds = base * rng.lognormvariate(0, config.latency_spread)
+    else:
+        seconds = base
+    return max(0.0, seconds) + output_tokens * config.ms_per_output_token / 1000
+
+
+def make_handler(config: MockConfig, window: MinuteWindow, stats: MockStats):
+    rng = random.Random(config.seed)
+    rng_lock = threading.Lock()
+
+    def roll() -> float:
+        with rng_lock:
+            return rng.random()
+
+    class MockHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _rate_limited(self, gemini: bool, retry_after: float):
+            stats.count("rate_limited")
+            headers = {"Retry-After": str(max(1, int(retry_after + 0.999)))}
+            if gemini:
+                self._send_json(429, {"error": {"code": 429, "message": "Resource has been exhausted (mock)",
+                                                "status": "RESOURCE_EXHAUSTED"}}, headers)
+            else:
+                self._send_json(429, {"error": {"message": "Rate limit reached (mock)", "type": "requests",
+                                                "code": "rate_limit_exceeded"}}, headers)
+
+        def _stream(self, model: str, reply: str, usage: Tuple[int, int], gemini: bool):
+            """Send reply piece by piece (OpenAI: SSE, Gemini: a streamed JSON array), then close."""
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json" if gemini else "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            pieces = STREAM_PIECE_PATTERN.findall(reply) or [""]
+            try:
+                for i, piece in enumerate(pieces):
+                    if i:
+                        time.sleep(estimate_tokens(piece) * config.ms_per_output_token / 1000)
+                    last = i == len(pieces) - 1
+                    if gemini:
+                        chunk = gemini_response(piece, usage if last else (usage[0], 0), finished=last)
+                        self.wfile.write((("[" if i == 0 else ",\r\n") + json.dumps(chunk)).encode("utf-8"))
+                    else:
+                        chunk = chat_completion_chunk(model, piece, "stop" if last else None)
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                if gemini:
+                    self.wfile.write(b"]")
+                else:
+                    usage_chunk = dict(chat_completion_chunk(model, None, None), choices=[], usage={
+                        "prompt_tokens": usage[0], "completion_tokens": usage[1], "total_tokens": sum(usage)})
+                    self.wfile.write(f"data: {json.dumps(usage_chunk)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # The client aborted the stream early
+                stats.count("streams_aborted")
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, stats.as_dict())
+            else:
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            path = self.path.split("?")[0]
+            gemini_match = GEMINI_PATH_PATTERN.match(path)
+            if path.endswith("/chat/completions"):
+                prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+                model = request.get("model", "mock")
+                stream = bool(request.get("stream"))
+            elif gemini_match:
+                prompt = "\n".join(part.get("text", "") for content in request.get("contents", [])
+                                   for part in content.get("parts", []))
+                model = gemini_match.group(1)
+                stream = gemini_match.group(2) == "streamGenerateContent"
+            else:
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                return
+            stats.count("requests")
+
+            with rng_lock:
+                reply = generate_reply(prompt, config, rng)
+            prompt_tokens = estimate_tokens(prompt)
+            completion_tokens = estimate_tokens(reply)
+
+            if roll() < config.error_rate:
+                self._rate_limited(bool(gemini_match), 1.0)
+                return
+            retry_after = window.admit(prompt_tokens + completion_tokens)
+            if retry_after is not None:
+                self._rate_limited(bool(gemini_match), retry_after)
+                return
+            if roll() < config.timeout_rate:
+                stats.count("hung")
+                time.sleep(config.hang_seconds)
+            usage = (prompt_tokens, completion_tokens)
+            if stream:
+                with rng_lock:
+                    latency = sample_latency(config, rng, 0)
+                time.sleep(latency)
+                self._stream(model, reply, usage, bool(gemini_match))
+                stats.count("completed")
+                return
+            with rng_lock:
+                latency = sample_latency(config, rng, completion_tokens)
+            time.sleep(latency)
+            stats.count("completed")
+
+            if gemini_match:
+                self._send_json(200, gemini_response(reply, usage))
+            else:
+                self._send_json(200, chat_completion_response(model, reply, usage))
+
+    return MockHandler
+
+
+def chat_completion_response(model: str, reply: str, usage: Tuple[int, int]) -> Dict[str, Any]:
+    return {
+        "id": f"chatcmpl-mock-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": usage[0], "completion_tokens": usage[1], "total_tokens": sum(usage)}
+    }
+
+
+def chat_completion_chunk(model: str, piece: Optional[str], finish_reason: Optional[str]) -> Dict[str, Any]:
+    return {
+        "id": "chatcmpl-mock-stream",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": finish_reason}]
+    }
+
+
+def gemini_response(reply: str, usage: Tuple[int, int], finished: bool = True) -> Dict[str, Any]:
+    candidate = {"content": {"parts": [{"text": reply}], "role": "model"}, "index": 0}
+    if finished:
+        candidate["finishReason"] = "STOP"
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {"promptTokenCount": usage[0], "candidatesTokenCount": usage[1],
+                          "totalTokenCount": sum(usage)}
+    }
+
+
+def run_server(host: str, port: int, config: MockConfig) -> ThreadingHTTPServer:
+    """Start the mock server in a background thread and return it (call .shutdown() to stop)."""
+    server = ThreadingHTTPServer((host, port), make_handler(
+        config, MinuteWindow(config.requests_per_minute, config.tokens_per_minute), MockStats()
+    ))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI/Gemini server for offline load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="fixed",
+                       help="Latency distribution (default: fixed)")
+    parser.add_argument("--latency_ms", type=float, default=200.0,
+                       help="Fixed latency, uniform mean or lognormal median in ms (default: 200)")
+    parser.add_argument("--latency_spread", type=float, default=0.5,
+                       help="Uniform +/- fraction or lognormal sigma (default: 0.5)")
+    parser.add_argument("--ms_per_output_token", type=float, default=0.0,
+                       help="Extra latency per generated token in ms (default: 0)")
+    parser.add_argument("--error_rate", type=float, default=0.0,
+                       help="Fraction of requests answered with 429 (default: 0)")
+    parser.add_argument("--timeout_rate", type=float, default=0.0,
+                       help="Fraction of requests that hang for --hang_seconds (default: 0)")
+    parser.add_argument("--hang_seconds", type=float, default=120.0)
+    parser.add_argument("--requests_per_minute", type=int, default=None,
+                       help="Answer 429 once this many requests were served in the last minute")
+    parser.add_argument("--tokens_per_minute", type=int, default=None,
+                       help="Answer 429 once this many tokens were served in the last minute")
+    parser.add_argument("--judge_correct_rate", type=float, default=0.5,
+                       help="Fraction of judged answers marked correct (default: 0.5)")
+    parser.add_argument("--answer_text", default=MockConfig.answer_text,
+                       help="Canned answer for non-judge prompts")
+    parser.add_argument("--answer_repeat", type=int, default=1,
+                       help="Repeat the canned answer N times, e.g. to test streaming early aborts (default: 1)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency=args.latency,
+        latency_ms=args.latency_ms,
+        latency_spread=args.latency_spread,
+        ms_per_output_token=args.ms_per_output_token,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        hang_seconds=args.hang_seconds,
+        requests_per_minute=args.requests_per_minute,
+        tokens_per_minute=args.tokens_per_minute,
+        judge_correct_rate=args.judge_correct_rate,
+        answer_text=args.answer_text,
+        answer_repeat=args.answer_repeat,
+        seed=args.seed
+    )
+    server = run_server(args.host, args.port, config)
+    print(f"🧪 Mock LLM server on http://{args.host}:{args.port}")
+    print(f"   OpenAI base URL: http://{args.host}:{args.port}/v1")
+    print(f"   Gemini base URL: http://{args.host}:{args.port}")
+    print(f"   Stats: http://{args.host}:{args.port}/stats")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("👋 Mock server stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Provider adapters for answering one prompt with several models (run_multi_model_oracle.py).
+
+Each adapter puts one model behind the same `answer(prompt) -> str` call, with its own
+rate limiter, so the fan-out runner can send a question's prompt to every model at
+once without caring which provider serves it. OpenAI-compatible models go through
+the scalable runner's chat-completions path and Gemini models through the Gemini
+runner's generate-content path, so retries, response caching, streaming and
+telemetry behave exactly as in the single-model runners. google.generativeai is
+only imported when a Gemini model is configured.
+"""
+
+import os
+import sys
+from typing import Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache
+from run_oracle_retrieval_scalable import get_llm_response_with_retry
+
+PROVIDERS = ("openai", "gemini")
+
+
+def provider_for_model(model: str) -> str:
+    """Provider serving a model: Gemini for gemini-* models, otherwise the OpenAI-compatible endpoint."""
+    return "gemini" if model.lower().startswith("gemini") else "openai"
+
+
+class OpenAIAdapter:
+    """Model behind an OpenAI-compatible chat completions endpoint."""
+    provider = "openai"
+
+    def __init__(self, model: str, client, rate_limiter: RateLimiter, cache: Optional[ResponseCache] = None,
+                 stream: bool = False, max_output_tokens: Optional[int] = None):
+        self.model = model
+        self.client = client
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.stream = stream
+        self.max_output_tokens = max_output_tokens
+
+    def answer(self, prompt: str) -> str:
+        return get_llm_response_with_retry(self.client, prompt, self.model, self.rate_limiter, self.cache,
+                                           self.stream, self.max_output_tokens)
+
+
+class GeminiAdapter:
+    """Gemini model through google.generativeai."""
+    provider = "gemini"
+
+    def __init__(self, model: str, google_api_key: str, rate_limiter: RateLimiter,
+                 cache: Optional[ResponseCache] = None, stream: bool = False,
+                 max_output_tokens: Optional[int] = None, base_url: Optional[str] = None):
+        import google.generativeai as genai
+        from run_gemini_oracle import get_gemini_response_with_retry
+        # REST transport when pointed at another endpoint (e.g. mock_llm_server.py)
+        if base_url:
+            genai.configure(api_key=google_api_key, transport="rest", client_options={"api_endpoint": base_url})
+        else:
+            genai.configure(api_key=google_api_key)
+        self.model = model
+        self.gemini_model = genai.GenerativeModel(model)
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.stream = stream
+        self.max_output_tokens = max_output_tokens
+        self._get_response = get_gemini_response_with_retry
+
+    def answer(self, prompt: str) -> str:
+        return self._get_response(self.gemini_model, prompt, self.rate_limiter, self.cache,
+                                  self.stream, self.max_output_tokens)
+
+
+def make_adapter(model: str, rate_limiter: RateLimiter, openai_client=None, google_api_key: Optional[str] = None,
+                 gemini_base_url: Optional[str] = None, cache: Optional[ResponseCache] = None,
+                 stream: bool = False, max_output_tokens: Optional[int] = None):
+    """Adapter for a model, picked by provider_for_model."""
+    if provider_for_model(model) == "gemini":
+        if not google_api_key:
+            raise ValueError(f"{model} needs a Google API key (--google_api_key)")
+        return GeminiAdapter(model, google_api_key, rate_limiter, cache, stream, max_output_tokens, gemini_base_url)
+    if openai_client is None:
+        raise ValueError(f"{model} needs an OpenAI API key (--openai_api_key)")
+    return OpenAIAdapter(model, openai_client, rate_limiter, cache, stream, max_output_tokens)
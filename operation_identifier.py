@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 
 from consts import COMPARISON_OPS, SUPERLATIVE_OPS, ARITHMETIC_OPS, AGGREGATE_OPS, COMPARISON_STEP_OPS
 from decomposition_utils import decomposition_to_steps, extract_references
@@ -24,7 +25,85 @@ OP_TOP_K = "top_k"
 OP_K_ITEM = "k_item"
 
 
+# Operator grammars compiled once, in identify_operation's priority order. Each entry is
+# (operation, literal every match must contain, patterns tried with re.search). The
+# literal gate is a cheap substring test that skips the regexes for steps that cannot
+# match; the patterns are the ones built by the is_* predicates below (the reference).
+_REF = "#[1-9][0-9]?"
+_ARITHMETIC_OP = f"({'|'.join(ARITHMETIC_OPS)})"
+_AGGREGATE_OP = f"({'|'.join(AGGREGATE_OPS)})"
+_K_ITEM_OP = "(first|second|third|fourth|fifth|sixth|seventh|eighth|ninth|tenth)"
+_FILTER_RULES = [
+    (OP_FILTER_BOOLEAN, f"return {_REF} where {_REF} is (true|false)$"),
+    (OP_FILTER_COMPARE, f"return {_REF} where {_REF} [is]*( {' | '.join(COMPARISON_OPS)} )"),
+    # is_filter_value excludes superlatives, so they are tried first
+    (OP_FILTER_SUPERLATIVE, f"return {_REF} where {_REF} is ({'|'.join(SUPERLATIVE_OPS)})$"),
+    (OP_FILTER_VALUE, f"return {_REF} where {_REF} is "),
+]
+_OPERATOR_RULES = [(op, " where #", [re.compile(pattern)]) for op, pattern in _FILTER_RULES] + [
+    (OP_ARITHMETIC, " of ", [re.compile(f"[return] [the ]?{_ARITHMETIC_OP} of {_REF} and {_REF}$"),
+                             re.compile(f"[return] [the ]?{_ARITHMETIC_OP} of {_REF} and [0-9]*$"),
+                             re.compile(f"[return] [the ]?{_ARITHMETIC_OP} of [0-9]* and {_REF}$")]),
+    (OP_AGGREGATE, "#", [re.compile(f"[return] [the ]?{_AGGREGATE_OP} of {_REF}$"),
+                         re.compile(f"[return] [the ]?different {_REF}$")]),
+    (OP_GROUP, " for each #", [re.compile(f"[return] [the ]?{_AGGREGATE_OP} of {_REF} for each {_REF}$")]),
+    (OP_INTERSECT, " in both #", [re.compile(rf"[return] [\s\S]+ in both {_REF} and {_REF}$")]),
+    (OP_DISCARD_LIST, " besides #", [re.compile(f"[return] {_REF} besides {_REF}$")]),
+    (OP_DISCARD_VALUE, " besides ", [re.compile(rf"[return] {_REF} besides [\s\S]+$")]),
+]
+_COMPARISON_STEP_RE = re.compile(f"return which is ({'|'.join(COMPARISON_STEP_OPS)}) of [#[1-9][0-9]?, #[1-9][0-9]?")
+_LATE_OPERATOR_RULES = [
+    (OP_BOOLEAN_AND, "return if both #", [re.compile(f"return if both {_REF} and {_REF} are (true|false)$")]),
+    (OP_BOOLEAN_COMPARE, "return if #", [re.compile(f"return if {_REF} is( {' | '.join(COMPARISON_OPS)} )")]),
+]
+_UNION_RE = re.compile(f"return {_REF}, ({_REF}, )*{_REF}$")
+_FINAL_OPERATOR_RULES = [
+    (OP_SORT, "ed by ", [re.compile(f"[return] {_REF} (sorted by|ordered by) ({_REF})*")]),
+    (OP_TOP_K, "top ", [re.compile(rf"[return] [ the]?top [\s\S]+ of {_REF}$")]),
+    (OP_K_ITEM, " of #", [re.compile(f"[return] [the ]?{_K_ITEM_OP} of {_REF}$")]),
+]
+
+
+def _match_rules(step_text, rules):
+    for op, literal, patterns in rules:
+        if literal in step_text and any(p.search(step_text) for p in patterns):
+            return op
+    return None
+
+
+@lru_cache(maxsize=65536)
+def _classify(step_text):
+    """Operation of a lower-cased, stripped step; every operator grammar is tried at most once."""
+    if "#" not in step_text:  # every operator refers to an earlier step
+        return None
+    op = _match_rules(step_text, _OPERATOR_RULES)
+    if op is not None:
+        return op
+    comparison_step = step_text.replace(" ,", ",")
+    if "return which is " in comparison_step and _COMPARISON_STEP_RE.search(comparison_step):
+        if "which is true of " in step_text or "which is false of " in step_text:
+            return OP_COMPARISON_BOOLEAN
+        return OP_COMPARISON_NUM
+    op = _match_rules(step_text, _LATE_OPERATOR_RULES)
+    if op is not None:
+        return op
+    norm_step = step_text.replace("  ", " ").replace(" , ", ", ").replace(",#", ", #").strip()
+    if "return #" in norm_step and _UNION_RE.search(norm_step):
+        return OP_UNION
+    return _match_rules(step_text, _FINAL_OPERATOR_RULES)
+
+
 def identify_operation(step_text):
+    return _classify(step_text.lower().strip())
+
+
+def identify_operations(steps):
+    """Operation of every step (None for steps that are not QDMR operations)."""
+    return [_classify(step.lower().strip()) for step in steps]
+
+
+def identify_operation_by_predicates(step_text):
+    """Reference classifier chaining the is_* predicates; identify_operation must agree with it."""
     step_text = step_text.lower().strip()
     if is_filter_boolean(step_text):
         return OP_FILTER_BOOLEAN
@@ -226,9 +305,6 @@ def is_valid_qdmr(qdmr_string):
         3. No step refers to itself or to future steps
         4. Steps that are not used in the decomposition"""
 
-    def is_valid_op(step):
-        return identify_operation(step) is not None
-
     def no_dup_steps():
         norm_steps = [s.lower().strip() for s in steps]
         if len(norm_steps) == len(remove_duplicates_from_list(norm_steps)):
@@ -264,8 +340,8 @@ def is_valid_qdmr(qdmr_string):
         if len(s.strip()) > 0:  # remove empty steps
             new_steps += [s]
     steps = new_steps
-    for s in steps:
-        if not is_valid_op(s) and s.startswith("return "):  # discrete step with invalid op
+    for s, op in zip(steps, identify_operations(steps)):
+        if op is None and s.startswith("return "):  # discrete step with invalid op
             print(f"* Invalid op: {s}")
             return False
     return no_dup_steps() and no_future_refs() and unused_steps()
@@ -0,0 +1,200 @@
+"""
+Two-stage producer/consumer pipeline for the evaluation runners.
+
+Answer workers take questions from an input queue, call the answer model and hand
+their output to judge workers through a bounded queue. The two stages have their
+own worker counts (and, in the runners, their own rate limiters), so when the
+answer model is slow the judge workers keep draining whatever is queued, and when
+the judge falls behind the bounded queue applies back-pressure to the answer stage.
+With judge_batch_size > 1 each judge worker takes up to that many queued answers
+at once, so a batched judge prompt can score them in a single request.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+_STOP = object()
+
+
+class QueueDepthMetrics:
+    """Thread-safe running statistics about the hand-off queue."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = 0
+        self.depth_sum = 0
+        self.max_depth = 0
+        self.answer_blocked_seconds = 0.0
+        self.judge_idle_seconds = 0.0
+        self.answered = 0
+        self.judged = 0
+        self.answer_failures = 0
+        self.judge_failures = 0
+
+    def record_depth(self, depth: int):
+        with self._lock:
+            self.samples += 1
+            self.depth_sum += depth
+            self.max_depth = max(self.max_depth, depth)
+
+    def add(self, field: str, value=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + value)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_queue_depth": self.max_depth,
+                "mean_queue_depth": self.depth_sum / self.samples if self.samples else 0.0,
+                "answer_blocked_seconds": self.answer_blocked_seconds,
+                "judge_idle_seconds": self.judge_idle_seconds,
+                "answered": self.answered,
+                "judged": self.judged,
+                "answer_failures": self.answer_failures,
+                "judge_failures": self.judge_failures
+            }
+
+
+class TwoStagePipeline:
+    """Run answer_fn and judge_fn on separate thread pools joined by a bounded queue.
+
+    answer_fn(item) returns the intermediate answer, or None to drop the item.
+    judge_fn(answer) returns the final result, or None on failure. With
+    judge_batch_size > 1, judge_fn takes a list of answers and returns a list of
+    results in the same order; a judge worker waits up to judge_batch_timeout
+    seconds for a batch to fill before judging what it has.
+    Exceptions from either function are treated as a failure for that item (or batch).
+    """
+
+    def __init__(self, answer_fn: Callable[[Any], Optional[Any]], judge_fn: Callable[[Any], Any],
+                 answer_workers: int, judge_workers: int, queue_size: Optional[int] = None,
+                 logger=None, judge_batch_size: int = 1, judge_batch_timeout: float = 1.0):
+        self.answer_fn = answer_fn
+        self.judge_fn = judge_fn
+        self.answer_workers = max(1, answer_workers)
+        self.judge_workers = max(1, judge_workers)
+        self.judge_batch_size = max(1, judge_batch_size)
+        self.judge_batch_timeout = judge_batch_timeout
+        self.queue_size = queue_size or 2 * self.judge_workers * self.judge_batch_size
+        self.logger = logger
+        self.metrics = QueueDepthMetrics()
+        self._handoff: Optional[queue.Queue] = None
+
+    def queue_depth(self) -> int:
+        """Current number of answers waiting for a judge."""
+        return self._handoff.qsize() if self._handoff is not None else 0
+
+    def _log_error(self, message: str):
+        if self.logger is not None:
+            self.logger.error(message)
+
+    def run(self, items: Iterable[Any]) -> Iterator[Tuple[Any, Optional[Any]]]:
+        """Yield (item, result) pairs in completion order; result is None for failed items.
+
+        Results are yielded on the calling thread, so callers can update progress and
+        checkpoints without extra locking.
+        """
+        items = list(items)
+        pending: queue.Queue = queue.Queue()
+        for item in items:
+            pending.put(item)
+        handoff: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        finished: queue.Queue = queue.Queue()
+        self._handoff = handoff
+        answer_workers_left = [self.answer_workers]
+        answer_workers_lock = threading.Lock()
+
+        def answer_worker():
+            try:
+                while True:
+                    try:
+                        item = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        answer = self.answer_fn(item)
+                    except Exception as e:
+                        self._log_error(f"Answer stage failed: {e}")
+                        answer = None
+                    if answer is None:
+                        self.metrics.add("answer_failures")
+                        finished.put((item, None))
+                        continue
+                    self.metrics.add("answered")
+                    wait_start = time.time()
+                    handoff.put((item, answer))
+                    self.metrics.add("answer_blocked_seconds", time.time() - wait_start)
+                    self.metrics.record_depth(handoff.qsize())
+            finally:
+                with answer_workers_lock:
+                    answer_workers_left[0] -= 1
+                    last_worker = answer_workers_left[0] == 0
+                if last_worker:
+                    for _ in range(self.judge_workers):
+                        handoff.put(_STOP)
+
+        def take_batch():
+            """Block for one answer, then collect up to judge_batch_size; True once _STOP is seen."""
+            wait_start = time.time()
+            entry = handoff.get()
+            self.metrics.add("judge_idle_seconds", time.time() - wait_start)
+            if entry is _STOP:
+                return [], True
+            batch = [entry]
+            deadline = time.time() + self.judge_batch_timeout
+            while len(batch) < self.judge_batch_size:
+                try:
+                    entry = handoff.get(timeout=max(0.0, deadline - time.time()))
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    return batch, True
+                batch.append(entry)
+            return batch, False
+
+        def judge_worker():
+            while True:
+                batch, stopped = take_batch()
+                if batch:
+                    self.metrics.record_depth(handoff.qsize())
+                    items = [item for item, _ in batch]
+                    answers = [answer for _, answer in batch]
+                    try:
+                        if self.judge_batch_size > 1:
+                            results = self.judge_fn(answers)
+                        else:
+                            results = [self.judge_fn(answers[0])]
+                    except Exception as e:
+                        self._log_error(f"Judge stage failed: {e}")
+                        results = [None] * len(batch)
+                    if len(results) != len(batch):
+                        self._log_error(f"Judge stage returned {len(results)} results for {len(batch)} answers")
+                        results = [None] * len(batch)
+                    for item, result in zip(items, results):
+                        self.metrics.add("judged" if result is not None else "judge_failures")
+                        finished.put((item, result))
+                if stopped:
+                    return
+
+        threads = [threading.Thread(target=answer_worker, daemon=True) for _ in range(self.answer_workers)]
+        threads += [threading.Thread(target=judge_worker, daemon=True) for _ in range(self.judge_workers)]
+        for thread in threads:
+            thread.start()
+        for _ in range(len(items)):
+            yield finished.get()
+        for thread in threads:
+            thread.join()
+        self._handoff = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Pipeline configuration and queue-depth metrics for run metadata."""
+        stats = {
+            "answer_workers": self.answer_workers,
+            "judge_workers": self.judge_workers,
+            "judge_batch_size": self.judge_batch_size,
+            "queue_size": self.queue_size
+        }
+        stats.update(self.metrics.as_dict())
+        return stats
@@ -0,0 +1,226 @@
+"""
+Deterministic pre-judge for the evaluation runners.
+
+Many MoNaCo questions have a single number, yes/no or short string as their gold
+answer. For those the LLM judge is not needed when the response is unambiguous, so
+the pre-judge applies the judge prompt's own rules locally:
+- numbers: a response that is just a number (optionally with % or a unit word) is scored
+  with the prompt's normalized similarity formula (a 1-3.5 point margin counts as correct
+  when a % is given); years and scaled amounts ("2 million") are left to the LLM judge
+- booleans: a response that opens with a BOOLEAN_TRUE_KEYWORDS/BOOLEAN_FALSE_KEYWORDS word
+- strings: a response that is exactly the gold answer or one of its aliases
+- empty or "unknown" responses, which score zero for any question
+
+It writes a judgment in the judge prompt's format and scores it with
+compute_llm_judge_score_V2, so results look the same as LLM-judged ones. Anything
+it is unsure about is left to the LLM judge.
+"""
+
+import os
+import re
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompts'))
+
+from consts import ANS_ALIAS_CACHE, BOOLEAN_TRUE_KEYWORDS, BOOLEAN_FALSE_KEYWORDS, UNKNOWN_ANSWERS
+from utils import load_json
+from prompts.evaluate_final_answers import compute_llm_judge_score_V2
+
+# Longer responses are usually explanations where a lone number may not be the answer
+MAX_PRE_JUDGE_RESPONSE_CHARS = 500
+# Margin of error for percentages, matching single_answer_llm_judge_prompt
+PERCENTAGE_POINT_TOLERANCE = 3.5
+
+# A whole normalized response that is one number, optionally with a currency sign, % or one unit word
+NUMBER_RESPONSE_PATTERN = re.compile(r"^[$€£]?\s?(-?\d{1,3}(?:,\d{3})+(?:\.\d+)?|-?\d+(?:\.\d+)?)"
+                                     r"(?:\s?(%)|\s([^\W\d_][^\s\d]*))?$")
+DOCUMENT_REFERENCE_PATTERN = re.compile(r"\bdoc(?:ument)?s?\.?\s*#?\d+(?:\s*(?:,|and|&)\s*#?\d+)*", re.IGNORECASE)
+SCALE_WORDS_PATTERN = re.compile(r"\b(?:hundreds?|thousands?|millions?|billions?|trillions?|k|m|mn|bn|b)\b",
+                                 re.IGNORECASE)
+# Integers in this range are treated as years, which the judge scores as right or wrong, not by similarity
+YEAR_RANGE = (1000, 2100)
+STRIP_CHARS = " \t\n\"'*`_.,;:!?()[]"
+
+
+def normalize_answer(text: Any) -> str:
+    """Lowercase, trim punctuation/markdown and a leading article."""
+    text = str(text).strip().strip(STRIP_CHARS).lower()
+    text = re.sub(r"\s+", " ", text)
+    for article in ("the ", "a ", "an "):
+        if text.startswith(article):
+            text = text[len(article):]
+            break
+    return text
+
+
+def parse_number(value: Any) -> Optional[float]:
+    """Return value as a float if it is a plain number (or numeric string), else None."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().rstrip("%").replace(",", "")
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def parse_boolean(value: Any) -> Optional[bool]:
+    """Return value as a bool if it is a boolean or a boolean keyword, else None."""
+    if isinstance(value, bool):
+        return value
+    text = normalize_answer(value)
+    if text in [k.lower() for k in BOOLEAN_TRUE_KEYWORDS]:
+        return True
+    if text in [k.lower() for k in BOOLEAN_FALSE_KEYWORDS]:
+        return False
+    return None
+
+
+def is_year_like(value: float) -> bool:
+    return value.is_integer() and YEAR_RANGE[0] <= value <= YEAR_RANGE[1]
+
+
+def parse_number_response(response: str) -> Optional[Tuple[float, bool]]:
+    """(number, has_percent_sign) if the response, minus "Doc N" citations, is just a number, else None."""
+    text = normalize_answer(DOCUMENT_REFERENCE_PATTERN.sub(" ", response))
+    if SCALE_WORDS_PATTERN.search(text):
+        return None
+    match = NUMBER_RESPONSE_PATTERN.match(text)
+    if match is None:
+        return None
+    return float(match.group(1).replace(",", "")), match.group(2) is not None
+
+
+def numeric_similarity(gold: float, predicted: float) -> float:
+    """The judge prompt's normalized similarity score for numerical answers."""
+    if gold == predicted:
+        return 1.0
+    return max(0.0, 1 - abs(gold - predicted) / max(abs(gold), abs(predicted)))
+
+
+def build_single_answer_judgment(extracted: Any, reasoning: str, correct: bool, precision: float) -> str:
+    """Judgment text in the single_answer_llm_judge_prompt format."""
+    precision = round(precision, 4)
+    return (f"extracted_final_answer: {extracted}\n"
+            f"reasoning: {reasoning}\n"
+            f"correct: {'yes' if correct else 'no'}\n"
+            f"precision: {precision}\n"
+            f"final precision: {precision}")
+
+
+def build_empty_multi_answer_judgment(reasoning: str) -> str:
+    """Judgment text in the multi_answer_llm_judge_prompt format for a response with no answers."""
+    return (f"extracted_final_answer: None\n"
+            f"final answer length: 0\n"
+            f"reasoning: {reasoning}\n"
+            f"correct: no\n"
+            f"overlapping answers: NULL")
+
+
+def load_alias_map(alias_file: Optional[str]) -> Dict[str, List[str]]:
+    """Load {answer: [aliases]} with normalized keys and values; empty if the file is missing."""
+    if not alias_file or not os.path.exists(alias_file):
+        return {}
+    aliases = {}
+    for answer, answer_aliases in load_json(alias_file).items():
+        if isinstance(answer_aliases, str):
+            answer_aliases = [answer_aliases]
+        aliases[normalize_answer(answer)] = [normalize_answer(alias) for alias in answer_aliases]
+    return aliases
+
+
+class PreJudge:
+    """Rule-based judge for trivially decidable answers; returns None when unsure."""
+
+    def __init__(self, enabled: bool = True, alias_file: Optional[str] = None):
+        self.enabled = enabled
+        self.aliases = load_alias_map(alias_file or ANS_ALIAS_CACHE) if enabled else {}
+        self._stats_lock = threading.Lock()
+        self.decided = 0
+        self.deferred = 0
+        self.rules: Dict[str, int] = {}
+
+    def judge(self, response: str, gold_answers: Any) -> Optional[Dict[str, Any]]:
+        """Return an evaluation dict like the LLM judge's, or None to defer to the LLM judge."""
+        if not self.enabled:
+            return None
+        decision = self._decide(response, gold_answers)
+        with self._stats_lock:
+            if decision is None:
+                self.deferred += 1
+                return None
+            rule, judgment, gold_answers_length = decision
+            self.decided += 1
+            self.rules[rule] = self.rules.get(rule, 0) + 1
+        return {
+            "judgment": judgment,
+            "scores": compute_llm_judge_score_V2(judgment, gold_answers_length),
+            "judged_by": f"pre_judge:{rule}"
+        }
+
+    def _decide(self, response: str, gold_answers: Any) -> Optional[Tuple[str, str, int]]:
+        gold_answers_length = len(gold_answers) if isinstance(gold_answers, list) else 1
+        if gold_answers_length == 0:
+            return None
+        normalized_response = normalize_answer(response or "")
+        gold_is_unknown = any(normalize_answer(g) in UNKNOWN_ANSWERS
+                              for g in (gold_answers if isinstance(gold_answers, list) else [gold_answers]))
+        if normalized_response in [""] + UNKNOWN_ANSWERS and not gold_is_unknown:
+            reasoning = "The response gives no answer."
+            if gold_answers_length > 1:
+                return "no_answer", build_empty_multi_answer_judgment(reasoning), gold_answers_length
+            return "no_answer", build_single_answer_judgment(None, reasoning, False, 0.0), 1
+        if gold_answers_length != 1 or len(response) > MAX_PRE_JUDGE_RESPONSE_CHARS:
+            return None
+
+        gold = gold_answers[0] if isinstance(gold_answers, list) else gold_answers
+        if isinstance(gold, (list, dict)):
+            return None
+
+        gold_boolean = parse_boolean(gold)
+        if gold_boolean is not None:
+            predicted = parse_boolean(re.split(r"[\s,.;:!]+", normalized_response, maxsplit=1)[0])
+            if predicted is None:
+                return None
+            correct = predicted == gold_boolean
+            reasoning = f"The response answers {predicted}, the correct answer is {gold_boolean}."
+            return "boolean", build_single_answer_judgment(predicted, reasoning, correct, float(correct)), 1
+
+        gold_number = parse_number(gold)
+        if gold_number is not None:
+            parsed = parse_number_response(response)
+            if parsed is None or SCALE_WORDS_PATTERN.search(str(gold)):
+                return None
+            predicted, has_percent_sign = parsed
+            if is_year_like(gold_number) or is_year_like(predicted):
+                return None
+            tolerance = PERCENTAGE_POINT_TOLERANCE if has_percent_sign or "%" in str(gold) else 0.0
+            correct = abs(predicted - gold_number) <= tolerance
+            reasoning = f"The response gives {predicted:g}, the correct answer is {gold_number:g}."
+            return ("number", build_single_answer_judgment(f"{predicted:g}", reasoning, correct,
+                                                           numeric_similarity(gold_number, predicted)), 1)
+
+        normalized_gold = normalize_answer(gold)
+        if normalized_response == normalized_gold:
+            rule = "exact"
+        elif normalized_response in self.aliases.get(normalized_gold, []):
+            rule = "alias"
+        else:
+            return None
+        reasoning = f"The response matches the correct answer{' via an alias' if rule == 'alias' else ''}."
+        return rule, build_single_answer_judgment(response.strip(), reasoning, True, 1.0), 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Counts of pre-judged answers (LLM judge calls avoided) for run metadata."""
+        with self._stats_lock:
+            return {
+                "enabled": self.enabled,
+                "judge_calls_avoided": self.decided,
+                "deferred_to_llm_judge": self.deferred,
+                "rules": dict(self.rules)
+            }
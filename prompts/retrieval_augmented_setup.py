@@ -1,9 +1,18 @@
+import os
+import json
+import mmap
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from utils import read_jsonl, write_to_json, remove_duplicates_from_list, load_json
+from rate_limiter import estimate_tokens
 from tqdm import tqdm
 
 
-def index_gold_documents_by_question(gold_docs_json, output_json_path):
-    """re-format the annotated Wikipedia evidence into a question-to-evidence map format"""
+def load_gold_documents_by_question(gold_docs_json):
+    """parse the annotated Wikipedia evidence (JSON map, JSON list or JSONL) into a question-to-evidence map"""
     question_docs_map = {}
     
     # Try to load as regular JSON first, then fall back to JSONL
@@ -21,7 +30,12 @@ def index_gold_documents_by_question(gold_docs_json, output_json_path):
         data = read_jsonl(gold_docs_json)
         for ex in tqdm(data):
             question_docs_map[ex["question_text"]] = ex["contexts"]
-    
+    return question_docs_map
+
+
+def index_gold_documents_by_question(gold_docs_json, output_json_path):
+    """re-format the annotated Wikipedia evidence into a question-to-evidence map format"""
+    question_docs_map = load_gold_documents_by_question(gold_docs_json)
     write_to_json(question_docs_map, output_json_path)
     print(f"* Wrote {len(question_docs_map)} question - gold documents examples to: {output_json_path}")
     return True
@@ -38,28 +52,218 @@ def index_bm25_documents_by_question(retrieved_evidence_json, output_json_path):
     return True
 
 
+def format_gold_documents(relevant_documents):
+    """Format Oracle contexts as deduplicated "*** Document title ... *** Document contents" strings."""
+    formatted_docs = []
+    for doc in relevant_documents:
+        if len(doc['text'].lower().strip()) == 0:
+            continue
+        doc_string = f"*** Document title: {doc['section_path']}\n*** Document contents:\n{doc['text']}"
+        formatted_docs += [doc_string]
+    return remove_duplicates_from_list(formatted_docs)
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer():
+    """The cl100k_base tokenizer, or None if tiktoken (or its encoding file) is unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def tokenizer_name():
+    return "tiktoken:cl100k_base" if get_tokenizer() is not None else "estimate"
+
+
+def count_tokens(text):
+    """Token count with the cl100k_base tokenizer when available, else the rate limiter's estimate."""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return estimate_tokens(text)
+    return len(tokenizer.encode(text, disallowed_special=()))
+
+
+class DocumentStore:
+    """Read-only, deduplicated store of formatted Oracle documents backed by an mmap'ed binary file.
+
+    Each unique formatted document ("*** Document title ... *** Document contents") is
+    stored once under a content hash together with its token count, and each question
+    is stored as the list of its document IDs, so Wikipedia sections shared between
+    questions are formatted, counted and held in memory only once. The store file is
+    built next to the source docs file and reused by every process while the source
+    file's size and mtime (and the tokenizer) are unchanged. Layout: a fixed header
+    (magic, version, index offset/length, source size/mtime), the document texts, then
+    a JSON index of {tokenizer, documents: id -> [offset, length, tokens], questions: question -> [ids]}.
+    """
+
+    MAGIC = b"MONACODS"
+    VERSION = 2
+    HEADER = struct.Struct("<8sIQQQq")
+
+    def __init__(self, gold_docs_json, store_path=None):
+        self.gold_docs_json = gold_docs_json
+        self.store_path = store_path or f"{gold_docs_json}.docstore"
+        self.built = False
+        if not self._is_current() or not self._open():
+            self.build(gold_docs_json, self.store_path)
+            self.built = True
+            self._open()
+
+    def _open(self):
+        """Map the store file and load its index; False if it was built with another tokenizer."""
+        self._file = open(self.store_path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        _, _, index_offset, index_length, _, _ = self.HEADER.unpack_from(self._mmap, 0)
+        index = json.loads(self._mmap[index_offset:index_offset + index_length].decode("utf-8"))
+        if index["tokenizer"] != tokenizer_name():
+            self.close()
+            return False
+        self._documents = index["documents"]
+        self._questions = index["questions"]
+        return True
+
+    @staticmethod
+    def _source_signature(gold_docs_json):
+        stat = os.stat(gold_docs_json)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _is_current(self):
+        if not os.path.exists(self.store_path):
+            return False
+        with open(self.store_path, "rb") as f:
+            header = f.read(self.HEADER.size)
+        if len(header) < self.HEADER.size:
+            return False
+        magic, version, _, _, source_size, source_mtime_ns = self.HEADER.unpack(header)
+        return (magic == self.MAGIC and version == self.VERSION
+                and (source_size, source_mtime_ns) == self._source_signature(self.gold_docs_json))
+
+    @classmethod
+    def build(cls, gold_docs_json, store_path):
+        """Write the binary store for gold_docs_json; the rename makes concurrent builds safe."""
+        source_size, source_mtime_ns = cls._source_signature(gold_docs_json)
+        question_docs_map = load_gold_documents_by_question(gold_docs_json)
+        tmp_path = f"{store_path}.tmp.{os.getpid()}"
+        documents = {}
+        questions = {}
+        with open(tmp_path, "wb") as f:
+            f.write(b"\0" * cls.HEADER.size)
+            for question, contexts in question_docs_map.items():
+                doc_ids = []
+                for doc_string in format_gold_documents(contexts):
+                    record = doc_string.encode("utf-8")
+                    doc_id = hashlib.sha256(record).hexdigest()[:20]
+                    if doc_id not in documents:
+                        documents[doc_id] = [f.tell(), len(record), count_tokens(doc_string)]
+                        f.write(record)
+                    doc_ids.append(doc_id)
+                questions[question] = doc_ids
+            index_offset = f.tell()
+            index = {"tokenizer": tokenizer_name(), "documents": documents, "questions": questions}
+            index_bytes = json.dumps(index, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            f.write(index_bytes)
+            f.seek(0)
+            f.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, index_offset, len(index_bytes),
+                                    source_size, source_mtime_ns))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, store_path)
+        total_refs = sum(len(doc_ids) for doc_ids in questions.values())
+        print(f"* Wrote {len(questions)} question - gold documents examples "
+              f"({len(documents)} unique of {total_refs} documents) to: {store_path}")
+
+    def __contains__(self, question_text):
+        return question_text in self._questions
+
+    def __len__(self):
+        return len(self._questions)
+
+    def __iter__(self):
+        return iter(self._questions)
+
+    def keys(self):
+        return self._questions.keys()
+
+    def document_ids(self, question_text):
+        return self._questions[question_text]
+
+    def document(self, doc_id):
+        offset, length, _ = self._documents[doc_id]
+        return self._mmap[offset:offset + length].decode("utf-8")
+
+    def document_tokens(self, doc_id):
+        return self._documents[doc_id][2]
+
+    def question_document_tokens(self, question_text):
+        """Token counts of the question's formatted documents, in formatted_documents order."""
+        return [self.document_tokens(doc_id) for doc_id in self._questions[question_text]]
+
+    def formatted_documents(self, question_text):
+        """The question's formatted, deduplicated documents, as get_formatted_gold_documents_list returns them."""
+        return [self.document(doc_id) for doc_id in self._questions[question_text]]
+
+    def stats(self):
+        return {
+            "store_path": self.store_path,
+            "questions": len(self._questions),
+            "unique_documents": len(self._documents),
+            "tokenizer": tokenizer_name()
+        }
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+class PromptCache:
+    """Thread-safe LRU cache of built prompts keyed by (model, question)."""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._prompts = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, model, question_text, build_fn):
+        """Return the cached prompt for (model, question), building it with build_fn() on a miss."""
+        key = (model, question_text)
+        with self._lock:
+            if key in self._prompts:
+                self._prompts.move_to_end(key)
+                self.hits += 1
+                return self._prompts[key]
+            self.misses += 1
+        prompt = build_fn()
+        if prompt is not None and self.max_entries > 0:
+            with self._lock:
+                self._prompts[key] = prompt
+                while len(self._prompts) > self.max_entries:
+                    self._prompts.popitem(last=False)
+        return prompt
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._prompts), "hits": self.hits, "misses": self.misses}
+
+
 def get_formatted_gold_documents_list(question_text, question_evidence_dict, is_bm25_retrieval=None):
     if question_text not in question_evidence_dict:
         return None
+    if isinstance(question_evidence_dict, DocumentStore):
+        return question_evidence_dict.formatted_documents(question_text)
     relevant_documents = question_evidence_dict[question_text]
-    formatted_docs = []
-    for doc in relevant_documents:
-        if is_bm25_retrieval is True:
+    if is_bm25_retrieval is True:
+        formatted_docs = []
+        for doc in relevant_documents:
             section_path = doc['section_path']
             doc_contents = doc['paragraph_text'].replace(section_path, "").replace(":::\n\n", "").strip()
             doc_string = f"*** Document title: {section_path}\n*** Document contents:\n{doc_contents}"
             formatted_docs += [doc_string]
-            continue
-        if len(doc['text'].lower().strip()) == 0:
-            continue
-        doc_string = f"*** Document title: {doc['section_path']}\n*** Document contents:\n{doc['text']}"
-        formatted_docs += [doc_string]
-    formatted_docs = remove_duplicates_from_list(formatted_docs)
-    # for doc_str in formatted_docs:
-    #     print("*******************")
-    #     print(doc_str)
-    #     print("*******************")
-    return formatted_docs
+        return remove_duplicates_from_list(formatted_docs)
+    return format_gold_documents(relevant_documents)
 
 
 # index_gold_documents_by_question(gold_docs_json="../data/retrieval_documents/multi_step_rc_gold_docs_all_2025.jsonl",
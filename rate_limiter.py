@@ -0,0 +1,172 @@
+"""
+Token-bucket rate limiter shared by the MoNaCo evaluation runners.
+
+Two buckets are kept per limiter: one for requests per minute and an optional one
+for tokens per minute. Callers reserve capacity up front (the bucket may go into
+debt) and then sleep for the time it takes the bucket to refill, so concurrent
+workers queue fairly instead of all firing at once when the limit resets.
+
+Bucket state lives either in process memory (guarded by a lock) or in a small
+state file guarded by fcntl.flock, so several processes or SLURM jobs on the same
+node can share one quota. Put the state file under /dev/shm to keep it in memory.
+"""
+
+import os
+import json
+import time
+import asyncio
+import fcntl
+import threading
+from typing import Dict, Optional
+
+# Rough characters-per-token ratio used when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate for rate limiting (no tokenizer dependency)."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _refill(state: Dict[str, float], capacity: float, rate_per_second: float, now: float) -> Dict[str, float]:
+    """Return bucket state refilled up to now."""
+    if not state:
+        return {"tokens": capacity, "updated": now}
+    elapsed = max(0.0, now - state["updated"])
+    return {"tokens": min(capacity, state["tokens"] + elapsed * rate_per_second), "updated": now}
+
+
+class MemoryBucketBackend:
+    """Bucket state held in this process, shared by all threads and coroutines."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, float]] = {}
+
+    def update(self, update_fn):
+        """Apply update_fn to the state dict atomically and return its result."""
+        with self._lock:
+            return update_fn(self._state)
+
+
+class FileBucketBackend:
+    """Bucket state kept in a JSON file and updated under an exclusive flock."""
+
+    def __init__(self, state_file: str):
+        self.state_file = state_file
+        directory = os.path.dirname(os.path.abspath(state_file))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def update(self, update_fn):
+        """Apply update_fn to the shared state atomically and return its result."""
+        with self._lock:
+            fd = os.open(self.state_file, os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                with os.fdopen(os.dup(fd), "r+", encoding="utf-8") as f:
+                    content = f.read()
+                    try:
+                        state = json.loads(content) if content.strip() else {}
+                    except json.JSONDecodeError:
+                        state = {}
+                    result = update_fn(state)
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(state, f)
+                    f.flush()
+                return result
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+
+class RateLimiter:
+    """Token-bucket rate limiter for requests and (optionally) tokens per minute.
+
+    burst is the request bucket capacity; the default of 1 spaces requests evenly
+    at 60 / requests_per_minute seconds. The token bucket holds one minute of quota.
+    concurrency is an optional adaptive_concurrency.AdaptiveConcurrency that also
+    caps the requests in flight for this limiter's stage.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: Optional[int] = None,
+                 burst: Optional[int] = None, state_file: Optional[str] = None, name: str = "default",
+                 concurrency=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.burst = max(1, burst or 1)
+        self.name = name
+        self.min_interval = 60.0 / requests_per_minute
+        self.backend = FileBucketBackend(state_file) if state_file else MemoryBucketBackend()
+        self.concurrency = concurrency
+        self._stats_lock = threading.Lock()
+        self.total_wait_time = 0.0
+        self.total_requests = 0
+
+    def reserve(self, tokens: int = 0) -> float:
+        """Take one request (and tokens) from the buckets; return seconds to wait before sending."""
+        request_key = f"{self.name}:requests"
+        token_key = f"{self.name}:tokens"
+
+        def take(state):
+            now = time.time()
+            request_bucket = _refill(state.get(request_key), self.burst, self.requests_per_minute / 60.0, now)
+            request_bucket["tokens"] -= 1
+            state[request_key] = request_bucket
+            wait = max(0.0, -request_bucket["tokens"] * self.min_interval)
+            if self.tokens_per_minute and tokens > 0:
+                token_bucket = _refill(state.get(token_key), self.tokens_per_minute,
+                                       self.tokens_per_minute / 60.0, now)
+                token_bucket["tokens"] -= tokens
+                state[token_key] = token_bucket
+                wait = max(wait, -token_bucket["tokens"] * 60.0 / self.tokens_per_minute)
+            return wait
+
+        wait = self.backend.update(take)
+        with self._stats_lock:
+            self.total_wait_time += wait
+            self.total_requests += 1
+        return wait
+
+    def settle(self, reserved_tokens: int, actual_tokens: Optional[int]):
+        """Correct the token bucket once the real usage of a request is known."""
+        if not self.tokens_per_minute or actual_tokens is None:
+            return
+        token_key = f"{self.name}:tokens"
+        delta = actual_tokens - reserved_tokens
+
+        def adjust(state):
+            bucket = _refill(state.get(token_key), self.tokens_per_minute, self.tokens_per_minute / 60.0, time.time())
+            bucket["tokens"] = min(self.tokens_per_minute, bucket["tokens"] - delta)
+            state[token_key] = bucket
+
+        self.backend.update(adjust)
+
+    def wait_if_needed(self, tokens: int = 0) -> float:
+        """Block until a request carrying `tokens` tokens may be sent; return the time waited."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def wait_if_needed_async(self, tokens: int = 0) -> float:
+        """Asyncio variant of wait_if_needed that does not block the event loop."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def stats(self) -> Dict[str, float]:
+        """Summary of limiter activity for run metadata."""
+        with self._stats_lock:
+            stats = {
+                "requests": self.total_requests,
+                "total_wait_seconds": self.total_wait_time,
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "burst": self.burst
+            }
+        if self.concurrency is not None:
+            stats["adaptive_concurrency"] = self.concurrency.stats()
+        return stats
@@ -8,11 +8,12 @@ import json
 import os
 import sys
 import time
+import argparse
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from tqdm import tqdm
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 import openai
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
@@ -22,6 +23,19 @@ sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompt
 
 from prompts.answer_judgement_prompt_V2 import single_answer_llm_judge_prompt, multi_answer_llm_judge_prompt
 from prompts.evaluate_final_answers import compute_llm_judge_score_V2
+from consts import BATCH_PRICE_FACTOR
+from rate_limiter import RateLimiter, estimate_tokens
+from response_cache import ResponseCache, make_cache_key
+from batch_api import BATCH_BACKENDS, BatchRunner, batch_request, make_batch_backend
+from pre_judge import PreJudge
+from adaptive_concurrency import AdaptiveConcurrency, concurrency_slot, wait_retry_after
+from telemetry import (RunTelemetry, StageTelemetry, api_call, estimate_cost, log_telemetry_summary, record_cache_hit,
+                       stage)
+from batch_judge import (JudgeItem, JUDGE_TOKENS_PER_ITEM, BatchJudgeStats, build_batched_judge_prompt,
+                         parse_batched_judgment, chunked)
+
+# Generation parameters sent with every judge call; also part of the response cache key
+JUDGE_GENERATION_PARAMS = {"max_tokens": 500, "temperature": 0.1}
 
 @dataclass
 class ReEvaluationConfig:
@@ -29,27 +43,29 @@ class ReEvaluationConfig:
     input_file: str
     output_file: str
     api_key: str
+    base_url: Optional[str] = None  # OpenAI-compatible endpoint (e.g. mock_llm_server.py); None = api.openai.com
     judge_model: str = "gpt-4.1"  # GPT-4.1 model
     max_workers: int = 3
     requests_per_minute: int = 60
+    tokens_per_minute: Optional[int] = None  # Token quota (None = requests only)
+    burst: int = 1  # Requests that may be sent back-to-back before spacing kicks in
+    rate_limit_state: Optional[str] = None  # Shared limiter state file (e.g. /dev/shm/...) for multi-job quotas
     checkpoint_interval: int = 25
+    cache_mode: str = "off"  # Response cache: "read", "write" or "off"
+    cache_file: str = "response_cache.sqlite"
+    cache_max_mb: int = 2048  # LRU eviction bound for the response cache
+    pre_judge: bool = False  # Score trivially decidable answers locally instead of calling the judge
+    alias_file: Optional[str] = None  # Answer alias map for the pre-judge (defaults to consts.ANS_ALIAS_CACHE)
+    judge_batch_size: int = 1  # Results judged per judge request (1 = one request per result)
+    adaptive_concurrency: bool = False  # AIMD requests in flight, starting from max_workers
+    max_concurrency: int = 32  # Upper bound for the adaptive limit (and the worker pool in adaptive mode)
+    latency_target: Optional[float] = None  # Seconds; the limit only grows below this (default: 2x best latency)
+    mode: str = "interactive"  # "interactive" (rate-limited API calls) or "batch" (provider Batch API jobs)
+    batch_backend: str = "openai"  # Batch API backend: "openai" or "local" (file-based stand-in)
+    batch_dir: Optional[str] = None  # Batch state directory for resuming (default: <output>.batch)
+    batch_poll_interval: float = 60.0  # Seconds between batch status polls
     max_retries: int = 3
 
-class RateLimiter:
-    """Simple rate limiter for API calls."""
-    def __init__(self, requests_per_minute: int):
-        self.requests_per_minute = requests_per_minute
-        self.min_interval = 60.0 / requests_per_minute
-        self.last_request_time = 0
-    
-    def wait_if_needed(self):
-        """Wait if necessary to respect rate limit."""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        if time_since_last < self.min_interval:
-            time.sleep(self.min_interval - time_since_last)
-        self.last_request_time = time.time()
-
 def setup_logging() -> logging.Logger:
     """Set up logging configuration."""
     logging.basicConfig(
@@ -62,47 +78,62 @@ def setup_logging() -> logging.Logger:
     )
     return logging.getLogger(__name__)
 
-def setup_openai_client(api_key: str):
-    """Initialize OpenAI client with API key."""
-    return openai.OpenAI(api_key=api_key)
+def setup_openai_client(api_key: str, base_url: Optional[str] = None,
+                        max_retries: int = openai.DEFAULT_MAX_RETRIES):
+    """Initialize OpenAI client with API key and optional OpenAI-compatible base URL."""
+    return openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=max_retries)
+
+def build_judge_prompt(question: str, response: str, correct_answer: str, gold_answers_length: int) -> str:
+    """Judge prompt for one answer; the multi-answer prompt when there are several gold answers."""
+    # Choose the appropriate prompt based on number of answers
+    if gold_answers_length == 1:
+        return single_answer_llm_judge_prompt.format(
+            question=question,
+            response=response,
+            correct_answer=correct_answer
+        )
+    return multi_answer_llm_judge_prompt.format(
+        question=question,
+        response=response,
+        correct_answer=correct_answer
+    )
 
 @retry(
     stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=1, max=60),
+    wait=wait_retry_after(wait_exponential(multiplier=1, min=1, max=60)),
     retry=retry_if_exception_type((openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError))
 )
 def evaluate_answer_with_gpt4_judge(client: openai.OpenAI, question: str, response: str, 
                                   correct_answer: str, gold_answers_length: int, 
-                                  judge_model: str, rate_limiter: RateLimiter) -> Dict[str, Any]:
+                                  judge_model: str, rate_limiter: RateLimiter,
+                                  cache: Optional[ResponseCache] = None) -> Dict[str, Any]:
     """Evaluate the answer using GPT-4.1 as judge with retry logic."""
-    rate_limiter.wait_if_needed()
+    judge_prompt = build_judge_prompt(question, response, correct_answer, gold_answers_length)
     
-    # Choose the appropriate prompt based on number of answers
-    if gold_answers_length == 1:
-        judge_prompt = single_answer_llm_judge_prompt.format(
-            question=question,
-            response=response,
-            correct_answer=correct_answer
-        )
-    else:
-        judge_prompt = multi_answer_llm_judge_prompt.format(
-            question=question,
-            response=response,
-            correct_answer=correct_answer
-        )
+    # Only prompts that changed since the cached run reach the API
+    judgment = cache.get(judge_model, JUDGE_GENERATION_PARAMS, judge_prompt) if cache is not None else None
+    if judgment is not None:
+        record_cache_hit()
     
     try:
-        # Use GPT-4.1 for judging
-        judge_response = client.chat.completions.create(
-            model=judge_model,
-            messages=[
-                {"role": "user", "content": judge_prompt}
-            ],
-            max_tokens=500,
-            temperature=0.1
-        )
-        
-        judgment = judge_response.choices[0].message.content.strip()
+        if judgment is None:
+            reserved_tokens = estimate_tokens(judge_prompt) + 500
+            waited = rate_limiter.wait_if_needed(reserved_tokens)
+            # Use GPT-4.1 for judging
+            with concurrency_slot(rate_limiter.concurrency) as slot_wait, api_call(judge_model, waited + slot_wait) as call:
+                judge_response = client.chat.completions.create(
+                    model=judge_model,
+                    messages=[
+                        {"role": "user", "content": judge_prompt}
+                    ],
+                    **JUDGE_GENERATION_PARAMS
+                )
+                call.usage = judge_response.usage
+            rate_limiter.settle(reserved_tokens, getattr(judge_response.usage, "total_tokens", None))
+            
+            judgment = judge_response.choices[0].message.content.strip()
+            if cache is not None:
+                cache.put(judge_model, JUDGE_GENERATION_PARAMS, judge_prompt, judgment)
         scores = compute_llm_judge_score_V2(judgment, gold_answers_length)
         
         return {
@@ -115,8 +146,73 @@ def evaluate_answer_with_gpt4_judge(client: openai.OpenAI, question: str, respon
         logging.error(f"Error evaluating answer with GPT-4 judge: {e}")
         raise
 
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_retry_after(wait_exponential(multiplier=1, min=1, max=60)),
+    retry=retry_if_exception_type((openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError))
+)
+def evaluate_answers_batch_with_gpt4_judge(client: openai.OpenAI, items: List[JudgeItem], judge_model: str,
+                                           rate_limiter: RateLimiter,
+                                           cache: Optional[ResponseCache] = None) -> List[Optional[Dict[str, Any]]]:
+    """Judge several answers with one batched request; None marks items that failed to parse."""
+    judge_prompt = build_batched_judge_prompt(items)
+    generation_params = dict(JUDGE_GENERATION_PARAMS, max_tokens=JUDGE_TOKENS_PER_ITEM * len(items))
+    judgment = cache.get(judge_model, generation_params, judge_prompt) if cache is not None else None
+    if judgment is not None:
+        record_cache_hit()
+    
+    if judgment is None:
+        reserved_tokens = estimate_tokens(judge_prompt) + JUDGE_TOKENS_PER_ITEM * len(items)
+        waited = rate_limiter.wait_if_needed(reserved_tokens)
+        with concurrency_slot(rate_limiter.concurrency) as slot_wait, api_call(judge_model, waited + slot_wait) as call:
+            judge_response = client.chat.completions.create(
+                model=judge_model,
+                messages=[
+                    {"role": "user", "content": judge_prompt}
+                ],
+                **generation_params
+            )
+            call.usage = judge_response.usage
+        rate_limiter.settle(reserved_tokens, getattr(judge_response.usage, "total_tokens", None))
+        
+        judgment = judge_response.choices[0].message.content.strip()
+        if cache is not None:
+            cache.put(judge_model, generation_params, judge_prompt, judgment)
+    evaluations = parse_batched_judgment(judgment, [item[3] for item in items])
+    for evaluation in evaluations:
+        if evaluation is not None:
+            evaluation["judge_model"] = judge_model
+    return evaluations
+
+def format_gold_answers(gold_answers: Any) -> Tuple[str, int]:
+    """Return the judge-prompt string for the gold answers and the number of gold answers."""
+    if isinstance(gold_answers, list) and len(gold_answers) > 0 and isinstance(gold_answers[0], list):
+        # Handle nested list format
+        gold_answers_str = " | ".join([" - ".join(map(str, answer)) for answer in gold_answers])
+    else:
+        gold_answers_str = " | ".join(map(str, gold_answers)) if isinstance(gold_answers, list) else str(gold_answers)
+    return gold_answers_str, len(gold_answers) if isinstance(gold_answers, list) else 1
+
+def build_re_evaluated_result(result: Dict[str, Any], new_evaluation: Dict[str, Any],
+                              config: ReEvaluationConfig,
+                              judge_telemetry: Optional[StageTelemetry] = None) -> Dict[str, Any]:
+    """Copy of result carrying the new evaluation alongside the original one."""
+    new_result = result.copy()
+    new_result["original_evaluation"] = result["evaluation"]  # Keep original GPT-5 evaluation
+    new_result["evaluation"] = new_evaluation  # Replace with GPT-4.1 evaluation
+    new_result["judge_model_used"] = config.judge_model
+    original_telemetry = result.get("telemetry") or {}
+    new_result["telemetry"] = dict(
+        original_telemetry,
+        judge=judge_telemetry.as_dict() if judge_telemetry is not None else None,
+        original_judge=original_telemetry.get("judge")
+    )
+    return new_result
+
 def process_single_result(result: Dict[str, Any], client: openai.OpenAI, 
-                         config: ReEvaluationConfig, rate_limiter: RateLimiter) -> Dict[str, Any]:
+                         config: ReEvaluationConfig, rate_limiter: RateLimiter,
+                         cache: Optional[ResponseCache] = None,
+                         pre_judge: Optional[PreJudge] = None) -> Dict[str, Any]:
     """Re-evaluate a single result with GPT-4.1 judge."""
     try:
         question = result["question"]
@@ -124,32 +220,130 @@ def process_single_result(result: Dict[str, Any], client: openai.OpenAI,
         gold_answers = result["gold_answers"]
         
         # Format gold answers for evaluation
-        if isinstance(gold_answers, list) and len(gold_answers) > 0 and isinstance(gold_answers[0], list):
-            # Handle nested list format
-            gold_answers_str = " | ".join([" - ".join(map(str, answer)) for answer in gold_answers])
-        else:
-            gold_answers_str = " | ".join(map(str, gold_answers)) if isinstance(gold_answers, list) else str(gold_answers)
+        gold_answers_str, gold_answers_length = format_gold_answers(gold_answers)
         
-        # Get new evaluation with GPT-4.1 judge
-        new_evaluation = evaluate_answer_with_gpt4_judge(
-            client, question, llm_response, gold_answers_str,
-            len(gold_answers) if isinstance(gold_answers, list) else 1,
-            config.judge_model, rate_limiter
-        )
+        # Get new evaluation with GPT-4.1 judge, unless the pre-judge can decide it
+        with stage("judge", config.judge_model) as judge_telemetry:
+            new_evaluation = pre_judge.judge(llm_response, gold_answers) if pre_judge is not None else None
+            if new_evaluation is None:
+                new_evaluation = evaluate_answer_with_gpt4_judge(
+                    client, question, llm_response, gold_answers_str, gold_answers_length,
+                    config.judge_model, rate_limiter, cache
+                )
         
         # Create new result with both evaluations
-        new_result = result.copy()
-        new_result["original_evaluation"] = result["evaluation"]  # Keep original GPT-5 evaluation
-        new_result["evaluation"] = new_evaluation  # Replace with GPT-4.1 evaluation
-        new_result["judge_model_used"] = config.judge_model
-        
-        return new_result
+        return build_re_evaluated_result(result, new_evaluation, config, judge_telemetry)
     
     except Exception as e:
         logging.error(f"Error processing result for question: {result.get('question', 'unknown')[:100]}...")
         logging.error(f"Error: {e}")
         return None
 
+def process_result_batch(results: List[Dict[str, Any]], client: openai.OpenAI,
+                         config: ReEvaluationConfig, rate_limiter: RateLimiter, batch_stats: BatchJudgeStats,
+                         cache: Optional[ResponseCache] = None,
+                         pre_judge: Optional[PreJudge] = None) -> List[Optional[Dict[str, Any]]]:
+    """Re-evaluate a batch of results with one batched judge request; unparsed items are judged one at a time."""
+    evaluations = {}
+    remaining = []
+    items = []
+    for i, result in enumerate(results):
+        new_evaluation = pre_judge.judge(result["llm_response"], result["gold_answers"]) if pre_judge is not None else None
+        if new_evaluation is not None:
+            evaluations[i] = new_evaluation
+            continue
+        remaining.append(i)
+        items.append((result["question"], result["llm_response"]) + format_gold_answers(result["gold_answers"]))
+    
+    batch_telemetry = StageTelemetry("judge", config.judge_model)
+    if len(items) > 1:
+        try:
+            with stage("judge", config.judge_model) as batch_telemetry:
+                batch_evaluations = evaluate_answers_batch_with_gpt4_judge(
+                    client, items, config.judge_model, rate_limiter, cache
+                )
+        except Exception as e:
+            logging.error(f"Error evaluating judge batch of {len(items)} results: {e}")
+            batch_evaluations = [None] * len(items)
+        batch_stats.record_batch(len(items), batch_evaluations.count(None))
+        evaluations.update({i: e for i, e in zip(remaining, batch_evaluations) if e is not None})
+    
+    # Batch-judged results share the batch request's telemetry; pre-judged ones cost nothing
+    shared_telemetry = batch_telemetry.share(len(items))
+    new_results = []
+    for i, result in enumerate(results):
+        if i in evaluations:
+            judge_telemetry = shared_telemetry if i in remaining else StageTelemetry("judge", config.judge_model)
+            new_results.append(build_re_evaluated_result(result, evaluations[i], config, judge_telemetry))
+            continue
+        if len(items) <= 1 and config.judge_batch_size > 1:
+            batch_stats.record_unbatched()
+        new_results.append(process_single_result(result, client, config, rate_limiter, cache))
+    return new_results
+
+def re_evaluate_with_batch_api(results: List[Dict[str, Any]], batch_runner: BatchRunner,
+                               config: ReEvaluationConfig, cache: Optional[ResponseCache] = None,
+                               pre_judge: Optional[PreJudge] = None) -> List[Optional[Dict[str, Any]]]:
+    """Re-evaluate all results through one set of Batch API jobs (--mode batch).
+    
+    Pre-judged and cached results never reach a batch. Each request's custom_id is the
+    result index plus its cache key, so a resumed run only matches outputs of identical prompts.
+    """
+    evaluations = {}
+    requests = []
+    pending = {}
+    for i, result in enumerate(results):
+        new_evaluation = pre_judge.judge(result["llm_response"], result["gold_answers"]) if pre_judge is not None else None
+        if new_evaluation is not None:
+            evaluations[i] = (new_evaluation, StageTelemetry("judge", config.judge_model))
+            continue
+        gold_answers_str, gold_answers_length = format_gold_answers(result["gold_answers"])
+        judge_prompt = build_judge_prompt(result["question"], result["llm_response"], gold_answers_str,
+                                          gold_answers_length)
+        judgment = cache.get(config.judge_model, JUDGE_GENERATION_PARAMS, judge_prompt) if cache is not None else None
+        if judgment is not None:
+            evaluations[i] = ({"judgment": judgment,
+                               "scores": compute_llm_judge_score_V2(judgment, gold_answers_length),
+                               "judge_model": config.judge_model},
+                              StageTelemetry("judge", config.judge_model, cache_hits=1))
+            continue
+        custom_id = f"result-{i}-{make_cache_key(config.judge_model, JUDGE_GENERATION_PARAMS, judge_prompt)[:16]}"
+        body = {"model": config.judge_model, "messages": [{"role": "user", "content": judge_prompt}],
+                **JUDGE_GENERATION_PARAMS}
+        requests.append(batch_request(custom_id, body))
+        pending[custom_id] = (i, judge_prompt, gold_answers_length)
+    
+    logging.info(f"📦 {len(requests)} judge requests for the Batch API "
+                 f"({len(results) - len(requests)} pre-judged or cached)")
+    outputs = batch_runner.run(requests) if requests else {}
+    for custom_id, (i, judge_prompt, gold_answers_length) in pending.items():
+        output = outputs[custom_id]
+        if not output.ok:
+            logging.error(f"Error evaluating result {i} in batch: {output.error}")
+            continue
+        judgment = output.content.strip()
+        if cache is not None:
+            cache.put(config.judge_model, JUDGE_GENERATION_PARAMS, judge_prompt, judgment)
+        usage = output.usage or {}
+        prompt_tokens, completion_tokens = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+        cost = estimate_cost(config.judge_model, prompt_tokens, completion_tokens)
+        judge_telemetry = StageTelemetry("judge", config.judge_model, attempts=1, prompt_tokens=prompt_tokens,
+                                         completion_tokens=completion_tokens,
+                                         cost_usd=cost * BATCH_PRICE_FACTOR if cost is not None else None)
+        evaluations[i] = ({"judgment": judgment,
+                           "scores": compute_llm_judge_score_V2(judgment, gold_answers_length),
+                           "judge_model": config.judge_model},
+                          judge_telemetry)
+    
+    new_results = []
+    for i, result in enumerate(results):
+        if i in evaluations:
+            new_evaluation, judge_telemetry = evaluations[i]
+            new_results.append(build_re_evaluated_result(result, new_evaluation, config, judge_telemetry))
+        else:
+            new_results.append(None)
+    return new_results
+
 def load_existing_results(input_file: str) -> Dict[str, Any]:
     """Load existing Monaco results."""
     with open(input_file, 'r', encoding='utf-8') as f:
@@ -207,16 +401,86 @@ def create_comparison_report(original_data: Dict[str, Any], new_results: List[Di
 
 def main():
     """Main function to run the re-evaluation."""
+    parser = argparse.ArgumentParser(description="Re-evaluate MoNaCo results with an external judge model")
+    parser.add_argument("--input", default="merged_results/merged_monaco_results.json",
+                       help="Results file to re-judge")
+    parser.add_argument("--output", default="merged_results/monaco_results_gpt4_judge.json",
+                       help="Output file for re-judged results")
+    parser.add_argument("--judge_model", default="gpt-4.1",
+                       help="Model to use for judging (default: gpt-4.1)")
+    parser.add_argument("--max_workers", type=int, default=3,
+                       help="Number of parallel workers (default: 3)")
+    parser.add_argument("--requests_per_minute", type=int, default=60,
+                       help="Rate limit for API calls (default: 60)")
+    parser.add_argument("--tokens_per_minute", type=int, default=None,
+                       help="Token quota per minute (default: no token limit)")
+    parser.add_argument("--burst", type=int, default=1,
+                       help="Requests allowed back-to-back before rate limiting spaces them out (default: 1)")
+    parser.add_argument("--rate_limit_state", default=None,
+                       help="Shared rate limiter state file, e.g. /dev/shm/monaco_gpt41.bucket, "
+                            "so several jobs on a node share one quota")
+    parser.add_argument("--cache", choices=["read", "write", "off"], default="off",
+                       help="Response cache: write (serve hits, store new responses), read (serve hits only) "
+                            "or off (default: off)")
+    parser.add_argument("--cache_file", default="response_cache.sqlite",
+                       help="SQLite response cache file (default: response_cache.sqlite)")
+    parser.add_argument("--cache_max_mb", type=int, default=2048,
+                       help="Evict least recently used cache entries beyond this size (default: 2048)")
+    parser.add_argument("--judge_batch_size", type=int, default=1,
+                       help="Results packed into one judge request; unparsed items are re-judged singly (default: 1)")
+    parser.add_argument("--pre_judge", action="store_true",
+                       help="Score trivially decidable answers (numbers, yes/no, exact matches) without the LLM judge")
+    parser.add_argument("--alias_file", default=None,
+                       help="JSON map of answer -> aliases for the pre-judge (default: consts.ANS_ALIAS_CACHE)")
+    parser.add_argument("--base_url", default=None,
+                       help="OpenAI-compatible base URL, e.g. http://localhost:8000/v1 for mock_llm_server.py")
+    parser.add_argument("--adaptive_concurrency", action="store_true",
+                       help="Adapt requests in flight (AIMD): start at --max_workers, grow while latency stays "
+                            "healthy, halve on 429s/timeouts and honour Retry-After")
+    parser.add_argument("--max_concurrency", type=int, default=32,
+                       help="Upper bound for --adaptive_concurrency (default: 32)")
+    parser.add_argument("--latency_target", type=float, default=None,
+                       help="Seconds; adaptive concurrency only grows below this (default: 2x best latency)")
+    parser.add_argument("--mode", choices=["interactive", "batch"], default="interactive",
+                       help="interactive: rate-limited judge calls; batch: submit all judge requests as Batch API "
+                            "jobs and wait for them (no client-side rate limiting, resumable) (default: interactive)")
+    parser.add_argument("--batch_backend", choices=BATCH_BACKENDS, default="openai",
+                       help="Batch API backend: openai (Files + Batches API) or local (file-based stand-in that "
+                            "runs the batch through --base_url, e.g. mock_llm_server.py) (default: openai)")
+    parser.add_argument("--batch_dir", default=None,
+                       help="Directory for batch inputs, submitted batch ids and collected outputs; rerunning with "
+                            "the same directory resumes (default: <output>.batch)")
+    parser.add_argument("--batch_poll_interval", type=float, default=60.0,
+                       help="Seconds between batch status polls (default: 60)")
+    args = parser.parse_args()
+    
     logger = setup_logging()
     
     # Configuration
     config = ReEvaluationConfig(
-        input_file="merged_results/merged_monaco_results.json",
-        output_file="merged_results/monaco_results_gpt4_judge.json",
+        input_file=args.input,
+        output_file=args.output,
         api_key=os.getenv("OPENAI_API_KEY"),
-        judge_model="gpt-4.1",  # Use GPT-4.1 as judge
-        max_workers=3,
-        requests_per_minute=60
+        base_url=args.base_url,
+        judge_model=args.judge_model,
+        max_workers=args.max_workers,
+        requests_per_minute=args.requests_per_minute,
+        tokens_per_minute=args.tokens_per_minute,
+        burst=args.burst,
+        rate_limit_state=args.rate_limit_state,
+        cache_mode=args.cache,
+        cache_file=args.cache_file,
+        cache_max_mb=args.cache_max_mb,
+        pre_judge=args.pre_judge,
+        judge_batch_size=args.judge_batch_size,
+        alias_file=args.alias_file,
+        adaptive_concurrency=args.adaptive_concurrency,
+        max_concurrency=args.max_concurrency,
+        latency_target=args.latency_target,
+        mode=args.mode,
+        batch_backend=args.batch_backend,
+        batch_dir=args.batch_dir or os.path.splitext(args.output)[0] + ".batch",
+        batch_poll_interval=args.batch_poll_interval
     )
     
     if not config.api_key:
@@ -228,7 +492,10 @@ def main():
     logger.info(f"📁 Output file: {config.output_file}")
     logger.info(f"🤖 Judge model: {config.judge_model}")
     logger.info(f"🔄 Max workers: {config.max_workers}")
-    logger.info(f"⏱️  Rate limit: {config.requests_per_minute} req/min")
+    if config.mode == "batch":
+        logger.info(f"📦 Batch API mode ({config.batch_backend}), state in {config.batch_dir}")
+    else:
+        logger.info(f"⏱️  Rate limit: {config.requests_per_minute} req/min")
     
     # Load existing results
     logger.info("📖 Loading existing results...")
@@ -240,39 +507,78 @@ def main():
         logger.error(f"❌ Error loading existing results: {e}")
         return
     
-    # Initialize OpenAI client and rate limiter
-    client = setup_openai_client(config.api_key)
-    rate_limiter = RateLimiter(config.requests_per_minute)
+    # Initialize OpenAI client and rate limiter (in adaptive mode every 429 has to reach the controller)
+    client = setup_openai_client(config.api_key, config.base_url,
+                                 0 if config.adaptive_concurrency else openai.DEFAULT_MAX_RETRIES)
+    concurrency = None
+    if config.mode == "batch" and (config.adaptive_concurrency or config.judge_batch_size > 1):
+        logger.warning("⚠️  --adaptive_concurrency and --judge_batch_size only apply to --mode interactive")
+    elif config.adaptive_concurrency:
+        concurrency = AdaptiveConcurrency(config.judge_model, config.max_workers, config.max_concurrency,
+                                          latency_target=config.latency_target, logger=logger)
+        logger.info(f"🎚️  Adaptive concurrency: {concurrency.limit} in flight to start, up to {config.max_concurrency}")
+        config = replace(config, max_workers=config.max_concurrency)
+    rate_limiter = RateLimiter(
+        config.requests_per_minute, tokens_per_minute=config.tokens_per_minute,
+        burst=config.burst, state_file=config.rate_limit_state, name=config.judge_model,
+        concurrency=concurrency
+    )
+    cache = ResponseCache(config.cache_file, config.cache_mode, config.cache_max_mb * 1024 ** 2)
+    if cache.enabled:
+        logger.info(f"🗄️  Response cache: {config.cache_file} ({config.cache_mode})")
+    pre_judge = PreJudge(config.pre_judge, config.alias_file)
+    if pre_judge.enabled:
+        logger.info(f"⚖️  Pre-judge enabled ({len(pre_judge.aliases)} answer aliases loaded)")
+    batch_stats = BatchJudgeStats(config.judge_batch_size)
+    if config.judge_batch_size > 1 and config.mode == "interactive":
+        logger.info(f"📦 Batched judging: up to {config.judge_batch_size} results per judge request")
     
     # Re-evaluate all results
     logger.info("🔄 Starting re-evaluation with GPT-4.1 judge...")
     new_results = []
+    run_telemetry = RunTelemetry()
+    batch_runner = None
     
-    with ThreadPoolExecutor(max_workers=config.max_workers) as executor:
-        # Submit all tasks
-        future_to_index = {}
-        for i, result in enumerate(original_results):
-            future = executor.submit(
-                process_single_result,
-                result, client, config, rate_limiter
-            )
-            future_to_index[future] = i
+    if config.mode == "batch":
+        batch_runner = BatchRunner(make_batch_backend(config.batch_backend, client, config.batch_dir),
+                                   config.batch_dir, config.batch_poll_interval, logger=logger)
+        completed_results = re_evaluate_with_batch_api(original_results, batch_runner, config, cache, pre_judge)
+        for result in completed_results:
+            if result:
+                new_results.append(result)
+                run_telemetry.record(result, stages=("judge",))
+    else:
+        with ThreadPoolExecutor(max_workers=config.max_workers) as executor:
+            # Submit all tasks, one per batch of judge_batch_size results
+            future_to_indices = {}
+            for indices in chunked(list(range(len(original_results))), config.judge_batch_size):
+                future = executor.submit(
+                    process_result_batch,
+                    [original_results[i] for i in indices], client, config, rate_limiter, batch_stats, cache, pre_judge
+                )
+                future_to_indices[future] = indices
         
-        # Process completed tasks with progress bar
-        with tqdm(total=len(original_results), desc="Re-evaluating") as pbar:
-            completed_results = [None] * len(original_results)  # Maintain order
+            # Process completed tasks with progress bar
+            with tqdm(total=len(original_results), desc="Re-evaluating") as pbar:
+                completed_results = [None] * len(original_results)  # Maintain order
             
-            for future in as_completed(future_to_index):
-                index = future_to_index[future]
-                try:
-                    result = future.result()
-                    completed_results[index] = result
-                    if result:
-                        new_results.append(result)
-                    pbar.update(1)
-                except Exception as e:
-                    logger.error(f"Error processing result {index}: {e}")
-                    pbar.update(1)
+                for future in as_completed(future_to_indices):
+                    indices = future_to_indices[future]
+                    try:
+                        for index, result in zip(indices, future.result()):
+                            completed_results[index] = result
+                            if result:
+                                new_results.append(result)
+                                run_telemetry.record(result, stages=("judge",))
+                        if concurrency is not None:
+                            pbar.set_postfix({'conc': concurrency.limit})
+                        pbar.update(len(indices))
+                    except Exception as e:
+                        logger.error(f"Error processing results {indices[0]}-{indices[-1]}: {e}")
+                        pbar.update(len(indices))
+    
+    telemetry_summary = run_telemetry.summary()
+    log_telemetry_summary(logger, telemetry_summary)
     
     # Update metadata
     new_metadata = original_data["metadata"].copy()
@@ -281,7 +587,14 @@ def main():
         "new_judge_model": config.judge_model,
         "re_evaluated_questions": len(new_results),
         "original_total_questions": len(original_results),
-        "re_evaluation_timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+        "re_evaluation_timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "mode": config.mode,
+        "batch_api": batch_runner.stats() if batch_runner is not None else None,
+        "rate_limiter": rate_limiter.stats(),
+        "response_cache": cache.stats(),
+        "pre_judge": pre_judge.stats(),
+        "judge_batching": batch_stats.as_dict(),
+        "telemetry": telemetry_summary
     }
     
     # Recalculate average judge score
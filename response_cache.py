@@ -0,0 +1,175 @@
+"""
+Persistent, content-addressed cache for model and judge responses.
+
+Entries are keyed by a SHA-256 of (model, generation params, full prompt) and stored
+in a SQLite database, so re-running a shard or re-judging with a tweaked prompt only
+pays for prompts that actually changed. The database is size-bounded: once it grows
+past max_bytes the least recently used entries are evicted. The total size is kept
+in a meta row updated together with each write, so bounding the cache costs no table scans.
+
+Modes:
+- "write": serve cached responses and store new ones
+- "read":  serve cached responses but never write to the cache (not even LRU access times)
+- "off":   bypass the cache entirely
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+CACHE_MODES = ("read", "write", "off")
+# Least recently used entries deleted per eviction transaction
+EVICTION_BATCH_SIZE = 256
+
+
+def make_cache_key(model: str, params: Dict[str, Any], prompt: str) -> str:
+    """Content address for a request."""
+    payload = json.dumps({"model": model, "params": params, "prompt": prompt}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed LRU cache of response texts, safe to share between threads and processes.
+
+    The rollback journal (not WAL) is used because WAL needs shared memory, which the
+    network filesystems SLURM shards share the cache on lack.
+    """
+
+    def __init__(self, cache_file: str = "response_cache.sqlite", mode: str = "write",
+                 max_bytes: int = 2 * 1024 ** 3):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode: {mode} (expected one of {CACHE_MODES})")
+        self.cache_file = cache_file
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        if self.enabled:
+            directory = os.path.dirname(os.path.abspath(cache_file))
+            os.makedirs(directory, exist_ok=True)
+            with self._transaction() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER, "
+                    "created REAL, last_access REAL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+                conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+                # Caches written before the running total get it computed once
+                conn.execute("INSERT OR IGNORE INTO meta (key, value) "
+                             "SELECT 'total_size', COALESCE(SUM(size), 0) FROM responses")
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.cache_file, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=DELETE")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _count(self, field: str, value: int = 1):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + value)
+
+    def get(self, model: str, params: Dict[str, Any], prompt: str) -> Optional[str]:
+        """Return the cached response for this request, or None."""
+        if not self.enabled:
+            return None
+        key = make_cache_key(model, params, prompt)
+        conn = self._connection()
+        row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        # Read mode never writes, so readers don't compete with writers for the database lock
+        if self.mode == "write":
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        self._count("hits")
+        return row[0]
+
+    def put(self, model: str, params: Dict[str, Any], prompt: str, response: str):
+        """Store a response (write mode only) and evict LRU entries past max_bytes."""
+        if self.mode != "write" or response is None:
+            return
+        key = make_cache_key(model, params, prompt)
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._transaction() as conn:
+            replaced = conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now)
+            )
+            total = self._add_to_total(conn, size - (replaced[0] if replaced else 0))
+        self._count("writes")
+        if total > self.max_bytes:
+            self._evict()
+
+    @staticmethod
+    def _add_to_total(conn: sqlite3.Connection, delta: int) -> int:
+        conn.execute("UPDATE meta SET value = value + ? WHERE key = 'total_size'", (delta,))
+        return conn.execute("SELECT value FROM meta WHERE key = 'total_size'").fetchone()[0]
+
+    def _evict(self):
+        """Delete least recently used entries, in small batches, until the cache is at 90% of max_bytes."""
+        # Evicting below the bound keeps this from running on every write
+        target = int(self.max_bytes * 0.9)
+        while True:
+            with self._transaction() as conn:
+                total = conn.execute("SELECT value FROM meta WHERE key = 'total_size'").fetchone()[0]
+                if total <= target:
+                    return
+                rows = conn.execute("SELECT key, size FROM responses ORDER BY last_access LIMIT ?",
+                                    (EVICTION_BATCH_SIZE,)).fetchall()
+                if not rows:
+                    self._add_to_total(conn, -total)
+                    return
+                keys = []
+                freed = 0
+                for key, size in rows:
+                    if total - freed <= target:
+                        break
+                    keys.append(key)
+                    freed += size
+                conn.execute(f"DELETE FROM responses WHERE key IN ({','.join('?' * len(keys))})", keys)
+                self._add_to_total(conn, -freed)
+            self._count("evictions", len(keys))
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for run metadata."""
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "mode": self.mode,
+                "cache_file": self.cache_file if self.enabled else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "writes": self.writes,
+                "evictions": self.evictions
+            }
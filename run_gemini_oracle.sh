@@ -10,6 +10,8 @@
 
 # MoNaCo Oracle Retrieval Evaluation - SLURM Job
 # Submit with: sbatch run_monaco_oracle.sh
+# Distributed: WORK_QUEUE=results/monaco_queue.sqlite sbatch --array=0-7 run_gemini_oracle.sh
+#   (every array task claims chunks from the shared queue; the last one to finish writes the merged output)
 
 echo "🚀 Starting MoNaCo Oracle Retrieval Evaluation on SLURM"
 echo "📅 Job started at: $(date)"
@@ -22,13 +24,31 @@ START_QUESTION=${2:-${START_QUESTION:-0}}
 MODEL=${MODEL:-"gemini-2.5-pro"}
 MAX_WORKERS=${MAX_WORKERS:-3}
 REQUESTS_PER_MINUTE=${REQUESTS_PER_MINUTE:-60}
+# Optional: share one token-bucket quota between all jobs on a node, e.g. /dev/shm/monaco_gemini.bucket
+RATE_LIMIT_STATE=${RATE_LIMIT_STATE:-}
+# Optional: size the Gemini answer and GPT-4.1 judge stages separately (default: MAX_WORKERS each)
+ANSWER_WORKERS=${ANSWER_WORKERS:-}
+JUDGE_WORKERS=${JUDGE_WORKERS:-}
+# Optional: shared work queue on the cluster filesystem for array jobs, and questions per chunk
+WORK_QUEUE=${WORK_QUEUE:-}
+CHUNK_SIZE=${CHUNK_SIZE:-10}
+# Optional: set to 1 to let each stage adapt its requests in flight (starting at the worker counts, up to MAX_CONCURRENCY)
+ADAPTIVE_CONCURRENCY=${ADAPTIVE_CONCURRENCY:-}
+MAX_CONCURRENCY=${MAX_CONCURRENCY:-16}
+# Optional: set to 1 to stream answers (time to first token), cut off past MAX_OUTPUT_TOKENS if set
+STREAM=${STREAM:-}
+MAX_OUTPUT_TOKENS=${MAX_OUTPUT_TOKENS:-}
 
 echo "⚙️  Configuration:"
 echo "   Questions: $NUM_QUESTIONS"
 echo "   Start from: $START_QUESTION"
 echo "   Model: $MODEL"
-echo "   Max Workers: $MAX_WORKERS"
+echo "   Max Workers: $MAX_WORKERS (answer: ${ANSWER_WORKERS:-$MAX_WORKERS}, judge: ${JUDGE_WORKERS:-$MAX_WORKERS})"
 echo "   Rate Limit: $REQUESTS_PER_MINUTE req/min"
+echo "   Rate Limit State: ${RATE_LIMIT_STATE:-<per job>}"
+echo "   Work Queue: ${WORK_QUEUE:-<single job>}"
+echo "   Adaptive Concurrency: $([ -n "$ADAPTIVE_CONCURRENCY" ] && echo "up to $MAX_CONCURRENCY" || echo off)"
+echo "   Streaming: $([ -n "$STREAM" ] && echo "on (output limit: ${MAX_OUTPUT_TOKENS:-none})" || echo off)"
 echo ""
 
 # Create necessary directories
@@ -75,14 +95,42 @@ echo "🔑 API key found (length: ${#OPENAI_API_KEY} characters)"
 
 # Generate output files with job ID and timestamp
 TIMESTAMP=$(date +"%Y%m%d_%H%M%S")
-OUTPUT_FILE="results/monaco_oracle_${MODEL}_${NUM_QUESTIONS}q_job${SLURM_JOB_ID}_${TIMESTAMP}.json"
-CHECKPOINT_FILE="results/checkpoint_${MODEL}_${NUM_QUESTIONS}q_job${SLURM_JOB_ID}.json"
+if [ -n "$WORK_QUEUE" ]; then
+    # All array tasks must agree on the merged output file
+    OUTPUT_FILE="results/monaco_oracle_${MODEL}_${NUM_QUESTIONS}q_job${SLURM_ARRAY_JOB_ID:-$SLURM_JOB_ID}.json"
+else
+    OUTPUT_FILE="results/monaco_oracle_${MODEL}_${NUM_QUESTIONS}q_job${SLURM_JOB_ID}_${TIMESTAMP}.json"
+fi
+CHECKPOINT_FILE="results/checkpoint_${MODEL}_${NUM_QUESTIONS}q_job${SLURM_JOB_ID}.jsonl"
 
 echo "💾 Output file: $OUTPUT_FILE"
 echo "🔄 Checkpoint file: $CHECKPOINT_FILE"
 echo ""
 
 # Run the evaluation
+EXTRA_ARGS=()
+if [ -n "$RATE_LIMIT_STATE" ]; then
+    EXTRA_ARGS+=(--rate_limit_state "$RATE_LIMIT_STATE")
+fi
+if [ -n "$ANSWER_WORKERS" ]; then
+    EXTRA_ARGS+=(--answer_workers "$ANSWER_WORKERS")
+fi
+if [ -n "$JUDGE_WORKERS" ]; then
+    EXTRA_ARGS+=(--judge_workers "$JUDGE_WORKERS")
+fi
+if [ -n "$WORK_QUEUE" ]; then
+    EXTRA_ARGS+=(--work_queue "$WORK_QUEUE" --chunk_size "$CHUNK_SIZE")
+fi
+if [ -n "$ADAPTIVE_CONCURRENCY" ]; then
+    EXTRA_ARGS+=(--adaptive_concurrency --max_concurrency "$MAX_CONCURRENCY")
+fi
+if [ -n "$STREAM" ]; then
+    EXTRA_ARGS+=(--stream)
+    if [ -n "$MAX_OUTPUT_TOKENS" ]; then
+        EXTRA_ARGS+=(--max_output_tokens "$MAX_OUTPUT_TOKENS")
+    fi
+fi
+
 echo "🔄 Starting evaluation..."
 srun python run_gemini_oracle.py \
     --openai_api_key "$OPENAI_API_KEY" \
@@ -97,7 +145,9 @@ srun python run_gemini_oracle.py \
     --start_question "$START_QUESTION" \
     --max_workers "$MAX_WORKERS" \
     --requests_per_minute "$REQUESTS_PER_MINUTE" \
-    --checkpoint_interval 25
+    --checkpoint_interval 25 \
+    --checkpoint_mode journal \
+    "${EXTRA_ARGS[@]}"
 
 exit_code=$?
 
@@ -105,7 +155,11 @@ echo ""
 echo "📅 Job finished at: $(date)"
 if [ $exit_code -eq 0 ]; then
     echo "✅ Evaluation completed successfully!"
-    echo "📊 Results saved to: $OUTPUT_FILE"
+    if [ -f "$OUTPUT_FILE" ]; then
+        echo "📊 Results saved to: $OUTPUT_FILE"
+    else
+        echo "🧩 Chunks done; results are merged by the last worker to finish"
+    fi
     
     # Clean up checkpoint file on success
     if [ -f "$CHECKPOINT_FILE" ]; then
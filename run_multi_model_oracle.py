@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+"""
+MoNaCo Oracle Retrieval Evaluation Script - Multi-Model Fan-Out
+
+Answers every question with several models in a single pass:
+- QA data and the Oracle document store are loaded once, and each question's gold
+  documents are formatted and packed once (once per distinct token budget)
+- The prompt goes to every model concurrently through provider adapters
+  (model_adapters.py), each model with its own rate limiter
+- All answers are scored by one shared judge model
+- Results are written per model, in the same format as the single-model runners
+"""
+
+import os
+import re
+import sys
+import argparse
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import openai
+
+# Add the current directory to Python path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompts'))
+
+from utils import load_json, write_to_json_atomic
+from rate_limiter import RateLimiter
+from checkpoint_journal import CheckpointJournal, load_journal
+from pipeline import TwoStagePipeline
+from response_cache import ResponseCache
+from pre_judge import PreJudge
+from model_adapters import make_adapter, provider_for_model
+from telemetry import RunTelemetry, StageTelemetry, log_telemetry_summary, stage
+from context_packer import PACKING_STRATEGIES, PackedContext, PackingStats, get_context_budget, pack_documents
+from run_oracle_retrieval_scalable import (create_oracle_retrieval_prompt, evaluate_answer_with_retry,
+                                           format_gold_answers, setup_logging)
+from prompts.retrieval_augmented_setup import get_formatted_gold_documents_list, DocumentStore, count_tokens
+
+
+@dataclass
+class EvaluationConfig:
+    """Configuration for the fan-out evaluation run."""
+    qa_file: str
+    oracle_docs_file: str
+    models: List[str] = field(default_factory=lambda: ["gpt-5", "gemini-2.5-pro"])
+    openai_api_key: Optional[str] = None  # OpenAI-compatible models and the judge
+    google_api_key: Optional[str] = None  # Gemini models
+    base_url: Optional[str] = None  # OpenAI-compatible endpoint (e.g. mock_llm_server.py)
+    gemini_base_url: Optional[str] = None  # Gemini API endpoint (e.g. mock_llm_server.py)
+    judge_model: str = "gpt-4.1"  # Shared judge for every model's answers
+    output_dir: str = "results"  # One results file (and checkpoint journal) per model
+    max_questions: Optional[int] = None
+    start_question: int = 0  # Starting question index (0-based)
+    answer_workers: int = 3  # Questions being answered at once (each fans out to every model)
+    judge_workers: int = 3  # Questions being judged at once (each judges every model's answer)
+    pipeline_queue_size: Optional[int] = None  # Bounded answer->judge queue (defaults to 2 * judge_workers)
+    requests_per_minute: int = 30  # Answer rate limit per model
+    judge_requests_per_minute: Optional[int] = None  # Judge rate limit (defaults to requests_per_minute * models)
+    tokens_per_minute: Optional[int] = None  # Token quota per model (None = requests only)
+    burst: int = 1  # Requests that may be sent back-to-back before spacing kicks in
+    cache_mode: str = "off"  # Response cache: "read", "write" or "off"
+    cache_file: str = "response_cache.sqlite"
+    cache_max_mb: int = 2048  # LRU eviction bound for the response cache
+    pre_judge: bool = False  # Score trivially decidable answers locally instead of calling the judge
+    alias_file: Optional[str] = None  # Answer alias map for the pre-judge (defaults to consts.ANS_ALIAS_CACHE)
+    doc_store: Optional[str] = None  # Binary Oracle document store (default: <oracle_docs_file>.docstore)
+    context_strategy: str = "keep_all"  # "keep_all", "truncate_longest" or "drop_lowest_overlap"
+    context_budget: Optional[int] = None  # Prompt token budget (default: each model's context window)
+    stream: bool = False  # Stream answers, recording time to first token and output tokens/s
+    max_output_tokens: Optional[int] = None  # Streamed answers are cut off past this many tokens
+
+    def __post_init__(self):
+        self.judge_requests_per_minute = self.judge_requests_per_minute or self.requests_per_minute * len(self.models)
+
+
+def model_slug(model: str) -> str:
+    """File-name form of a model name, e.g. gemini-2.5-pro -> gemini25pro."""
+    return re.sub(r"[^a-z0-9]", "", model.lower())
+
+
+def model_output_file(config: EvaluationConfig, model: str) -> str:
+    """Results file for one model, named like merged_results/monaco_<model>_<judge>judge.json."""
+    return os.path.join(config.output_dir, f"monaco_{model_slug(model)}_{model_slug(config.judge_model)}judge.json")
+
+
+def model_checkpoint_file(config: EvaluationConfig, model: str) -> str:
+    return os.path.splitext(model_output_file(config, model))[0] + ".checkpoint.jsonl"
+
+
+class FanOutStats:
+    """Thread-safe counts of prompts built versus prompts sent, for run metadata."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.questions = 0
+        self.prompt_builds = 0
+        self.model_prompts = 0
+
+    def record(self, prompt_builds: int, model_prompts: int):
+        with self._lock:
+            self.questions += 1
+            self.prompt_builds += prompt_builds
+            self.model_prompts += model_prompts
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "questions": self.questions,
+                "prompt_builds": self.prompt_builds,
+                "model_prompts": self.model_prompts
+            }
+
+
+PACKING_STATS = PackingStats()
+FANOUT_STATS = FanOutStats()
+
+
+def build_fanout_prompts(question: str, question_docs_map, models: List[str],
+                         config: EvaluationConfig) -> Optional[Dict[str, Tuple[Optional[str], PackedContext]]]:
+    """Format the gold documents once and build one Oracle prompt per distinct model token budget.
+
+    Returns {model: (prompt, packed context)}, with prompt None for models whose budget it
+    cannot fit, or None if the question has no usable documents.
+    """
+    gold_documents = get_formatted_gold_documents_list(question, question_docs_map, is_bm25_retrieval=False)
+    if not gold_documents:
+        return None
+    document_tokens = (question_docs_map.question_document_tokens(question)
+                       if isinstance(question_docs_map, DocumentStore) else None)
+    overhead_tokens = count_tokens(create_oracle_retrieval_prompt(question, []))
+    by_budget = {}
+    prompts = {}
+    full_prompt = None
+    prompt_builds = 0
+    for model in models:
+        budget = get_context_budget(model, config.context_budget)
+        if budget not in by_budget:
+            packed = pack_documents(question, gold_documents, budget, config.context_strategy, document_tokens,
+                                    overhead_tokens)
+            PACKING_STATS.record(packed)
+            prompt = None
+            if packed.fits and not packed.dropped and not packed.truncated:
+                # All documents kept as they are: one prompt serves every model whose budget it fits
+                if full_prompt is None:
+                    full_prompt = create_oracle_retrieval_prompt(question, packed.documents)
+                    prompt_builds += 1
+                prompt = full_prompt
+            elif packed.fits:
+                prompt = create_oracle_retrieval_prompt(question, packed.documents)
+                prompt_builds += 1
+            by_budget[budget] = (prompt, packed)
+        prompts[model] = by_budget[budget]
+    FANOUT_STATS.record(prompt_builds, len(models))
+    return prompts
+
+
+def answer_with_model(question: str, model: str, adapter, oracle_prompt: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """One model's answer and answer-stage telemetry, or None on failure."""
+    try:
+        with stage("answer", model) as answer_telemetry:
+            llm_response = adapter.answer(oracle_prompt)
+    except Exception as e:
+        logging.error(f"Error answering question {question[:100]} with {model}: {e}")
+        return None
+    if not llm_response:
+        logging.warning(f"No {model} response for question: {question[:100]}...")
+        return None
+    return llm_response, answer_telemetry.as_dict()
+
+
+def answer_question_all_models(question: str, qa_info: Dict, question_docs_map, models: List[str],
+                               adapters: Dict[str, Any], config: EvaluationConfig,
+                               executor: ThreadPoolExecutor) -> Optional[Dict[str, Any]]:
+    """Answer stage: build the prompts once and ask every model concurrently.
+
+    Returns {"question", "qa_info", "answers": {model: answer}} with an entry for each
+    model that answered, or None if none did.
+    """
+    prompts = build_fanout_prompts(question, question_docs_map, models, config)
+    if prompts is None:
+        logging.warning(f"No valid documents for question: {question[:100]}...")
+        return None
+    futures = {}
+    for model in models:
+        oracle_prompt, packed = prompts[model]
+        if oracle_prompt is None:
+            logging.warning(f"📏 Prompt needs {packed.prompt_tokens} tokens, over the {packed.budget} token budget "
+                            f"for {model}; skipping question: {question[:100]}...")
+            continue
+        futures[model] = executor.submit(answer_with_model, question, model, adapters[model], oracle_prompt)
+
+    answers = {}
+    for model, future in futures.items():
+        answered = future.result()
+        if answered is None:
+            continue
+        llm_response, answer_telemetry = answered
+        packed = prompts[model][1]
+        answers[model] = {
+            "question": question,
+            "qa_info": qa_info,
+            "llm_response": llm_response,
+            "num_gold_documents": len(packed.documents),
+            "context_packing": packed.as_dict(),
+            "telemetry": answer_telemetry
+        }
+    if not answers:
+        return None
+    return {"question": question, "qa_info": qa_info, "answers": answers}
+
+
+def build_result(answer: Dict[str, Any], model: str, gold_answers: Any, evaluation: Dict[str, Any],
+                 config: EvaluationConfig, judge_telemetry: Optional[StageTelemetry] = None) -> Dict[str, Any]:
+    """Final result record for one model's judged answer."""
+    return {
+        "question": answer["question"],
+        "gold_answers": gold_answers,
+        "llm_response": answer["llm_response"],
+        "evaluation": evaluation,
+        "model_used": model,
+        "judge_model_used": config.judge_model,
+        "num_gold_documents": answer["num_gold_documents"],
+        "packed_prompt_tokens": answer["context_packing"]["packed_prompt_tokens"],
+        "context_packing": answer["context_packing"],
+        "telemetry": {
+            "answer": answer.get("telemetry"),
+            "judge": judge_telemetry.as_dict() if judge_telemetry is not None else None
+        },
+        "canary": answer["qa_info"].get("canary", "")
+    }
+
+
+def judge_model_answer(answer: Dict[str, Any], model: str, client: openai.OpenAI, config: EvaluationConfig,
+                       rate_limiter: RateLimiter, cache: Optional[ResponseCache] = None,
+                       pre_judge: Optional[PreJudge] = None) -> Optional[Dict[str, Any]]:
+    """Judge one model's answer with the shared judge (locally if the pre-judge can decide it)."""
+    question = answer["question"]
+    try:
+        gold_answers, gold_answers_str, gold_answers_length = format_gold_answers(answer["qa_info"])
+        with stage("judge", config.judge_model) as judge_telemetry:
+            evaluation = pre_judge.judge(answer["llm_response"], gold_answers) if pre_judge is not None else None
+            if evaluation is None:
+                evaluation = evaluate_answer_with_retry(
+                    client, question, answer["llm_response"], gold_answers_str,
+                    gold_answers_length, config.judge_model, rate_limiter, cache
+                )
+                evaluation["judge_model"] = config.judge_model
+        return build_result(answer, model, gold_answers, evaluation, config, judge_telemetry)
+    except Exception as e:
+        logging.error(f"Error judging {model} answer to question {question[:100]}: {e}")
+        return None
+
+
+def judge_all_answers(bundle: Dict[str, Any], client: openai.OpenAI, config: EvaluationConfig,
+                      rate_limiter: RateLimiter, executor: ThreadPoolExecutor,
+                      cache: Optional[ResponseCache] = None,
+                      pre_judge: Optional[PreJudge] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Judge stage: score every model's answer to a question concurrently; {model: result or None}."""
+    futures = {
+        model: executor.submit(judge_model_answer, answer, model, client, config, rate_limiter, cache, pre_judge)
+        for model, answer in bundle["answers"].items()
+    }
+    return {model: future.result() for model, future in futures.items()}
+
+
+def run_multi_model_evaluation(config: EvaluationConfig) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Run the Oracle retrieval evaluation for all configured models in one pass."""
+
+    logger = setup_logging()
+    models = config.models
+    logger.info("🚀 Starting MoNaCo Oracle Retrieval Evaluation (Multi-Model Fan-Out)")
+    logger.info(f"📁 QA File: {config.qa_file}")
+    logger.info(f"📁 Oracle Docs File: {config.oracle_docs_file}")
+    logger.info(f"🤖 Models: {', '.join(f'{m} ({provider_for_model(m)})' for m in models)}")
+    logger.info(f"⚖️  Judge: {config.judge_model}")
+    logger.info(f"📏 Context packing: {config.context_strategy}")
+    logger.info(f"💾 Output directory: {config.output_dir}")
+    logger.info(f"🔄 Workers: answer {config.answer_workers}, judge {config.judge_workers} questions at a time")
+    logger.info(f"⏱️  Rate Limit: {config.requests_per_minute} req/min per model, "
+                f"judge {config.judge_requests_per_minute} req/min")
+    if config.stream:
+        logger.info(f"🌊 Streaming answers (output token limit: {config.max_output_tokens or 'none'})")
+    os.makedirs(config.output_dir, exist_ok=True)
+
+    # One OpenAI client for OpenAI-compatible models and the judge; one adapter and rate limiter per model
+    cache = ResponseCache(config.cache_file, config.cache_mode, config.cache_max_mb * 1024 ** 2)
+    if cache.enabled:
+        logger.info(f"🗄️  Response cache: {config.cache_file} ({config.cache_mode})")
+    openai_client = openai.OpenAI(api_key=config.openai_api_key, base_url=config.base_url)
+    answer_rate_limiters = {
+        model: RateLimiter(config.requests_per_minute, tokens_per_minute=config.tokens_per_minute,
+                           burst=config.burst, name=f"{model}:answer")
+        for model in models
+    }
+    judge_rate_limiter = RateLimiter(config.judge_requests_per_minute, tokens_per_minute=config.tokens_per_minute,
+                                     burst=config.burst, name=f"{config.judge_model}:judge")
+    adapters = {
+        model: make_adapter(model, answer_rate_limiters[model], openai_client, config.google_api_key,
+                            config.gemini_base_url, cache, config.stream, config.max_output_tokens)
+        for model in models
+    }
+    pre_judge = PreJudge(config.pre_judge, config.alias_file)
+    if pre_judge.enabled:
+        logger.info(f"⚖️  Pre-judge enabled ({len(pre_judge.aliases)} answer aliases loaded)")
+
+    # Load QA data and the Oracle documents once for all models
+    logger.info("📖 Loading QA data...")
+    qa_data = load_json(config.qa_file)
+    logger.info("🗂️  Processing Oracle documents...")
+    question_docs_map = DocumentStore(config.oracle_docs_file, config.doc_store)
+    if not question_docs_map.built:
+        logger.info(f"🗂️  Reusing document store {question_docs_map.store_path}")
+    logger.info(f"📊 Found {len(qa_data)} questions in QA file")
+    logger.info(f"📊 Found {len(question_docs_map)} questions with Oracle documents")
+
+    all_qa_questions = list(qa_data.keys())
+    questions_to_process = ([q for q in all_qa_questions if q in question_docs_map] +
+                            [q for q in all_qa_questions if q not in question_docs_map])
+    if config.start_question > 0:
+        questions_to_process = questions_to_process[config.start_question:]
+        logger.info(f"🔢 Starting from question index {config.start_question}")
+    if config.max_questions:
+        questions_to_process = questions_to_process[:config.max_questions]
+    total_questions = len(questions_to_process)
+
+    # Each model has its own checkpoint journal; a question is redone only for the models missing it
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    processed: Dict[str, set] = {}
+    total_scores: Dict[str, float] = {}
+    for model in models:
+        checkpoint_data = load_journal(model_checkpoint_file(config, model)) or {}
+        results[model] = checkpoint_data.get("results", [])
+        processed[model] = set(checkpoint_data.get("processed_questions", []))
+        total_scores[model] = checkpoint_data.get("total_score", 0.0)
+    questions_to_process = [q for q in questions_to_process if any(q not in processed[m] for m in models)]
+    if any(processed.values()):
+        logger.info(f"🔄 Resuming from checkpoints. {len(questions_to_process)} questions remaining")
+    questions_with_docs = [q for q in questions_to_process if q in question_docs_map]
+    journals = {model: CheckpointJournal(model_checkpoint_file(config, model)) for model in models}
+    run_telemetry = {model: RunTelemetry() for model in models}
+
+    logger.info(f"🔄 Processing {len(questions_to_process)} questions with {len(models)} models...")
+    progress_bar = tqdm(total=len(questions_with_docs), desc="Processing questions", unit="q",
+                        mininterval=1.0, file=sys.stdout)
+
+    def handle_result(question: str, model_results: Optional[Dict[str, Optional[Dict[str, Any]]]]):
+        """Record every model's finished result for a question and append it to that model's journal."""
+        for model, result in (model_results or {}).items():
+            if not result:
+                continue
+            results[model].append(result)
+            processed[model].add(question)
+            total_scores[model] += result["evaluation"]["scores"]["judge_score"]
+            run_telemetry[model].record(result)
+            journals[model].append(result)
+        progress_bar.set_postfix({model_slug(m)[:12]: f"{total_scores[m] / max(1, len(results[m])):.3f}"
+                                  for m in models})
+        progress_bar.update(1)
+
+    answer_executor = ThreadPoolExecutor(max_workers=max(1, config.answer_workers * len(models)))
+    judge_executor = ThreadPoolExecutor(max_workers=max(1, config.judge_workers * len(models)))
+    pipeline = TwoStagePipeline(
+        answer_fn=lambda question: answer_question_all_models(
+            question, qa_data[question], question_docs_map, [m for m in models if question not in processed[m]],
+            adapters, config, answer_executor
+        ),
+        judge_fn=lambda bundle: judge_all_answers(
+            bundle, openai_client, config, judge_rate_limiter, judge_executor, cache, pre_judge
+        ),
+        answer_workers=config.answer_workers,
+        judge_workers=config.judge_workers,
+        queue_size=config.pipeline_queue_size,
+        logger=logger
+    )
+    try:
+        for question, model_results in pipeline.run(questions_with_docs):
+            handle_result(question, model_results)
+    finally:
+        answer_executor.shutdown()
+        judge_executor.shutdown()
+        progress_bar.close()
+        for journal in journals.values():
+            journal.close()
+
+    pipeline_stats = pipeline.stats()
+    logger.info(f"📬 Pipeline: max queue depth {pipeline_stats['max_queue_depth']}, "
+                f"judge idle {pipeline_stats['judge_idle_seconds']:.1f}s, "
+                f"answer blocked {pipeline_stats['answer_blocked_seconds']:.1f}s")
+    fanout_stats = FANOUT_STATS.as_dict()
+    logger.info(f"🔀 Fan-out: {fanout_stats['prompt_builds']} prompts built for "
+                f"{fanout_stats['model_prompts']} model prompts")
+
+    # Write one results file per model in the single-model runners' format
+    outputs = {}
+    logger.info(f"\n🎯 Final Results:")
+    for model in models:
+        if not results[model]:
+            logger.error(f"❌ No questions were successfully processed with {model}!")
+            continue
+        processed_count = len(results[model])
+        final_avg_score = total_scores[model] / processed_count
+        telemetry_summary = run_telemetry[model].summary()
+        logger.info(f"🏆 {model}: average judge score {final_avg_score:.3f} over {processed_count} questions")
+        log_telemetry_summary(logger, telemetry_summary)
+        output_data = {
+            "metadata": {
+                "total_questions": total_questions,
+                "processed_questions": processed_count,
+                "average_judge_score": final_avg_score,
+                "model": model,
+                "judge_model": config.judge_model,
+                "fan_out_models": models,
+                "qa_file": config.qa_file,
+                "oracle_docs_file": config.oracle_docs_file,
+                "requests_per_minute": config.requests_per_minute,
+                "tokens_per_minute": config.tokens_per_minute,
+                "stream": config.stream,
+                "max_output_tokens": config.max_output_tokens,
+                "rate_limiter": {
+                    "answer": answer_rate_limiters[model].stats(),
+                    "judge": judge_rate_limiter.stats()
+                },
+                "pipeline": pipeline_stats,
+                "fan_out": fanout_stats,
+                "response_cache": cache.stats(),
+                "pre_judge": pre_judge.stats(),
+                "document_store": question_docs_map.stats(),
+                "context_packing": dict(PACKING_STATS.as_dict(), strategy=config.context_strategy,
+                                        budget=get_context_budget(model, config.context_budget)),
+                "telemetry": telemetry_summary
+            },
+            "results": results[model]
+        }
+        output_file = model_output_file(config, model)
+        write_to_json_atomic(output_data, output_file)
+        logger.info(f"💾 {model} results saved to: {output_file}")
+        outputs[model] = output_data
+
+    # Clean up the checkpoint journals once every model's results are written
+    if len(outputs) == len(models):
+        for model in models:
+            os.remove(model_checkpoint_file(config, model))
+        logger.info("🧹 Checkpoint journals cleaned up")
+    return outputs or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run MoNaCo Oracle Retrieval Evaluation for several models at once")
+    parser.add_argument("--models", default="gpt-5,gemini-2.5-pro",
+                       help="Comma-separated models; gemini-* models use the Gemini API, all others the "
+                            "OpenAI-compatible endpoint (default: gpt-5,gemini-2.5-pro)")
+    parser.add_argument("--judge_model", default="gpt-4.1",
+                       help="Shared judge model for every model's answers (default: gpt-4.1)")
+    parser.add_argument("--openai_api_key", default=os.getenv("OPENAI_API_KEY"),
+                       help="OpenAI API key for OpenAI models and the judge (default: $OPENAI_API_KEY)")
+    parser.add_argument("--google_api_key", default=os.getenv("GOOGLE_API_KEY"),
+                       help="Google API key for Gemini models (default: $GOOGLE_API_KEY)")
+    parser.add_argument("--base_url", default=None,
+                       help="OpenAI-compatible base URL, e.g. http://localhost:8000/v1 for mock_llm_server.py")
+    parser.add_argument("--gemini_base_url", default=None,
+                       help="Gemini API endpoint, e.g. http://localhost:8000 for mock_llm_server.py")
+    parser.add_argument("--qa_file", default="monaco_version_1_release.json",
+                       help="Path to QA file with gold answers")
+    parser.add_argument("--oracle_docs", default="docs_oracle_retrieval_2025.jsonl",
+                       help="Path to Oracle retrieval documents file")
+    parser.add_argument("--doc_store", default=None,
+                       help="Binary document store built from --oracle_docs on first use "
+                            "(default: <oracle_docs>.docstore)")
+    parser.add_argument("--context_strategy", choices=PACKING_STRATEGIES, default="keep_all",
+                       help="How to fit gold documents into each model's token budget; prompts that still "
+                            "do not fit are skipped for that model (default: keep_all)")
+    parser.add_argument("--context_budget", type=int, default=None,
+                       help="Prompt token budget for every model (default: from consts.MODEL_CONTEXT_TOKENS)")
+    parser.add_argument("--output_dir", default="results",
+                       help="Directory for the per-model results files and checkpoint journals (default: results)")
+    parser.add_argument("--max_questions", type=int, default=None,
+                       help="Maximum number of questions to process (for testing)")
+    parser.add_argument("--start_question", type=int, default=0,
+                       help="Starting question index (0-based, default: 0)")
+    parser.add_argument("--answer_workers", type=int, default=3,
+                       help="Questions answered at once, each by every model (default: 3)")
+    parser.add_argument("--judge_workers", type=int, default=3,
+                       help="Questions judged at once, every model's answer in parallel (default: 3)")
+    parser.add_argument("--pipeline_queue_size", type=int, default=None,
+                       help="Max answered questions waiting for the judge (default: 2 * judge workers)")
+    parser.add_argument("--requests_per_minute", type=int, default=30,
+                       help="Answer rate limit per model (default: 30)")
+    parser.add_argument("--judge_requests_per_minute", type=int, default=None,
+                       help="Judge rate limit (default: --requests_per_minute times the number of models)")
+    parser.add_argument("--tokens_per_minute", type=int, default=None,
+                       help="Token quota per minute per model (default: no token limit)")
+    parser.add_argument("--burst", type=int, default=1,
+                       help="Requests allowed back-to-back before rate limiting spaces them out (default: 1)")
+    parser.add_argument("--cache", choices=["read", "write", "off"], default="off",
+                       help="Response cache: write (serve hits, store new responses), read (serve hits only) "
+                            "or off (default: off)")
+    parser.add_argument("--cache_file", default="response_cache.sqlite",
+                       help="SQLite response cache file (default: response_cache.sqlite)")
+    parser.add_argument("--cache_max_mb", type=int, default=2048,
+                       help="Evict least recently used cache entries beyond this size (default: 2048)")
+    parser.add_argument("--pre_judge", action="store_true",
+                       help="Score trivially decidable answers (numbers, yes/no, exact matches) without the LLM judge")
+    parser.add_argument("--alias_file", default=None,
+                       help="JSON map of answer -> aliases for the pre-judge (default: consts.ANS_ALIAS_CACHE)")
+    parser.add_argument("--stream", action="store_true",
+                       help="Stream answers and record time to first token and output tokens/s per question")
+    parser.add_argument("--max_output_tokens", type=int, default=None,
+                       help="With --stream, stop reading an answer past this many tokens (default: no limit)")
+
+    args = parser.parse_args()
+
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+    if not models:
+        print("❌ No models given (--models)")
+        sys.exit(1)
+    if len({model_slug(m) for m in models}) != len(models):
+        print(f"❌ Models must have distinct names: {models}")
+        sys.exit(1)
+    if not args.openai_api_key:
+        print("❌ OpenAI API key needed for the judge (--openai_api_key or OPENAI_API_KEY)")
+        sys.exit(1)
+    if any(provider_for_model(m) == "gemini" for m in models) and not args.google_api_key:
+        print("❌ Google API key needed for Gemini models (--google_api_key or GOOGLE_API_KEY)")
+        sys.exit(1)
+    if not os.path.exists(args.qa_file):
+        print(f"❌ QA file not found: {args.qa_file}")
+        sys.exit(1)
+    if not os.path.exists(args.oracle_docs):
+        print(f"❌ Oracle docs file not found: {args.oracle_docs}")
+        sys.exit(1)
+
+    config = EvaluationConfig(
+        qa_file=args.qa_file,
+        oracle_docs_file=args.oracle_docs,
+        models=models,
+        openai_api_key=args.openai_api_key,
+        google_api_key=args.google_api_key,
+        base_url=args.base_url,
+        gemini_base_url=args.gemini_base_url,
+        judge_model=args.judge_model,
+        output_dir=args.output_dir,
+        max_questions=args.max_questions,
+        start_question=args.start_question,
+        answer_workers=args.answer_workers,
+        judge_workers=args.judge_workers,
+        pipeline_queue_size=args.pipeline_queue_size,
+        requests_per_minute=args.requests_per_minute,
+        judge_requests_per_minute=args.judge_requests_per_minute,
+        tokens_per_minute=args.tokens_per_minute,
+        burst=args.burst,
+        cache_mode=args.cache,
+        cache_file=args.cache_file,
+        cache_max_mb=args.cache_max_mb,
+        pre_judge=args.pre_judge,
+        alias_file=args.alias_file,
+        doc_store=args.doc_store,
+        context_strategy=args.context_strategy,
+        context_budget=args.context_budget,
+        stream=args.stream,
+        max_output_tokens=args.max_output_tokens
+    )
+
+    run_multi_model_evaluation(config)
+
+
+if __name__ == "__main__":
+    main()
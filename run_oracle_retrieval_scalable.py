@@ -6,18 +6,18 @@ This script runs the Oracle retrieval mode for MoNaCo benchmark evaluation
 with improvements for large-scale deployment:
 - Rate limiting and retry logic
 - Checkpointing and resume capability
-- Parallel processing
+- Parallel processing (answer/judge pipeline on threads or asyncio)
 - Memory-efficient streaming
 - Better error handling and logging
 """
 
 import os
 import sys
-import json
 import argparse
 import time
+import asyncio
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Tuple
 from tqdm import tqdm
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
@@ -28,8 +28,21 @@ from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_excep
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompts'))
 
-from utils import load_json, write_to_json, write_jsonl
-from prompts.retrieval_augmented_setup import get_formatted_gold_documents_list
+from utils import load_json, write_to_json_atomic
+from rate_limiter import RateLimiter, estimate_tokens
+from checkpoint_journal import CheckpointJournal, load_journal
+from pipeline import TwoStagePipeline, QueueDepthMetrics
+from response_cache import ResponseCache
+from work_queue import WorkQueue, default_worker_id, run_worker_loop, merge_chunk_results
+from pre_judge import PreJudge
+from adaptive_concurrency import AdaptiveConcurrency, concurrency_slot, concurrency_slot_async, wait_retry_after
+from streaming import collect_openai_stream, collect_openai_stream_async, openai_stream_kwargs
+from telemetry import RunTelemetry, StageTelemetry, api_call, log_telemetry_summary, record_cache_hit, stage
+from context_packer import PACKING_STRATEGIES, PackedContext, PackingStats, get_context_budget, pack_documents
+from batch_judge import (JudgeItem, JUDGE_TOKENS_PER_ITEM, BatchJudgeStats, build_batched_judge_prompt,
+                         parse_batched_judgment)
+from prompts.retrieval_augmented_setup import (get_formatted_gold_documents_list, DocumentStore, PromptCache,
+                                               count_tokens)
 from prompts.answer_judgement_prompt_V2 import single_answer_llm_judge_prompt, multi_answer_llm_judge_prompt
 from prompts.evaluate_final_answers import compute_llm_judge_score_V2
 
@@ -40,18 +53,71 @@ class EvaluationConfig:
     qa_file: str
     oracle_docs_file: str
     api_key: str
+    base_url: Optional[str] = None  # OpenAI-compatible endpoint (e.g. mock_llm_server.py); None = api.openai.com
     output_file: str = "oracle_retrieval_results.json"
     checkpoint_file: str = "oracle_checkpoint.json"
     model: str = "gpt-4"
     max_questions: Optional[int] = None
     start_question: int = 0  # Starting question index (0-based)
-    max_workers: int = 5  # Number of parallel workers
+    max_workers: int = 5  # Number of parallel workers (default for both pipeline stages)
+    engine: str = "pipeline"  # "pipeline" (answer/judge thread stages), "async" (AsyncOpenAI) or "batch" (legacy)
+    answer_workers: Optional[int] = None  # Answer stage workers (defaults to max_workers)
+    judge_workers: Optional[int] = None  # Judge stage workers (defaults to max_workers)
+    pipeline_queue_size: Optional[int] = None  # Bounded answer->judge queue (defaults to 2 * judge_workers)
     requests_per_minute: int = 60  # Rate limit
+    tokens_per_minute: Optional[int] = None  # Token quota (None = requests only)
+    burst: int = 1  # Requests that may be sent back-to-back before spacing kicks in
+    rate_limit_state: Optional[str] = None  # Shared limiter state file (e.g. /dev/shm/...) for multi-job quotas
+    # Both stages call config.model on one quota, so by default each gets half of it
+    answer_requests_per_minute: Optional[int] = None  # Answer stage rate limit (defaults to its share of requests_per_minute)
+    judge_requests_per_minute: Optional[int] = None  # Judge stage rate limit (defaults to its share of requests_per_minute)
     checkpoint_interval: int = 10  # Save checkpoint every N processed questions
+    checkpoint_mode: str = "json"  # "json" (full rewrite every interval) or "journal" (append-only JSONL)
+    cache_mode: str = "off"  # Response cache: "read", "write" or "off"
+    cache_file: str = "response_cache.sqlite"
+    cache_max_mb: int = 2048  # LRU eviction bound for the response cache
+    pre_judge: bool = False  # Score trivially decidable answers locally instead of calling the judge
+    alias_file: Optional[str] = None  # Answer alias map for the pre-judge (defaults to consts.ANS_ALIAS_CACHE)
+    judge_batch_size: int = 1  # Answers judged per judge request (pipeline/async engines; 1 = one per question)
+    judge_batch_timeout: float = 1.0  # Seconds a judge worker waits to fill a batch
+    work_queue: Optional[str] = None  # Shared SQLite work queue for distributed runs (None = single process)
+    chunk_size: int = 10  # Questions per work queue chunk
+    lease_seconds: float = 900.0  # Chunks whose lease is not renewed for this long are reassigned
+    steal_after: Optional[float] = None  # Once the queue is drained, re-run chunks leased longer than this
+    worker_id: Optional[str] = None  # Defaults to host:task:pid
+    doc_store: Optional[str] = None  # Binary Oracle document store (default: <oracle_docs_file>.docstore)
+    context_strategy: str = "keep_all"  # "keep_all", "truncate_longest" or "drop_lowest_overlap"
+    context_budget: Optional[int] = None  # Prompt token budget (default: model context window minus answer room)
+    adaptive_concurrency: bool = False  # AIMD requests in flight per stage, starting from the worker counts
+    max_concurrency: int = 32  # Upper bound for the adaptive limit (and the worker pools in adaptive mode)
+    latency_target: Optional[float] = None  # Seconds; the limit only grows below this (default: 2x best latency)
+    stream: bool = False  # Stream answers, recording time to first token and output tokens/s
+    max_output_tokens: Optional[int] = None  # Streamed answers are cut off past this many tokens
     max_retries: int = 3
     retry_wait_min: float = 1.0
     retry_wait_max: float = 60.0
 
+    def __post_init__(self):
+        self.answer_workers = self.answer_workers or self.max_workers
+        self.judge_workers = self.judge_workers or self.max_workers
+        # A stage without its own limit gets what the other stage leaves of requests_per_minute
+        if not self.answer_requests_per_minute and not self.judge_requests_per_minute:
+            self.answer_requests_per_minute = max(1, self.requests_per_minute // 2)
+        if not self.judge_requests_per_minute:
+            self.judge_requests_per_minute = max(1, self.requests_per_minute - self.answer_requests_per_minute)
+        if not self.answer_requests_per_minute:
+            self.answer_requests_per_minute = max(1, self.requests_per_minute - self.judge_requests_per_minute)
+    
+    @property
+    def stage_tokens_per_minute(self) -> Optional[int]:
+        """Token quota of each stage: half of tokens_per_minute, as both stages share it."""
+        return max(1, self.tokens_per_minute // 2) if self.tokens_per_minute else None
+    
+    @property
+    def client_max_retries(self) -> int:
+        """Retries inside the OpenAI client; in adaptive mode every 429 has to reach the controller."""
+        return 0 if self.adaptive_concurrency else openai.DEFAULT_MAX_RETRIES
+
 
 def setup_logging(log_file: str = "oracle_evaluation.log"):
     """Setup logging configuration."""
@@ -66,9 +132,16 @@ def setup_logging(log_file: str = "oracle_evaluation.log"):
     return logging.getLogger(__name__)
 
 
-def setup_openai_client(api_key: str):
-    """Initialize OpenAI client with API key."""
-    return openai.OpenAI(api_key=api_key)
+def setup_openai_client(api_key: str, base_url: Optional[str] = None,
+                        max_retries: int = openai.DEFAULT_MAX_RETRIES):
+    """Initialize OpenAI client with API key and optional OpenAI-compatible base URL."""
+    return openai.OpenAI(api_key=api_key, base_url=base_url, max_retries=max_retries)
+
+
+def setup_async_openai_client(api_key: str, base_url: Optional[str] = None,
+                              max_retries: int = openai.DEFAULT_MAX_RETRIES):
+    """Initialize asyncio OpenAI client with API key and optional OpenAI-compatible base URL."""
+    return openai.AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=max_retries)
 
 
 def create_oracle_retrieval_prompt(question: str, gold_documents: List[str]) -> str:
@@ -89,52 +162,166 @@ Answer:"""
     return prompt
 
 
-class RateLimiter:
-    """Simple rate limiter for API calls."""
+# Built prompts per (model, question), reused when a question is answered again in this process
+PROMPT_CACHE = PromptCache(max_entries=256)
+PACKING_STATS = PackingStats()
+
+
+def build_oracle_prompt(question: str, question_docs_map,
+                        config: EvaluationConfig) -> Optional[Tuple[Optional[str], PackedContext]]:
+    """Pack the gold documents into the model's token budget and build the Oracle prompt.
+
+    Returns (prompt, packed context), with prompt None if it cannot fit the budget,
+    or None if the question has no usable documents.
+    """
+    def build():
+        gold_documents = get_formatted_gold_documents_list(question, question_docs_map, is_bm25_retrieval=False)
+        if not gold_documents:
+            return None
+        document_tokens = (question_docs_map.question_document_tokens(question)
+                           if isinstance(question_docs_map, DocumentStore) else None)
+        packed = pack_documents(
+            question, gold_documents, get_context_budget(config.model, config.context_budget),
+            config.context_strategy, document_tokens, count_tokens(create_oracle_retrieval_prompt(question, []))
+        )
+        PACKING_STATS.record(packed)
+        if not packed.fits:
+            return None, packed
+        return create_oracle_retrieval_prompt(question, packed.documents), packed
+    return PROMPT_CACHE.get_or_build(config.model, question, build)
+
+
+def build_completion_kwargs(model: str, prompt: str, max_tokens: int) -> Dict[str, Any]:
+    """Build chat completion arguments, using different parameter names for different models."""
+    kwargs = {
+        "model": model,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ]
+    }
+    if "gpt-5" not in model:
+        kwargs["max_tokens"] = max_tokens
+        kwargs["temperature"] = 0.1
+    return kwargs
+
+
+def build_judge_prompt(question: str, response: str, correct_answer: str, gold_answers_length: int) -> str:
+    """Choose the appropriate judge prompt based on number of answers."""
+    if gold_answers_length == 1:
+        return single_answer_llm_judge_prompt.format(
+            question=question,
+            response=response,
+            correct_answer=correct_answer
+        )
+    return multi_answer_llm_judge_prompt.format(
+        question=question,
+        response=response,
+        correct_answer=correct_answer
+    )
+
+
+def format_gold_answers(qa_info: Dict) -> Tuple[Any, str, int]:
+    """Return the gold answers, their judge-prompt string and the number of gold answers."""
+    gold_answers = qa_info.get("validated_answer", qa_info.get("gold_answers", []))
+    if isinstance(gold_answers, list) and len(gold_answers) > 0 and isinstance(gold_answers[0], list):
+        # Handle nested list format like [['disorder', 'symptom', 'treatment'], ...]
+        gold_answers_str = " | ".join([" - ".join(map(str, answer)) for answer in gold_answers])
+    else:
+        gold_answers_str = " | ".join(map(str, gold_answers)) if isinstance(gold_answers, list) else str(gold_answers)
+    gold_answers_length = len(gold_answers) if isinstance(gold_answers, list) else 1
+    return gold_answers, gold_answers_str, gold_answers_length
+
+
+def cache_params(completion_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Generation parameters that, together with model and prompt, identify a cached response."""
+    return {k: v for k, v in completion_kwargs.items() if k not in ("model", "messages")}
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_retry_after(wait_exponential(multiplier=1, min=1, max=60)),
+    retry=retry_if_exception_type((openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError))
+)
+def get_llm_response_with_retry(client: openai.OpenAI, prompt: str, model: str, rate_limiter: RateLimiter,
+                                cache: Optional[ResponseCache] = None, stream: bool = False,
+                                max_output_tokens: Optional[int] = None) -> str:
+    """Get response from LLM with retry logic, rate limiting and optional response cache.
+    
+    With stream=True the answer is read as a stream (recording time to first token) and
+    cut off past max_output_tokens; cut-off answers are not cached.
+    """
+    completion_kwargs = build_completion_kwargs(model, prompt, max_tokens=1000)
+    if cache is not None:
+        cached = cache.get(model, cache_params(completion_kwargs), prompt)
+        if cached is not None:
+            record_cache_hit()
+            return cached
     
-    def __init__(self, requests_per_minute: int):
-        self.requests_per_minute = requests_per_minute
-        self.min_interval = 60.0 / requests_per_minute
-        self.last_request_time = 0.0
+    reserved_tokens = estimate_tokens(prompt) + 1000
+    waited = rate_limiter.wait_if_needed(reserved_tokens)
     
-    def wait_if_needed(self):
-        """Wait if necessary to respect rate limit."""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        if time_since_last < self.min_interval:
-            sleep_time = self.min_interval - time_since_last
-            time.sleep(sleep_time)
-        self.last_request_time = time.time()
+    try:
+        with concurrency_slot(rate_limiter.concurrency) as slot_wait, api_call(model, waited + slot_wait) as call:
+            if stream:
+                started = time.perf_counter()
+                streamed = collect_openai_stream(
+                    client.chat.completions.create(**openai_stream_kwargs(completion_kwargs)),
+                    prompt, started, max_output_tokens
+                )
+                call.record_stream(streamed)
+                content = streamed.text.strip()
+            else:
+                response = client.chat.completions.create(**completion_kwargs)
+                call.usage = response.usage
+                content = response.choices[0].message.content.strip()
+        rate_limiter.settle(reserved_tokens, getattr(call.usage, "total_tokens", None))
+        if cache is not None and not call.stream_aborted:
+            cache.put(model, cache_params(completion_kwargs), prompt, content)
+        return content
+    except Exception as e:
+        logging.error(f"Error getting LLM response: {e}")
+        raise
 
 
 @retry(
     stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=1, max=60),
+    wait=wait_retry_after(wait_exponential(multiplier=1, min=1, max=60)),
     retry=retry_if_exception_type((openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError))
 )
-def get_llm_response_with_retry(client: openai.OpenAI, prompt: str, model: str, rate_limiter: RateLimiter) -> str:
-    """Get response from LLM with retry logic and rate limiting."""
-    rate_limiter.wait_if_needed()
+async def get_llm_response_with_retry_async(client: openai.AsyncOpenAI, prompt: str, model: str,
+                                            rate_limiter: RateLimiter,
+                                            cache: Optional[ResponseCache] = None, stream: bool = False,
+                                            max_output_tokens: Optional[int] = None) -> str:
+    """Asyncio variant of get_llm_response_with_retry."""
+    completion_kwargs = build_completion_kwargs(model, prompt, max_tokens=1000)
+    if cache is not None:
+        cached = cache.get(model, cache_params(completion_kwargs), prompt)
+        if cached is not None:
+            record_cache_hit()
+            return cached
+    
+    reserved_tokens = estimate_tokens(prompt) + 1000
+    waited = await rate_limiter.wait_if_needed_async(reserved_tokens)
     
     try:
-        # Use different parameter names for different models
-        if "gpt-5" in model:
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-        else:
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1000,
-                temperature=0.1
-            )
-        return response.choices[0].message.content.strip()
+        async with concurrency_slot_async(rate_limiter.concurrency) as slot_wait:
+            with api_call(model, waited + slot_wait) as call:
+                if stream:
+                    started = time.perf_counter()
+                    streamed = await collect_openai_stream_async(
+                        await client.chat.completions.create(**openai_stream_kwargs(completion_kwargs)),
+                        prompt, started, max_output_tokens
+                    )
+                    call.record_stream(streamed)
+                    content = streamed.text.strip()
+                else:
+                    response = await client.chat.completions.create(**completion_kwargs)
+                    call.usage = response.usage
+                    content = response.choices[0].message.content.strip()
+        rate_limiter.settle(reserved_tokens, getattr(call.usage, "total_tokens", None))
+        if cache is not None and not call.stream_aborted:
+            cache.put(model, cache_params(completion_kwargs), prompt, content)
+        return content
     except Exception as e:
         logging.error(f"Error getting LLM response: {e}")
         raise
@@ -142,48 +329,71 @@ def get_llm_response_with_retry(client: openai.OpenAI, prompt: str, model: str,
 
 @retry(
     stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=1, max=60),
+    wait=wait_retry_after(wait_exponential(multiplier=1, min=1, max=60)),
     retry=retry_if_exception_type((openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError))
 )
 def evaluate_answer_with_retry(client: openai.OpenAI, question: str, response: str, correct_answer: str, 
-                              gold_answers_length: int, model: str, rate_limiter: RateLimiter) -> Dict[str, Any]:
+                              gold_answers_length: int, model: str, rate_limiter: RateLimiter,
+                              cache: Optional[ResponseCache] = None) -> Dict[str, Any]:
     """Evaluate the answer using LLM-as-judge with retry logic."""
-    rate_limiter.wait_if_needed()
-    
-    # Choose the appropriate prompt based on number of answers
-    if gold_answers_length == 1:
-        judge_prompt = single_answer_llm_judge_prompt.format(
-            question=question,
-            response=response,
-            correct_answer=correct_answer
-        )
-    else:
-        judge_prompt = multi_answer_llm_judge_prompt.format(
-            question=question,
-            response=response,
-            correct_answer=correct_answer
-        )
+    judge_prompt = build_judge_prompt(question, response, correct_answer, gold_answers_length)
+    completion_kwargs = build_completion_kwargs(model, judge_prompt, max_tokens=500)
+    judgment = cache.get(model, cache_params(completion_kwargs), judge_prompt) if cache is not None else None
+    if judgment is not None:
+        record_cache_hit()
     
     try:
-        # Use different parameter names for different models
-        if "gpt-5" in model:
-            judge_response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "user", "content": judge_prompt}
-                ]
-            )
-        else:
-            judge_response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "user", "content": judge_prompt}
-                ],
-                max_tokens=500,
-                temperature=0.1
-            )
+        if judgment is None:
+            reserved_tokens = estimate_tokens(judge_prompt) + 500
+            waited = rate_limiter.wait_if_needed(reserved_tokens)
+            with concurrency_slot(rate_limiter.concurrency) as slot_wait, api_call(model, waited + slot_wait) as call:
+                judge_response = client.chat.completions.create(**completion_kwargs)
+                call.usage = judge_response.usage
+            rate_limiter.settle(reserved_tokens, getattr(judge_response.usage, "total_tokens", None))
+            
+            judgment = judge_response.choices[0].message.content.strip()
+            if cache is not None:
+                cache.put(model, cache_params(completion_kwargs), judge_prompt, judgment)
+        scores = compute_llm_judge_score_V2(judgment, gold_answers_length)
         
-        judgment = judge_response.choices[0].message.content.strip()
+        return {
+            "judgment": judgment,
+            "scores": scores
+        }
+    except Exception as e:
+        logging.error(f"Error evaluating answer: {e}")
+        raise
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_retry_after(wait_exponential(multiplier=1, min=1, max=60)),
+    retry=retry_if_exception_type((openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError))
+)
+async def evaluate_answer_with_retry_async(client: openai.AsyncOpenAI, question: str, response: str,
+                                           correct_answer: str, gold_answers_length: int, model: str,
+                                           rate_limiter: RateLimiter,
+                                           cache: Optional[ResponseCache] = None) -> Dict[str, Any]:
+    """Asyncio variant of evaluate_answer_with_retry."""
+    judge_prompt = build_judge_prompt(question, response, correct_answer, gold_answers_length)
+    completion_kwargs = build_completion_kwargs(model, judge_prompt, max_tokens=500)
+    judgment = cache.get(model, cache_params(completion_kwargs), judge_prompt) if cache is not None else None
+    if judgment is not None:
+        record_cache_hit()
+    
+    try:
+        if judgment is None:
+            reserved_tokens = estimate_tokens(judge_prompt) + 500
+            waited = await rate_limiter.wait_if_needed_async(reserved_tokens)
+            async with concurrency_slot_async(rate_limiter.concurrency) as slot_wait:
+                with api_call(model, waited + slot_wait) as call:
+                    judge_response = await client.chat.completions.create(**completion_kwargs)
+                    call.usage = judge_response.usage
+            rate_limiter.settle(reserved_tokens, getattr(judge_response.usage, "total_tokens", None))
+            
+            judgment = judge_response.choices[0].message.content.strip()
+            if cache is not None:
+                cache.put(model, cache_params(completion_kwargs), judge_prompt, judgment)
         scores = compute_llm_judge_score_V2(judgment, gold_answers_length)
         
         return {
@@ -195,60 +405,414 @@ def evaluate_answer_with_retry(client: openai.OpenAI, question: str, response: s
         raise
 
 
-def process_single_question(question: str, qa_info: Dict, question_docs_map: Dict, 
-                          client: openai.OpenAI, config: EvaluationConfig, 
-                          rate_limiter: RateLimiter) -> Optional[Dict[str, Any]]:
-    """Process a single question and return the result."""
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_retry_after(wait_exponential(multiplier=1, min=1, max=60)),
+    retry=retry_if_exception_type((openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError))
+)
+def evaluate_answers_batch_with_retry(client: openai.OpenAI, items: List[JudgeItem], model: str,
+                                      rate_limiter: RateLimiter,
+                                      cache: Optional[ResponseCache] = None) -> List[Optional[Dict[str, Any]]]:
+    """Judge several answers with one batched request; None marks items that failed to parse."""
+    judge_prompt = build_batched_judge_prompt(items)
+    completion_kwargs = build_completion_kwargs(model, judge_prompt, max_tokens=JUDGE_TOKENS_PER_ITEM * len(items))
+    judgment = cache.get(model, cache_params(completion_kwargs), judge_prompt) if cache is not None else None
+    if judgment is not None:
+        record_cache_hit()
+    
+    if judgment is None:
+        reserved_tokens = estimate_tokens(judge_prompt) + JUDGE_TOKENS_PER_ITEM * len(items)
+        waited = rate_limiter.wait_if_needed(reserved_tokens)
+        with concurrency_slot(rate_limiter.concurrency) as slot_wait, api_call(model, waited + slot_wait) as call:
+            judge_response = client.chat.completions.create(**completion_kwargs)
+            call.usage = judge_response.usage
+        rate_limiter.settle(reserved_tokens, getattr(judge_response.usage, "total_tokens", None))
+        
+        judgment = judge_response.choices[0].message.content.strip()
+        if cache is not None:
+            cache.put(model, cache_params(completion_kwargs), judge_prompt, judgment)
+    return parse_batched_judgment(judgment, [item[3] for item in items])
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_retry_after(wait_exponential(multiplier=1, min=1, max=60)),
+    retry=retry_if_exception_type((openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError))
+)
+async def evaluate_answers_batch_with_retry_async(client: openai.AsyncOpenAI, items: List[JudgeItem], model: str,
+                                                  rate_limiter: RateLimiter,
+                                                  cache: Optional[ResponseCache] = None
+                                                  ) -> List[Optional[Dict[str, Any]]]:
+    """Asyncio variant of evaluate_answers_batch_with_retry."""
+    judge_prompt = build_batched_judge_prompt(items)
+    completion_kwargs = build_completion_kwargs(model, judge_prompt, max_tokens=JUDGE_TOKENS_PER_ITEM * len(items))
+    judgment = cache.get(model, cache_params(completion_kwargs), judge_prompt) if cache is not None else None
+    if judgment is not None:
+        record_cache_hit()
+    
+    if judgment is None:
+        reserved_tokens = estimate_tokens(judge_prompt) + JUDGE_TOKENS_PER_ITEM * len(items)
+        waited = await rate_limiter.wait_if_needed_async(reserved_tokens)
+        async with concurrency_slot_async(rate_limiter.concurrency) as slot_wait:
+            with api_call(model, waited + slot_wait) as call:
+                judge_response = await client.chat.completions.create(**completion_kwargs)
+                call.usage = judge_response.usage
+        rate_limiter.settle(reserved_tokens, getattr(judge_response.usage, "total_tokens", None))
+        
+        judgment = judge_response.choices[0].message.content.strip()
+        if cache is not None:
+            cache.put(model, cache_params(completion_kwargs), judge_prompt, judgment)
+    return parse_batched_judgment(judgment, [item[3] for item in items])
+
+
+def build_result(answer: Dict[str, Any], gold_answers: Any, evaluation: Dict[str, Any],
+                 judge_telemetry: Optional[StageTelemetry] = None) -> Dict[str, Any]:
+    """Final result record for a judged answer."""
+    return {
+        "question": answer["question"],
+        "gold_answers": gold_answers,
+        "llm_response": answer["llm_response"],
+        "evaluation": evaluation,
+        "num_gold_documents": answer["num_gold_documents"],
+        "packed_prompt_tokens": answer["context_packing"]["packed_prompt_tokens"],
+        "context_packing": answer["context_packing"],
+        "telemetry": {
+            "answer": answer.get("telemetry"),
+            "judge": judge_telemetry.as_dict() if judge_telemetry is not None else None
+        },
+        "canary": answer["qa_info"].get("canary", "")
+    }
+
+
+def pre_judge_batch(answers: List[Dict[str, Any]],
+                    pre_judge: Optional[PreJudge]) -> Tuple[Dict[int, Dict[str, Any]], List[int], List[JudgeItem]]:
+    """Split a judge batch into pre-judged evaluations and the items left for the LLM judge."""
+    evaluations = {}
+    remaining = []
+    items = []
+    for i, answer in enumerate(answers):
+        gold_answers, gold_answers_str, gold_answers_length = format_gold_answers(answer["qa_info"])
+        evaluation = pre_judge.judge(answer["llm_response"], gold_answers) if pre_judge is not None else None
+        if evaluation is not None:
+            evaluations[i] = evaluation
+            continue
+        remaining.append(i)
+        items.append((answer["question"], answer["llm_response"], gold_answers_str, gold_answers_length))
+    return evaluations, remaining, items
+
+
+def judge_answers_batch(answers: List[Dict[str, Any]], client: openai.OpenAI, config: EvaluationConfig,
+                        rate_limiter: RateLimiter, batch_stats: BatchJudgeStats,
+                        cache: Optional[ResponseCache] = None,
+                        pre_judge: Optional[PreJudge] = None) -> List[Optional[Dict[str, Any]]]:
+    """Judge stage for --judge_batch_size > 1: one judge request for all answers the pre-judge leaves."""
+    evaluations, remaining, items = pre_judge_batch(answers, pre_judge)
+    batch_telemetry = StageTelemetry("judge", config.model)
+    if len(items) > 1:
+        try:
+            with stage("judge", config.model) as batch_telemetry:
+                batch_evaluations = evaluate_answers_batch_with_retry(
+                    client, items, config.model, rate_limiter, cache
+                )
+        except Exception as e:
+            logging.error(f"Error evaluating judge batch of {len(items)} answers: {e}")
+            batch_evaluations = [None] * len(items)
+        batch_stats.record_batch(len(items), batch_evaluations.count(None))
+        evaluations.update({i: e for i, e in zip(remaining, batch_evaluations) if e is not None})
+    
+    # Batch-judged answers share the batch request's telemetry; pre-judged ones cost nothing
+    shared_telemetry = batch_telemetry.share(len(items))
+    results = []
+    for i, answer in enumerate(answers):
+        if i in evaluations:
+            judge_telemetry = shared_telemetry if i in remaining else StageTelemetry("judge", config.model)
+            results.append(build_result(answer, format_gold_answers(answer["qa_info"])[0], evaluations[i],
+                                        judge_telemetry))
+            continue
+        # Items the batch could not score are re-judged one at a time (a lone item was never batched)
+        if len(items) <= 1:
+            batch_stats.record_unbatched()
+        results.append(judge_single_answer(answer, client, config, rate_limiter, cache))
+    return results
+
+
+async def judge_answers_batch_async(answers: List[Dict[str, Any]], client: openai.AsyncOpenAI,
+                                    config: EvaluationConfig, rate_limiter: RateLimiter,
+                                    batch_stats: BatchJudgeStats,
+                                    cache: Optional[ResponseCache] = None,
+                                    pre_judge: Optional[PreJudge] = None) -> List[Optional[Dict[str, Any]]]:
+    """Asyncio variant of judge_answers_batch."""
+    evaluations, remaining, items = pre_judge_batch(answers, pre_judge)
+    batch_telemetry = StageTelemetry("judge", config.model)
+    if len(items) > 1:
+        try:
+            with stage("judge", config.model) as batch_telemetry:
+                batch_evaluations = await evaluate_answers_batch_with_retry_async(
+                    client, items, config.model, rate_limiter, cache
+                )
+        except Exception as e:
+            logging.error(f"Error evaluating judge batch of {len(items)} answers: {e}")
+            batch_evaluations = [None] * len(items)
+        batch_stats.record_batch(len(items), batch_evaluations.count(None))
+        evaluations.update({i: e for i, e in zip(remaining, batch_evaluations) if e is not None})
+    
+    # Batch-judged answers share the batch request's telemetry; pre-judged ones cost nothing
+    shared_telemetry = batch_telemetry.share(len(items))
+    results = []
+    for i, answer in enumerate(answers):
+        if i in evaluations:
+            judge_telemetry = shared_telemetry if i in remaining else StageTelemetry("judge", config.model)
+            results.append(build_result(answer, format_gold_answers(answer["qa_info"])[0], evaluations[i],
+                                        judge_telemetry))
+            continue
+        if len(items) <= 1:
+            batch_stats.record_unbatched()
+        results.append(await judge_single_answer_async(answer, client, config, rate_limiter, cache))
+    return results
+
+
+def answer_single_question(question: str, qa_info: Dict, question_docs_map: Dict,
+                           client: openai.OpenAI, config: EvaluationConfig,
+                           rate_limiter: RateLimiter,
+                           cache: Optional[ResponseCache] = None) -> Optional[Dict[str, Any]]:
+    """Answer stage: build the Oracle prompt and get the model response."""
     try:
-        # Get formatted gold documents
-        gold_documents = get_formatted_gold_documents_list(
-            question, question_docs_map, is_bm25_retrieval=False
-        )
+        # Create Oracle retrieval prompt from the formatted gold documents
+        prompt_info = build_oracle_prompt(question, question_docs_map, config)
         
-        if not gold_documents:
+        if prompt_info is None:
             logging.warning(f"No valid documents for question: {question[:100]}...")
             return None
-        
-        # Create Oracle retrieval prompt
-        oracle_prompt = create_oracle_retrieval_prompt(question, gold_documents)
+        oracle_prompt, packed = prompt_info
+        if oracle_prompt is None:
+            logging.warning(f"📏 Prompt needs {packed.prompt_tokens} tokens, over the {packed.budget} token budget "
+                            f"for {config.model}; skipping question: {question[:100]}...")
+            return None
         
         # Get LLM response
-        llm_response = get_llm_response_with_retry(client, oracle_prompt, config.model, rate_limiter)
+        with stage("answer", config.model) as answer_telemetry:
+            llm_response = get_llm_response_with_retry(client, oracle_prompt, config.model, rate_limiter, cache,
+                                                       config.stream, config.max_output_tokens)
         
         if not llm_response:
             logging.warning(f"No LLM response for question: {question[:100]}...")
             return None
         
-        # Evaluate the answer
-        gold_answers = qa_info.get("validated_answer", qa_info.get("gold_answers", []))
-        if isinstance(gold_answers, list) and len(gold_answers) > 0 and isinstance(gold_answers[0], list):
-            # Handle nested list format like [['disorder', 'symptom', 'treatment'], ...]
-            gold_answers_str = " | ".join([" - ".join(map(str, answer)) for answer in gold_answers])
-        else:
-            gold_answers_str = " | ".join(map(str, gold_answers)) if isinstance(gold_answers, list) else str(gold_answers)
+        return {
+            "question": question,
+            "qa_info": qa_info,
+            "llm_response": llm_response,
+            "num_gold_documents": len(packed.documents),
+            "context_packing": packed.as_dict(),
+            "telemetry": answer_telemetry.as_dict()
+        }
         
-        evaluation = evaluate_answer_with_retry(
-            client, question, llm_response, gold_answers_str, 
-            len(gold_answers) if isinstance(gold_answers, list) else 1, config.model, rate_limiter
-        )
+    except Exception as e:
+        logging.error(f"Error answering question {question[:100]}: {e}")
+        return None
+
+
+def judge_single_answer(answer: Dict[str, Any], client: openai.OpenAI, config: EvaluationConfig,
+                        rate_limiter: RateLimiter,
+                        cache: Optional[ResponseCache] = None,
+                        pre_judge: Optional[PreJudge] = None) -> Optional[Dict[str, Any]]:
+    """Judge stage: evaluate an answer from answer_single_question and build the result."""
+    question = answer["question"]
+    qa_info = answer["qa_info"]
+    try:
+        # Evaluate the answer, locally if the pre-judge can decide it
+        gold_answers, gold_answers_str, gold_answers_length = format_gold_answers(qa_info)
+        
+        with stage("judge", config.model) as judge_telemetry:
+            evaluation = pre_judge.judge(answer["llm_response"], gold_answers) if pre_judge is not None else None
+            if evaluation is None:
+                evaluation = evaluate_answer_with_retry(
+                    client, question, answer["llm_response"], gold_answers_str, 
+                    gold_answers_length, config.model, rate_limiter, cache
+                )
+        
+        return build_result(answer, gold_answers, evaluation, judge_telemetry)
+        
+    except Exception as e:
+        logging.error(f"Error judging question {question[:100]}: {e}")
+        return None
+
+
+def process_single_question(question: str, qa_info: Dict, question_docs_map: Dict, 
+                          client: openai.OpenAI, config: EvaluationConfig, 
+                          rate_limiter: RateLimiter,
+                          judge_rate_limiter: Optional[RateLimiter] = None,
+                          cache: Optional[ResponseCache] = None,
+                          pre_judge: Optional[PreJudge] = None) -> Optional[Dict[str, Any]]:
+    """Process a single question (answer, then judge) and return the result."""
+    answer = answer_single_question(question, qa_info, question_docs_map, client, config, rate_limiter, cache)
+    if answer is None:
+        return None
+    return judge_single_answer(answer, client, config, judge_rate_limiter or rate_limiter, cache, pre_judge)
+
+
+async def answer_single_question_async(question: str, qa_info: Dict, question_docs_map: Dict,
+                                       client: openai.AsyncOpenAI, config: EvaluationConfig,
+                                       rate_limiter: RateLimiter,
+                                       cache: Optional[ResponseCache] = None) -> Optional[Dict[str, Any]]:
+    """Asyncio variant of answer_single_question."""
+    try:
+        prompt_info = build_oracle_prompt(question, question_docs_map, config)
+        
+        if prompt_info is None:
+            logging.warning(f"No valid documents for question: {question[:100]}...")
+            return None
+        oracle_prompt, packed = prompt_info
+        if oracle_prompt is None:
+            logging.warning(f"📏 Prompt needs {packed.prompt_tokens} tokens, over the {packed.budget} token budget "
+                            f"for {config.model}; skipping question: {question[:100]}...")
+            return None
+        
+        with stage("answer", config.model) as answer_telemetry:
+            llm_response = await get_llm_response_with_retry_async(
+                client, oracle_prompt, config.model, rate_limiter, cache, config.stream, config.max_output_tokens
+            )
+        
+        if not llm_response:
+            logging.warning(f"No LLM response for question: {question[:100]}...")
+            return None
         
-        # Store results
-        result = {
+        return {
             "question": question,
-            "gold_answers": gold_answers,
+            "qa_info": qa_info,
             "llm_response": llm_response,
-            "evaluation": evaluation,
-            "num_gold_documents": len(gold_documents),
-            "canary": qa_info.get("canary", "")
+            "num_gold_documents": len(packed.documents),
+            "context_packing": packed.as_dict(),
+            "telemetry": answer_telemetry.as_dict()
         }
         
-        return result
+    except Exception as e:
+        logging.error(f"Error answering question {question[:100]}: {e}")
+        return None
+
+
+async def judge_single_answer_async(answer: Dict[str, Any], client: openai.AsyncOpenAI,
+                                    config: EvaluationConfig, rate_limiter: RateLimiter,
+                                    cache: Optional[ResponseCache] = None,
+                                    pre_judge: Optional[PreJudge] = None) -> Optional[Dict[str, Any]]:
+    """Asyncio variant of judge_single_answer."""
+    question = answer["question"]
+    qa_info = answer["qa_info"]
+    try:
+        gold_answers, gold_answers_str, gold_answers_length = format_gold_answers(qa_info)
+        
+        with stage("judge", config.model) as judge_telemetry:
+            evaluation = pre_judge.judge(answer["llm_response"], gold_answers) if pre_judge is not None else None
+            if evaluation is None:
+                evaluation = await evaluate_answer_with_retry_async(
+                    client, question, answer["llm_response"], gold_answers_str,
+                    gold_answers_length, config.model, rate_limiter, cache
+                )
+        
+        return build_result(answer, gold_answers, evaluation, judge_telemetry)
         
     except Exception as e:
-        logging.error(f"Error processing question {question[:100]}: {e}")
+        logging.error(f"Error judging question {question[:100]}: {e}")
         return None
 
 
+async def process_questions_async(questions: List[str], qa_data: Dict, question_docs_map: Dict,
+                                  config: EvaluationConfig, answer_rate_limiter: RateLimiter,
+                                  judge_rate_limiter: RateLimiter,
+                                  handle_result: Callable[[str, Optional[Dict[str, Any]]], None],
+                                  metrics: Optional[QueueDepthMetrics] = None,
+                                  cache: Optional[ResponseCache] = None,
+                                  pre_judge: Optional[PreJudge] = None,
+                                  batch_stats: Optional[BatchJudgeStats] = None,
+                                  answer_workers: Optional[int] = None, judge_workers: Optional[int] = None):
+    """Two-stage asyncio pipeline with no batch barriers.
+    
+    answer_workers (default config.answer_workers) coroutines keep answer requests in flight
+    over the whole list and hand answers to judge_workers (default config.judge_workers)
+    judge coroutines through a bounded queue. With
+    config.judge_batch_size > 1 each judge coroutine scores up to that many queued answers
+    in one batched judge request. handle_result runs on the event loop thread.
+    """
+    client = setup_async_openai_client(config.api_key, config.base_url, config.client_max_retries)
+    answer_workers = answer_workers or config.answer_workers
+    judge_workers = judge_workers or config.judge_workers
+    metrics = metrics or QueueDepthMetrics()
+    batch_stats = batch_stats or BatchJudgeStats(config.judge_batch_size)
+    pending: asyncio.Queue = asyncio.Queue()
+    for question in questions:
+        pending.put_nowait(question)
+    handoff: asyncio.Queue = asyncio.Queue(
+        maxsize=config.pipeline_queue_size or 2 * judge_workers * config.judge_batch_size
+    )
+    
+    async def answer_worker():
+        while True:
+            try:
+                question = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            answer = await answer_single_question_async(
+                question, qa_data[question], question_docs_map, client, config, answer_rate_limiter, cache
+            )
+            if answer is None:
+                metrics.add("answer_failures")
+                handle_result(question, None)
+                continue
+            metrics.add("answered")
+            wait_start = time.time()
+            await handoff.put(answer)
+            metrics.add("answer_blocked_seconds", time.time() - wait_start)
+            metrics.record_depth(handoff.qsize())
+    
+    async def take_batch():
+        """Wait for one answer, then collect up to judge_batch_size; True once the stop marker is seen."""
+        wait_start = time.time()
+        answer = await handoff.get()
+        metrics.add("judge_idle_seconds", time.time() - wait_start)
+        if answer is None:
+            return [], True
+        batch = [answer]
+        deadline = time.time() + config.judge_batch_timeout
+        while len(batch) < config.judge_batch_size:
+            try:
+                answer = await asyncio.wait_for(handoff.get(), timeout=max(0.0, deadline - time.time()))
+            except asyncio.TimeoutError:
+                break
+            if answer is None:
+                return batch, True
+            batch.append(answer)
+        return batch, False
+    
+    async def judge_worker():
+        while True:
+            batch, stopped = await take_batch()
+            if batch:
+                metrics.record_depth(handoff.qsize())
+                if config.judge_batch_size > 1:
+                    results = await judge_answers_batch_async(
+                        batch, client, config, judge_rate_limiter, batch_stats, cache, pre_judge
+                    )
+                else:
+                    results = [await judge_single_answer_async(
+                        batch[0], client, config, judge_rate_limiter, cache, pre_judge
+                    )]
+                for answer, result in zip(batch, results):
+                    metrics.add("judged" if result is not None else "judge_failures")
+                    handle_result(answer["question"], result)
+            if stopped:
+                return
+    
+    async def answer_stage():
+        await asyncio.gather(*(answer_worker() for _ in range(max(1, answer_workers))))
+        for _ in range(max(1, judge_workers)):
+            await handoff.put(None)
+    
+    try:
+        await asyncio.gather(answer_stage(), *(judge_worker() for _ in range(max(1, judge_workers))))
+    finally:
+        await client.close()
+
+
 def save_checkpoint(checkpoint_file: str, processed_questions: List[str], results: List[Dict], 
                    total_score: float, processed_count: int):
     """Save checkpoint data."""
@@ -259,12 +823,15 @@ def save_checkpoint(checkpoint_file: str, processed_questions: List[str], result
         "processed_count": processed_count,
         "timestamp": time.time()
     }
-    write_to_json(checkpoint_data, checkpoint_file)
+    write_to_json_atomic(checkpoint_data, checkpoint_file)
     logging.info(f"Checkpoint saved: {processed_count} questions processed")
 
 
-def load_checkpoint(checkpoint_file: str) -> Optional[Dict]:
+def load_checkpoint(checkpoint_file: str, checkpoint_mode: str = "json") -> Optional[Dict]:
     """Load checkpoint data if it exists."""
+    if checkpoint_mode == "journal":
+        # Not caught: starting fresh would append to (and mix into) a file that isn't a journal
+        return load_journal(checkpoint_file)
     if os.path.exists(checkpoint_file):
         try:
             checkpoint_data = load_json(checkpoint_file)
@@ -282,14 +849,51 @@ def run_oracle_retrieval_evaluation_scalable(config: EvaluationConfig):
     logger.info("🚀 Starting MoNaCo Oracle Retrieval Evaluation (Scalable Version)")
     logger.info(f"📁 QA File: {config.qa_file}")
     logger.info(f"📁 Oracle Docs File: {config.oracle_docs_file}")
+    logger.info(f"📏 Context packing: {config.context_strategy}, "
+                f"{get_context_budget(config.model, config.context_budget)} token prompt budget")
     logger.info(f"🤖 Model: {config.model}")
     logger.info(f"💾 Output File: {config.output_file}")
-    logger.info(f"🔄 Max Workers: {config.max_workers}")
-    logger.info(f"⏱️  Rate Limit: {config.requests_per_minute} req/min")
+    logger.info(f"🔄 Max Workers: {config.max_workers} "
+                f"(answer: {config.answer_workers}, judge: {config.judge_workers})")
+    logger.info(f"⚙️  Engine: {config.engine}")
+    if config.stream:
+        logger.info(f"🌊 Streaming answers (output token limit: {config.max_output_tokens or 'none'})")
+    logger.info(f"⏱️  Rate Limit: answer {config.answer_requests_per_minute} req/min, "
+                f"judge {config.judge_requests_per_minute} req/min, "
+                f"{config.stage_tokens_per_minute or 'unlimited'} tokens/min per stage, burst {config.burst}")
     
-    # Initialize OpenAI client and rate limiter
-    client = setup_openai_client(config.api_key)
-    rate_limiter = RateLimiter(config.requests_per_minute)
+    # Initialize OpenAI client and one rate limiter (and adaptive concurrency controller) per stage
+    client = setup_openai_client(config.api_key, config.base_url, config.client_max_retries)
+    answer_concurrency = judge_concurrency = None
+    answer_pool_size, judge_pool_size = config.answer_workers, config.judge_workers
+    if config.adaptive_concurrency:
+        answer_concurrency = AdaptiveConcurrency("answer", config.answer_workers, config.max_concurrency,
+                                                 latency_target=config.latency_target, logger=logger)
+        judge_concurrency = AdaptiveConcurrency("judge", config.judge_workers, config.max_concurrency,
+                                                latency_target=config.latency_target, logger=logger)
+        logger.info(f"🎚️  Adaptive concurrency: answer {answer_concurrency.limit}, judge {judge_concurrency.limit} "
+                    f"in flight to start, up to {config.max_concurrency}")
+        # The controllers decide what is in flight; the worker pools only have to be large enough
+        answer_pool_size = judge_pool_size = config.max_concurrency
+    answer_rate_limiter = RateLimiter(
+        config.answer_requests_per_minute, tokens_per_minute=config.stage_tokens_per_minute,
+        burst=config.burst, state_file=config.rate_limit_state, name=f"{config.model}:answer",
+        concurrency=answer_concurrency
+    )
+    judge_rate_limiter = RateLimiter(
+        config.judge_requests_per_minute, tokens_per_minute=config.stage_tokens_per_minute,
+        burst=config.burst, state_file=config.rate_limit_state, name=f"{config.model}:judge",
+        concurrency=judge_concurrency
+    )
+    cache = ResponseCache(config.cache_file, config.cache_mode, config.cache_max_mb * 1024 ** 2)
+    if cache.enabled:
+        logger.info(f"🗄️  Response cache: {config.cache_file} ({config.cache_mode})")
+    pre_judge = PreJudge(config.pre_judge, config.alias_file)
+    if pre_judge.enabled:
+        logger.info(f"⚖️  Pre-judge enabled ({len(pre_judge.aliases)} answer aliases loaded)")
+    batch_stats = BatchJudgeStats(config.judge_batch_size)
+    if config.judge_batch_size > 1:
+        logger.info(f"📦 Batched judging: up to {config.judge_batch_size} answers per judge request")
     
     # Load QA data
     logger.info("📖 Loading QA data...")
@@ -297,18 +901,15 @@ def run_oracle_retrieval_evaluation_scalable(config: EvaluationConfig):
     
     # Create question-to-documents mapping from Oracle docs
     logger.info("🗂️  Processing Oracle documents...")
-    from prompts.retrieval_augmented_setup import index_gold_documents_by_question
-    
-    # Create temporary mapping file
-    temp_mapping_file = "temp_oracle_mapping.json"
-    index_gold_documents_by_question(config.oracle_docs_file, temp_mapping_file)
-    question_docs_map = load_json(temp_mapping_file)
-    
-    # Clean up temp file
-    os.remove(temp_mapping_file)
+    # Built once per docs file, then shared read-only (via mmap) by every run and shard
+    question_docs_map = DocumentStore(config.oracle_docs_file, config.doc_store)
+    if not question_docs_map.built:
+        logger.info(f"🗂️  Reusing document store {question_docs_map.store_path}")
     
     logger.info(f"📊 Found {len(qa_data)} questions in QA file")
     logger.info(f"📊 Found {len(question_docs_map)} questions with Oracle documents")
+    logger.info(f"📚 {question_docs_map.stats()['unique_documents']} unique formatted documents "
+                f"({question_docs_map.stats()['tokenizer']} token counts)")
     
     # Process questions - prioritize questions that have Oracle documents
     all_qa_questions = list(qa_data.keys())
@@ -327,8 +928,15 @@ def run_oracle_retrieval_evaluation_scalable(config: EvaluationConfig):
     if config.max_questions:
         questions_to_process = questions_to_process[:config.max_questions]
     
-    # Load checkpoint if exists
-    checkpoint_data = load_checkpoint(config.checkpoint_file)
+    # Load checkpoint if exists (in distributed mode finished chunks take the place of checkpoints)
+    work_queue = None
+    if config.work_queue:
+        worker_id = config.worker_id or default_worker_id()
+        work_queue = WorkQueue(config.work_queue, config.lease_seconds, steal_after=config.steal_after)
+        logger.info(f"🧩 Distributed mode: worker {worker_id} on queue {config.work_queue}")
+        checkpoint_data = None
+    else:
+        checkpoint_data = load_checkpoint(config.checkpoint_file, config.checkpoint_mode)
     if checkpoint_data:
         processed_questions = set(checkpoint_data["processed_questions"])
         results = checkpoint_data["results"]
@@ -346,71 +954,190 @@ def run_oracle_retrieval_evaluation_scalable(config: EvaluationConfig):
     
     logger.info(f"🔄 Processing {len(questions_to_process)} questions...")
     
-    # Process questions in parallel batches
-    batch_size = config.max_workers * 2  # Process in small batches to allow for checkpointing
+    # In journal mode every finished result is appended (and fsync'd) as it arrives
+    journal = None
+    if config.checkpoint_mode == "journal" and work_queue is None:
+        journal = CheckpointJournal(config.checkpoint_file)
+    run_telemetry = RunTelemetry()
     
     # Initialize progress bar for SLURM (with explicit flush)
     progress_bar = tqdm(
-        total=len(questions_to_process), 
+        total=len(questions_to_process) if work_queue is None else None, 
         desc="Processing questions", 
         unit="q",
         mininterval=1.0,  # Update every second
         file=sys.stdout
     )
     
-    for i in range(0, len(questions_to_process), batch_size):
-        batch_questions = questions_to_process[i:i+batch_size]
+    def handle_result(question: str, result: Optional[Dict[str, Any]]):
+        """Record a finished question: update totals and progress bar, save checkpoint periodically."""
+        nonlocal total_score, processed_count
+        if not result:
+            return
+        results.append(result)
+        run_telemetry.record(result)
+        total_score += result["evaluation"]["scores"]["judge_score"]
+        processed_count += 1
+        processed_questions.add(question)
         
-        with ThreadPoolExecutor(max_workers=config.max_workers) as executor:
-            # Submit tasks for this batch
-            future_to_question = {}
-            for question in batch_questions:
-                if question not in question_docs_map:
-                    continue
-                    
-                qa_info = qa_data[question]
-                future = executor.submit(
-                    process_single_question, 
-                    question, qa_info, question_docs_map, 
-                    client, config, rate_limiter
-                )
-                future_to_question[future] = question
+        # Update progress bar (only every few completions to reduce noise)
+        avg_score = total_score / processed_count
+        if processed_count % 1 == 0:  # Update on every completion but less noisy
+            postfix = {
+                'avg_score': f'{avg_score:.3f}',
+                'score': f'{result["evaluation"]["scores"]["judge_score"]:.2f}',
+                'queue': queue_depth()
+            }
+            if config.adaptive_concurrency:
+                postfix['conc'] = f'{answer_concurrency.limit}/{judge_concurrency.limit}'
+            progress_bar.set_postfix(postfix)
+            progress_bar.update(1)
+        
+        # Save checkpoint: append to the journal, or rewrite the JSON checkpoint periodically
+        if journal is not None:
+            journal.append(result)
+        elif work_queue is None and processed_count % config.checkpoint_interval == 0:
+            save_checkpoint(
+                config.checkpoint_file, 
+                list(processed_questions), 
+                results, 
+                total_score, 
+                processed_count
+            )
+    
+    queue_depth = lambda: 0
+    async_metrics = QueueDepthMetrics()
+    pipeline = None
+    if config.engine == "async":
+        logger.info("⚡ Using asyncio engine")
+    elif config.engine == "pipeline":
+        pipeline = TwoStagePipeline(
+            answer_fn=lambda question: answer_single_question(
+                question, qa_data[question], question_docs_map, client, config, answer_rate_limiter, cache
+            ),
+            judge_fn=(lambda answers: judge_answers_batch(
+                answers, client, config, judge_rate_limiter, batch_stats, cache, pre_judge
+            )) if config.judge_batch_size > 1 else (lambda answer: judge_single_answer(
+                answer, client, config, judge_rate_limiter, cache, pre_judge
+            )),
+            answer_workers=answer_pool_size,
+            judge_workers=judge_pool_size,
+            queue_size=config.pipeline_queue_size,
+            logger=logger,
+            judge_batch_size=config.judge_batch_size,
+            judge_batch_timeout=config.judge_batch_timeout
+        )
+        queue_depth = pipeline.queue_depth
+    
+    def run_questions(questions: List[str]):
+        """Run the configured engine over questions, passing each finished one to handle_result."""
+        questions_with_docs = [q for q in questions if q in question_docs_map]
+        if config.engine == "async":
+            asyncio.run(process_questions_async(
+                questions_with_docs, qa_data, question_docs_map, config,
+                answer_rate_limiter, judge_rate_limiter, handle_result, async_metrics, cache, pre_judge, batch_stats,
+                answer_pool_size, judge_pool_size
+            ))
+        elif pipeline is not None:
+            for question, result in pipeline.run(questions_with_docs):
+                handle_result(question, result)
+        else:
+            # Legacy engine: process questions in parallel batches
+            batch_size = config.max_workers * 2  # Process in small batches to allow for checkpointing
             
-            # Process completed tasks
-            for future in as_completed(future_to_question):
-                question = future_to_question[future]
-                try:
-                    result = future.result()
-                    if result:
-                        results.append(result)
-                        total_score += result["evaluation"]["scores"]["judge_score"]
-                        processed_count += 1
-                        processed_questions.add(question)
-                        
-                        # Update progress bar (only every few completions to reduce noise)
-                        avg_score = total_score / processed_count
-                        if processed_count % 1 == 0:  # Update on every completion but less noisy
-                            progress_bar.set_postfix({
-                                'avg_score': f'{avg_score:.3f}',
-                                'score': f'{result["evaluation"]["scores"]["judge_score"]:.2f}'
-                            })
-                            progress_bar.update(1)
-                        
-                        # Save checkpoint periodically
-                        if processed_count % config.checkpoint_interval == 0:
-                            save_checkpoint(
-                                config.checkpoint_file, 
-                                list(processed_questions), 
-                                results, 
-                                total_score, 
-                                processed_count
-                            )
+            for i in range(0, len(questions_with_docs), batch_size):
+                batch_questions = questions_with_docs[i:i+batch_size]
                 
-                except Exception as e:
-                    logger.error(f"Error processing question {question[:100]}: {e}")
-                    progress_bar.update(1)  # Still update progress on error
+                with ThreadPoolExecutor(max_workers=config.max_workers) as executor:
+                    # Submit tasks for this batch
+                    future_to_question = {}
+                    for question in batch_questions:
+                        qa_info = qa_data[question]
+                        future = executor.submit(
+                            process_single_question, 
+                            question, qa_info, question_docs_map, 
+                            client, config, answer_rate_limiter, judge_rate_limiter, cache, pre_judge
+                        )
+                        future_to_question[future] = question
+                    
+                    # Process completed tasks
+                    for future in as_completed(future_to_question):
+                        question = future_to_question[future]
+                        try:
+                            handle_result(question, future.result())
+                        except Exception as e:
+                            logger.error(f"Error processing question {question[:100]}: {e}")
+                            progress_bar.update(1)  # Still update progress on error
+    
+    if work_queue is not None:
+        # Distributed mode: claim chunks from the shared queue until it is drained
+        if work_queue.initialize([q for q in questions_to_process if q in question_docs_map], config.chunk_size):
+            logger.info(f"🧩 Initialized work queue {config.work_queue} with chunks of {config.chunk_size}")
+        
+        def process_chunk(chunk_questions: List[str]) -> List[Dict[str, Any]]:
+            first_result = len(results)
+            run_questions(chunk_questions)
+            return results[first_result:]
+        
+        completed_chunks = run_worker_loop(work_queue, worker_id, process_chunk, logger=logger)
+        logger.info(f"🧩 Worker {worker_id} completed {completed_chunks} chunks")
+    else:
+        run_questions(questions_to_process)
+    
+    pipeline_stats = None
+    if config.engine == "async":
+        pipeline_stats = {
+            "answer_workers": answer_pool_size,
+            "judge_workers": judge_pool_size,
+            **async_metrics.as_dict()
+        }
+    elif pipeline is not None:
+        pipeline_stats = pipeline.stats()
+        logger.info(f"📬 Pipeline: max queue depth {pipeline_stats['max_queue_depth']}, "
+                    f"judge idle {pipeline_stats['judge_idle_seconds']:.1f}s, "
+                    f"answer blocked {pipeline_stats['answer_blocked_seconds']:.1f}s")
     
     progress_bar.close()
+    if journal is not None:
+        journal.close()
+    if pre_judge.enabled:
+        logger.info(f"⚖️  Pre-judge avoided {pre_judge.stats()['judge_calls_avoided']} judge calls")
+    telemetry_summary = run_telemetry.summary()
+    log_telemetry_summary(logger, telemetry_summary)
+    
+    run_metadata = {
+        "model": config.model,
+        "qa_file": config.qa_file,
+        "oracle_docs_file": config.oracle_docs_file,
+        "max_workers": config.max_workers,
+        "requests_per_minute": config.requests_per_minute,
+        "checkpoint_mode": config.checkpoint_mode,
+        "tokens_per_minute": config.tokens_per_minute,
+        "engine": config.engine,
+        "adaptive_concurrency": config.adaptive_concurrency,
+        "stream": config.stream,
+        "max_output_tokens": config.max_output_tokens
+    }
+    
+    if work_queue is not None:
+        # Only the worker that sees the last chunk finish merges the chunk results
+        if not work_queue.try_claim_merge(worker_id):
+            logger.info("🧩 Chunk results are merged by the last worker to finish")
+            return None
+        output_data = merge_chunk_results(
+            work_queue.result_files(), config.output_file,
+            dict(run_metadata, total_questions=len(questions_to_process), work_queue=config.work_queue,
+                 workers=work_queue.workers()),
+            work_queue.failed_chunks()
+        )
+        logger.info(f"\n🎯 Final Results (merged):")
+        logger.info(f"📊 Total Questions Processed: {output_data['metadata']['processed_questions']}")
+        logger.info(f"🏆 Average Judge Score: {output_data['metadata']['average_judge_score']:.3f}")
+        if output_data['metadata']['failed_chunks']:
+            logger.warning(f"⚠️  {output_data['metadata']['failed_questions']} questions missing: "
+                           f"{len(output_data['metadata']['failed_chunks'])} chunks ran out of attempts")
+        logger.info(f"💾 Results saved to: {config.output_file}")
+        return output_data
     
     # Calculate final metrics
     if processed_count > 0:
@@ -425,16 +1152,25 @@ def run_oracle_retrieval_evaluation_scalable(config: EvaluationConfig):
                 "total_questions": len(questions_to_process) + processed_count - len(results),
                 "processed_questions": processed_count,
                 "average_judge_score": final_avg_score,
-                "model": config.model,
-                "qa_file": config.qa_file,
-                "oracle_docs_file": config.oracle_docs_file,
-                "max_workers": config.max_workers,
-                "requests_per_minute": config.requests_per_minute
+                **run_metadata,
+                "rate_limiter": {
+                    "answer": answer_rate_limiter.stats(),
+                    "judge": judge_rate_limiter.stats()
+                },
+                "pipeline": pipeline_stats,
+                "response_cache": cache.stats(),
+                "pre_judge": pre_judge.stats(),
+                "document_store": dict(question_docs_map.stats(), prompt_cache=PROMPT_CACHE.stats()),
+                "context_packing": dict(PACKING_STATS.as_dict(), strategy=config.context_strategy,
+                                        budget=get_context_budget(config.model, config.context_budget)),
+                "judge_batching": batch_stats.as_dict(),
+                "telemetry": telemetry_summary
             },
             "results": results
         }
         
-        write_to_json(output_data, config.output_file)
+        # Compact the run into the final output once
+        write_to_json_atomic(output_data, config.output_file)
         logger.info(f"💾 Results saved to: {config.output_file}")
         
         # Clean up checkpoint file
@@ -451,10 +1187,20 @@ def run_oracle_retrieval_evaluation_scalable(config: EvaluationConfig):
 def main():
     parser = argparse.ArgumentParser(description="Run MoNaCo Oracle Retrieval Evaluation (Scalable Version)")
     parser.add_argument("--api_key", required=True, help="OpenAI API key")
+    parser.add_argument("--base_url", default=None,
+                       help="OpenAI-compatible base URL, e.g. http://localhost:8000/v1 for mock_llm_server.py")
     parser.add_argument("--qa_file", default="monaco_version_1_release.json", 
                        help="Path to QA file with gold answers")
     parser.add_argument("--oracle_docs", default="docs_oracle_retrieval_2025.jsonl",
                        help="Path to Oracle retrieval documents file")
+    parser.add_argument("--doc_store", default=None,
+                       help="Binary document store built from --oracle_docs on first use "
+                            "(default: <oracle_docs>.docstore)")
+    parser.add_argument("--context_strategy", choices=PACKING_STRATEGIES, default="keep_all",
+                       help="How to fit gold documents into the model's token budget; prompts that still "
+                            "do not fit are skipped before any API call (default: keep_all)")
+    parser.add_argument("--context_budget", type=int, default=None,
+                       help="Prompt token budget (default: from consts.MODEL_CONTEXT_TOKENS for the model)")
     parser.add_argument("--output", default="oracle_retrieval_results.json",
                        help="Output file for results")
     parser.add_argument("--checkpoint", default="oracle_checkpoint.json",
@@ -469,8 +1215,72 @@ def main():
                        help="Number of parallel workers (default: 5)")
     parser.add_argument("--requests_per_minute", type=int, default=60,
                        help="Rate limit for API calls (default: 60)")
+    parser.add_argument("--tokens_per_minute", type=int, default=None,
+                       help="Token quota per minute, split evenly between the answer and judge stages "
+                            "(default: no token limit)")
+    parser.add_argument("--burst", type=int, default=1,
+                       help="Requests allowed back-to-back before rate limiting spaces them out (default: 1)")
+    parser.add_argument("--rate_limit_state", default=None,
+                       help="Shared rate limiter state file, e.g. /dev/shm/monaco_gpt5.bucket, "
+                            "so several jobs on a node share one quota")
     parser.add_argument("--checkpoint_interval", type=int, default=10,
                        help="Save checkpoint every N questions (default: 10)")
+    parser.add_argument("--cache", choices=["read", "write", "off"], default="off",
+                       help="Response cache: write (serve hits, store new responses), read (serve hits only) "
+                            "or off (default: off)")
+    parser.add_argument("--cache_file", default="response_cache.sqlite",
+                       help="SQLite response cache file (default: response_cache.sqlite)")
+    parser.add_argument("--cache_max_mb", type=int, default=2048,
+                       help="Evict least recently used cache entries beyond this size (default: 2048)")
+    parser.add_argument("--judge_batch_size", type=int, default=1,
+                       help="Answers packed into one judge request (pipeline/async engines; default: 1)")
+    parser.add_argument("--judge_batch_timeout", type=float, default=1.0,
+                       help="Seconds a judge worker waits to fill a batch (default: 1.0)")
+    parser.add_argument("--work_queue", default=None,
+                       help="Shared SQLite work queue; every worker pointing at it claims chunks until the run "
+                            "is done, and the last one merges the results into --output")
+    parser.add_argument("--chunk_size", type=int, default=10,
+                       help="Questions per work queue chunk (default: 10)")
+    parser.add_argument("--lease_seconds", type=float, default=900.0,
+                       help="Reassign a chunk if its worker stops renewing the lease for this long (default: 900)")
+    parser.add_argument("--steal_after", type=float, default=None,
+                       help="Once the queue is drained, re-run chunks that have been leased longer than this")
+    parser.add_argument("--worker_id", default=None,
+                       help="Worker name in the work queue (default: host:task:pid)")
+    parser.add_argument("--pre_judge", action="store_true",
+                       help="Score trivially decidable answers (numbers, yes/no, exact matches) without the LLM judge")
+    parser.add_argument("--alias_file", default=None,
+                       help="JSON map of answer -> aliases for the pre-judge (default: consts.ANS_ALIAS_CACHE)")
+    parser.add_argument("--checkpoint_mode", choices=["json", "journal"], default="json",
+                       help="json: rewrite the full checkpoint every --checkpoint_interval questions; "
+                            "journal: append each result to a JSONL checkpoint (default: json)")
+    parser.add_argument("--engine", choices=["pipeline", "async", "batch"], default="pipeline",
+                       help="Execution engine: pipeline (answer and judge thread stages joined by a queue), "
+                            "async (same two stages on AsyncOpenAI) or batch (legacy ThreadPoolExecutor "
+                            "batches; default: pipeline)")
+    parser.add_argument("--answer_workers", type=int, default=None,
+                       help="Answer stage workers (default: --max_workers)")
+    parser.add_argument("--judge_workers", type=int, default=None,
+                       help="Judge stage workers (default: --max_workers)")
+    parser.add_argument("--pipeline_queue_size", type=int, default=None,
+                       help="Max answers waiting for a judge (default: 2 * judge workers)")
+    parser.add_argument("--answer_requests_per_minute", type=int, default=None,
+                       help="Answer stage rate limit (default: half of --requests_per_minute, "
+                            "or what --judge_requests_per_minute leaves of it)")
+    parser.add_argument("--judge_requests_per_minute", type=int, default=None,
+                       help="Judge stage rate limit (default: half of --requests_per_minute, "
+                            "or what --answer_requests_per_minute leaves of it)")
+    parser.add_argument("--adaptive_concurrency", action="store_true",
+                       help="Adapt requests in flight per stage (AIMD): start at the worker counts, grow while "
+                            "latency stays healthy, halve on 429s/timeouts and honour Retry-After")
+    parser.add_argument("--max_concurrency", type=int, default=32,
+                       help="Upper bound for --adaptive_concurrency (default: 32)")
+    parser.add_argument("--latency_target", type=float, default=None,
+                       help="Seconds; adaptive concurrency only grows below this (default: 2x best latency)")
+    parser.add_argument("--stream", action="store_true",
+                       help="Stream answers and record time to first token and output tokens/s per question")
+    parser.add_argument("--max_output_tokens", type=int, default=None,
+                       help="With --stream, stop reading an answer past this many tokens (default: no limit)")
     
     args = parser.parse_args()
     
@@ -488,6 +1298,7 @@ def main():
         qa_file=args.qa_file,
         oracle_docs_file=args.oracle_docs,
         api_key=args.api_key,
+        base_url=args.base_url,
         output_file=args.output,
         checkpoint_file=args.checkpoint,
         model=args.model,
@@ -495,7 +1306,37 @@ def main():
         start_question=args.start_question,
         max_workers=args.max_workers,
         requests_per_minute=args.requests_per_minute,
-        checkpoint_interval=args.checkpoint_interval
+        tokens_per_minute=args.tokens_per_minute,
+        burst=args.burst,
+        rate_limit_state=args.rate_limit_state,
+        checkpoint_interval=args.checkpoint_interval,
+        checkpoint_mode=args.checkpoint_mode,
+        cache_mode=args.cache,
+        cache_file=args.cache_file,
+        cache_max_mb=args.cache_max_mb,
+        pre_judge=args.pre_judge,
+        work_queue=args.work_queue,
+        chunk_size=args.chunk_size,
+        lease_seconds=args.lease_seconds,
+        steal_after=args.steal_after,
+        worker_id=args.worker_id,
+        doc_store=args.doc_store,
+        context_strategy=args.context_strategy,
+        context_budget=args.context_budget,
+        judge_batch_size=args.judge_batch_size,
+        judge_batch_timeout=args.judge_batch_timeout,
+        alias_file=args.alias_file,
+        engine=args.engine,
+        answer_workers=args.answer_workers,
+        judge_workers=args.judge_workers,
+        pipeline_queue_size=args.pipeline_queue_size,
+        answer_requests_per_minute=args.answer_requests_per_minute,
+        judge_requests_per_minute=args.judge_requests_per_minute,
+        adaptive_concurrency=args.adaptive_concurrency,
+        max_concurrency=args.max_concurrency,
+        latency_target=args.latency_target,
+        stream=args.stream,
+        max_output_tokens=args.max_output_tokens
     )
     
     # Run evaluation
@@ -0,0 +1,120 @@
+"""
+Streamed answers with time-to-first-token measurement (--stream).
+
+The answer stage can read the completion as a stream (OpenAI `stream=True`, Gemini
+`generate_content(..., stream=True)`) instead of waiting for the whole response.
+The collectors here join the streamed text, note when the first text arrived and
+stop reading once the answer passes --max_output_tokens, so a runaway answer does
+not hold a worker for minutes. Aborted answers keep the text received so far.
+"""
+
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from rate_limiter import CHARS_PER_TOKEN, estimate_tokens
+
+
+@dataclass
+class StreamUsage:
+    """Token usage of a stream that ended without a usage report (e.g. aborted), estimated from the text."""
+    prompt_tokens: int
+    completion_tokens: int
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+@dataclass
+class StreamResult:
+    """Joined text of a streamed completion and how it arrived."""
+    text: str
+    usage: Any
+    first_token_seconds: Optional[float]
+    aborted: bool = False
+
+
+class StreamCollector:
+    """Accumulates streamed text pieces, timing the first one and enforcing the output token limit."""
+
+    def __init__(self, prompt: str, started: float, max_output_tokens: Optional[int] = None):
+        self.prompt = prompt
+        self.started = started
+        self.max_output_tokens = max_output_tokens
+        self.pieces: List[str] = []
+        self.chars = 0
+        self.first_token_seconds: Optional[float] = None
+        self.aborted = False
+
+    def add(self, piece: Optional[str]) -> bool:
+        """Add a piece of text; False once the output token limit is passed and reading should stop."""
+        if not piece:
+            return True
+        if self.first_token_seconds is None:
+            self.first_token_seconds = time.perf_counter() - self.started
+        self.pieces.append(piece)
+        self.chars += len(piece)
+        if self.max_output_tokens and self.chars // CHARS_PER_TOKEN > self.max_output_tokens:
+            self.aborted = True
+            return False
+        return True
+
+    def result(self, usage: Any = None) -> StreamResult:
+        text = "".join(self.pieces)
+        if usage is None or self.aborted:
+            usage = StreamUsage(estimate_tokens(self.prompt), estimate_tokens(text))
+        return StreamResult(text, usage, self.first_token_seconds, self.aborted)
+
+
+def openai_stream_kwargs(completion_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Chat completion arguments for a streamed request that reports usage in its last chunk."""
+    return dict(completion_kwargs, stream=True, stream_options={"include_usage": True})
+
+
+def collect_openai_stream(stream, prompt: str, started: float,
+                          max_output_tokens: Optional[int] = None) -> StreamResult:
+    """Read an OpenAI chat completion stream, closing it early past max_output_tokens."""
+    collector = StreamCollector(prompt, started, max_output_tokens)
+    usage = None
+    try:
+        for chunk in stream:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if chunk.choices and not collector.add(chunk.choices[0].delta.content):
+                break
+    finally:
+        stream.close()
+    return collector.result(usage)
+
+
+async def collect_openai_stream_async(stream, prompt: str, started: float,
+                                      max_output_tokens: Optional[int] = None) -> StreamResult:
+    """Asyncio variant of collect_openai_stream."""
+    collector = StreamCollector(prompt, started, max_output_tokens)
+    usage = None
+    try:
+        async for chunk in stream:
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if chunk.choices and not collector.add(chunk.choices[0].delta.content):
+                break
+    finally:
+        await stream.close()
+    return collector.result(usage)
+
+
+def collect_gemini_stream(response, prompt: str, started: float,
+                          max_output_tokens: Optional[int] = None) -> StreamResult:
+    """Read a streamed Gemini generate_content response, stopping early past max_output_tokens."""
+    collector = StreamCollector(prompt, started, max_output_tokens)
+    for chunk in response:
+        # Chunks without text parts (e.g. only a finish reason) raise on .text
+        parts = chunk.candidates[0].content.parts if chunk.candidates else []
+        if not collector.add("".join(getattr(part, "text", "") for part in parts)):
+            break
+    return collector.result(None if collector.aborted else getattr(response, "usage_metadata", None))
@@ -0,0 +1,255 @@
+"""
+Per-request latency, token and cost telemetry for the evaluation runners.
+
+Each answer or judge step runs inside `stage(...)`, which makes a StageTelemetry the
+current one for that thread or asyncio task. The API call helpers report every
+attempt to it through `api_call(...)`: rate limiter wait, time in the API call,
+prompt/completion tokens from the response's usage and failures (retries);
+streamed answers also report time to first token, output tokens per second and
+early aborts. Cache hits are counted with `record_cache_hit()`. The finished stage is stored on
+the result, and RunTelemetry aggregates results into a run summary: throughput
+per minute and where the time went (rate limiter, API, everything else).
+"""
+
+import os
+import sys
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from consts import MODEL_PRICES_PER_MILLION_TOKENS, MODEL_TIER_NAMES
+from utils import lookup_by_model
+
+STAGES = ("answer", "judge")
+
+_current_stage: contextvars.ContextVar = contextvars.ContextVar("current_stage_telemetry", default=None)
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+    """Estimated USD cost from MODEL_PRICES_PER_MILLION_TOKENS, or None for models without a price."""
+    prices = lookup_by_model(MODEL_PRICES_PER_MILLION_TOKENS, model, other_tiers=MODEL_TIER_NAMES)
+    if prices is None:
+        return None
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+def usage_tokens(usage: Any) -> Tuple[int, int]:
+    """(prompt, completion) tokens from an OpenAI usage or Gemini usage_metadata object."""
+    if usage is None:
+        return 0, 0
+    if hasattr(usage, "prompt_tokens"):
+        return usage.prompt_tokens or 0, usage.completion_tokens or 0
+    # Gemini bills thinking tokens as output tokens
+    completion = (getattr(usage, "candidates_token_count", 0) or 0) + (getattr(usage, "thoughts_token_count", 0) or 0)
+    return getattr(usage, "prompt_token_count", 0) or 0, completion
+
+
+@dataclass
+class StageTelemetry:
+    """Timings and token usage of one answer or judge step, including its retries."""
+    stage: str
+    model: str
+    latency_seconds: float = 0.0
+    api_seconds: float = 0.0
+    rate_limit_wait_seconds: float = 0.0
+    attempts: int = 0
+    retries: int = 0
+    cache_hits: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: Optional[float] = 0.0
+    batch_size: int = 1
+    time_to_first_token_seconds: Optional[float] = None
+    output_tokens_per_second: Optional[float] = None
+    stream_aborted: bool = False
+
+    def share(self, batch_size: int) -> "StageTelemetry":
+        """This (batched) stage amortized over batch_size items."""
+        if batch_size <= 1:
+            return self
+        return StageTelemetry(
+            stage=self.stage,
+            model=self.model,
+            latency_seconds=self.latency_seconds / batch_size,
+            api_seconds=self.api_seconds / batch_size,
+            rate_limit_wait_seconds=self.rate_limit_wait_seconds / batch_size,
+            attempts=self.attempts,
+            retries=self.retries,
+            cache_hits=self.cache_hits,
+            prompt_tokens=self.prompt_tokens // batch_size,
+            completion_tokens=self.completion_tokens // batch_size,
+            cost_usd=self.cost_usd / batch_size if self.cost_usd is not None else None,
+            batch_size=batch_size,
+            time_to_first_token_seconds=self.time_to_first_token_seconds,
+            output_tokens_per_second=self.output_tokens_per_second,
+            stream_aborted=self.stream_aborted
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@contextmanager
+def stage(name: str, model: str) -> Iterator[StageTelemetry]:
+    """Make a new StageTelemetry current for this thread/task and time the block."""
+    telemetry = StageTelemetry(stage=name, model=model)
+    token = _current_stage.set(telemetry)
+    started = time.perf_counter()
+    try:
+        yield telemetry
+    finally:
+        telemetry.latency_seconds = time.perf_counter() - started
+        _current_stage.reset(token)
+
+
+class ApiCall:
+    """Set .usage to the response's usage before leaving the api_call block (and the stream fields if streamed)."""
+    usage: Any = None
+    first_token_seconds: Optional[float] = None
+    stream_aborted: bool = False
+
+    def record_stream(self, result):
+        """Take usage and timings from a streaming.StreamResult."""
+        self.usage = result.usage
+        self.first_token_seconds = result.first_token_seconds
+        self.stream_aborted = result.aborted
+
+
+@contextmanager
+def api_call(model: str, wait_seconds: float = 0.0) -> Iterator[ApiCall]:
+    """Record one API attempt (wait, duration, usage, failure) on the current stage, if any."""
+    call = ApiCall()
+    started = time.perf_counter()
+    failed = True
+    try:
+        yield call
+        failed = False
+    finally:
+        telemetry = _current_stage.get()
+        if telemetry is not None:
+            prompt_tokens, completion_tokens = usage_tokens(call.usage)
+            duration = time.perf_counter() - started
+            telemetry.attempts += 1
+            telemetry.retries += 1 if failed else 0
+            telemetry.api_seconds += duration
+            telemetry.rate_limit_wait_seconds += wait_seconds or 0.0
+            telemetry.prompt_tokens += prompt_tokens
+            telemetry.completion_tokens += completion_tokens
+            cost = estimate_cost(model, prompt_tokens, completion_tokens)
+            telemetry.cost_usd = None if cost is None or telemetry.cost_usd is None else telemetry.cost_usd + cost
+            if call.first_token_seconds is not None:
+                generation_seconds = duration - call.first_token_seconds
+                telemetry.time_to_first_token_seconds = call.first_token_seconds
+                telemetry.output_tokens_per_second = (completion_tokens / generation_seconds
+                                                      if generation_seconds > 0 else None)
+                telemetry.stream_aborted = call.stream_aborted
+
+
+def record_cache_hit():
+    """Count a response served from the response cache on the current stage, if any."""
+    telemetry = _current_stage.get()
+    if telemetry is not None:
+        telemetry.cache_hits += 1
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def pick(pct):
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+    return {"mean": sum(ordered) / len(ordered), "p50": pick(50), "p95": pick(95), "p99": pick(99),
+            "max": ordered[-1]}
+
+
+class RunTelemetry:
+    """Thread-safe aggregate of per-result telemetry for the run metadata."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.completed_at: List[float] = []
+        self.stages: Dict[str, List[Dict[str, Any]]] = {name: [] for name in STAGES}
+
+    def record(self, result: Dict[str, Any], stages: Optional[Tuple[str, ...]] = None):
+        """Add a finished result's "telemetry" block, optionally only the given stages."""
+        with self._lock:
+            self.completed_at.append(time.time())
+            for name, telemetry in (result.get("telemetry") or {}).items():
+                if telemetry is not None and (stages is None or name in stages):
+                    self.stages.setdefault(name, []).append(telemetry)
+
+    def _stage_summary(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        latency = sum(r["latency_seconds"] for r in records)
+        api = sum(r["api_seconds"] for r in records)
+        wait = sum(r["rate_limit_wait_seconds"] for r in records)
+        costs = [r["cost_usd"] for r in records]
+        return {
+            "count": len(records),
+            "latency_seconds": _percentiles([r["latency_seconds"] for r in records]),
+            "time_to_first_token_seconds": _percentiles(
+                [r["time_to_first_token_seconds"] for r in records if r.get("time_to_first_token_seconds") is not None]
+            ),
+            "output_tokens_per_second": _percentiles(
+                [r["output_tokens_per_second"] for r in records if r.get("output_tokens_per_second") is not None]
+            ),
+            "stream_aborts": sum(1 for r in records if r.get("stream_aborted")),
+            "total_seconds": latency,
+            "api_seconds": api,
+            "rate_limit_wait_seconds": wait,
+            "other_seconds": max(0.0, latency - api - wait),
+            "attempts": sum(r["attempts"] for r in records),
+            "retries": sum(r["retries"] for r in records),
+            "cache_hits": sum(r["cache_hits"] for r in records),
+            "prompt_tokens": sum(r["prompt_tokens"] for r in records),
+            "completion_tokens": sum(r["completion_tokens"] for r in records),
+            "cost_usd": None if any(c is None for c in costs) else sum(costs)
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """Throughput over time, per-stage latency distributions and the rate-limit/API/other time split."""
+        with self._lock:
+            completed_at = list(self.completed_at)
+            stages = {name: list(records) for name, records in self.stages.items()}
+        wall_seconds = (max(completed_at) if completed_at else time.time()) - self.started
+        per_minute = [0] * (int(wall_seconds // 60) + 1)
+        for finished in completed_at:
+            per_minute[int((finished - self.started) // 60)] += 1
+        stage_summaries = {name: self._stage_summary(records) for name, records in stages.items() if records}
+        total = sum(s["total_seconds"] for s in stage_summaries.values())
+        costs = [s["cost_usd"] for s in stage_summaries.values()]
+        return {
+            "wall_seconds": wall_seconds,
+            "questions": len(completed_at),
+            "questions_per_minute": len(completed_at) / wall_seconds * 60 if wall_seconds > 0 else None,
+            "throughput_per_minute": per_minute,
+            "stages": stage_summaries,
+            "time_split": {
+                key: sum(s[f"{key}_seconds"] for s in stage_summaries.values()) / total if total > 0 else 0.0
+                for key in ("rate_limit_wait", "api", "other")
+            },
+            "estimated_cost_usd": None if any(c is None for c in costs) else sum(costs)
+        }
+
+
+def log_telemetry_summary(logger, summary: Dict[str, Any]):
+    """Log throughput, the time split and estimated cost of a run."""
+    if not summary["questions"]:
+        return
+    split = summary["time_split"]
+    cost = summary["estimated_cost_usd"]
+    logger.info(f"📈 Telemetry: {summary['questions_per_minute']:.1f} q/min, time in rate limiter "
+                f"{split['rate_limit_wait']:.0%}, API {split['api']:.0%}, other {split['other']:.0%}; "
+                f"estimated cost {'n/a' if cost is None else f'${cost:.2f}'}")
+    answer = summary["stages"].get("answer") or {}
+    ttft = (answer.get("time_to_first_token_seconds") or {}).get("p50")
+    if ttft is not None:
+        logger.info(f"📈 Streaming: time to first token p50 {ttft:.2f}s, "
+                    f"{answer['output_tokens_per_second']['p50'] or 0:.1f} output tokens/s p50, "
+                    f"{answer['stream_aborts']} answers cut at the output token limit")
@@ -0,0 +1,82 @@
+"""
+Sidecar cache of token counts for the performance analyzer (llm_performance_breakdown.py).
+
+Oracle documents repeat across questions, and every results file of a run is analyzed
+against the same corpus, so token counts are computed once per unique text and kept in
+a JSON sidecar next to the Oracle docs file ({tokenizer, counts: sha256(text) -> tokens}).
+Texts that are not in the sidecar yet are tokenized together with the encoder's
+multi-threaded encode_batch. Analyzing a new results file against a corpus that was
+already counted does no tokenization at all. The sidecar is discarded when the
+tokenizer changes.
+"""
+
+import os
+import json
+import hashlib
+from typing import Dict, Iterable, Optional
+
+# Texts per encode_batch call (bounds the token lists held in memory at once)
+TOKENIZE_BATCH_SIZE = 2048
+
+
+def text_hash(text: str) -> str:
+    """Content address for a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class TokenCountCache:
+    """Token counts by content hash, memoized in memory and persisted to a JSON sidecar."""
+
+    def __init__(self, cache_file: str, tokenizer_name: str):
+        self.cache_file = cache_file
+        self.tokenizer_name = tokenizer_name
+        self.counts: Dict[str, int] = {}
+        self._by_text: Dict[str, int] = {}
+        self.loaded = 0
+        self.tokenized = 0
+        self._dirty = False
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("tokenizer") == tokenizer_name:
+                    self.counts = data["counts"]
+                    self.loaded = len(self.counts)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ Ignoring unreadable token cache {cache_file}: {e}")
+
+    def get(self, text: str) -> Optional[int]:
+        """Token count of a text, or None if it has not been counted yet."""
+        count = self._by_text.get(text)
+        if count is None:
+            count = self.counts.get(text_hash(text))
+            if count is not None:
+                self._by_text[text] = count
+        return count
+
+    def count_all(self, texts: Iterable[str], encoder, num_threads: int = 8):
+        """Tokenize every text without a cached count, in multi-threaded batches."""
+        missing = list(dict.fromkeys(t for t in texts if self.get(t) is None))
+        for start in range(0, len(missing), TOKENIZE_BATCH_SIZE):
+            batch = missing[start:start + TOKENIZE_BATCH_SIZE]
+            for text, tokens in zip(batch, encoder.encode_batch(batch, num_threads=num_threads,
+                                                                disallowed_special=())):
+                self._by_text[text] = self.counts[text_hash(text)] = len(tokens)
+        self.tokenized += len(missing)
+        self._dirty = self._dirty or bool(missing)
+
+    def save(self):
+        """Write the sidecar if new counts were added; a read-only location only costs a warning."""
+        if not self._dirty:
+            return
+        tmp_file = self.cache_file + ".tmp"
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({"tokenizer": self.tokenizer_name, "counts": self.counts}, f)
+            os.replace(tmp_file, self.cache_file)
+            self._dirty = False
+        except OSError as e:
+            print(f"⚠️ Could not write token cache {self.cache_file}: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"cached_texts": len(self.counts), "loaded": self.loaded, "tokenized": self.tokenized}
@@ -1,6 +1,7 @@
+import os
 import json
 import jsonlines
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable
 import csv
 
 
@@ -45,12 +46,38 @@ def write_to_json(data: Dict[str, Any], output_path: str) -> None:
         json.dump(data, f, indent=2, ensure_ascii=False)
 
 
+def write_to_json_atomic(data: Dict[str, Any], output_path: str) -> None:
+    """Write data to a JSON file via a temp file and rename, so a crash never leaves a half-written file."""
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, output_path)
+
+
 def load_json(file_path: str) -> Dict[str, Any]:
     """Load data from a JSON file."""
     with open(file_path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
 
+def lookup_by_model(table: Dict[str, Any], model: str, default: Any = None, other_tiers: Iterable[str] = ()) -> Any:
+    """Look up a per-model table entry, matching the longest model-name prefix (e.g. gpt-4o-2024-08-06 -> gpt-4o).
+
+    With other_tiers, a match whose remaining name contains one of those words (gpt-5 for
+    gpt-5-mini-2025-08-07) returns default rather than the base model's entry.
+    """
+    model = model.split("/", 1)[1] if model.startswith("models/") else model
+    matches = [name for name in table if model.startswith(name)]
+    if not matches:
+        return default
+    name = max(matches, key=len)
+    if set(model[len(name):].lower().split("-")) & set(other_tiers):
+        return default
+    return table[name]
+
+
 def remove_duplicates_from_list(items: List[str]) -> List[str]:
     """Remove duplicates from a list while preserving order."""
     seen = set()
@@ -76,46 +103,15 @@ LIST_STEP_IDENTIFIER = "[list]"
 
 
 def is_step_dependent_on_other(step_idx, depend_on_idx, decomposition_list):
-
-    def all_dependent_steps(steps, idx):
-        step = steps[idx - 1]
-        dependent_indices = extract_references(step)
-        if not dependent_indices:
-            return dependent_indices
-        else:
-            for ref in dependent_indices:
-                dependent_indices += all_dependent_steps(steps, ref)
-            return remove_duplicates_from_list(dependent_indices)
-
-    return depend_on_idx in all_dependent_steps(decomposition_list, step_idx)
+    from decomposition_utils import is_step_dependent_on_other
+    return is_step_dependent_on_other(step_idx, depend_on_idx, decomposition_list)
 
 
 def steps_are_column_attributes(decomposition_list, target_steps_indices):
     """given two decomposition steps, we regard them as column attributed if they all refer to one of the input steps
     or if all refer to the same previous step."""
-
-    def all_steps_refer_to_target(target_step_idx, other_steps):
-        for other in other_steps:
-            if target_step_idx not in step_to_references_map[other]:
-                return False
-        return True
-
-    def all_steps_depend_on_target(target_step_idx, other_steps):
-        for other in other_steps:
-            if not is_step_dependent_on_other(other, target_step_idx, decomposition_list):
-                return False
-        return True
-
-    step_to_references_map = {}
-    for index in target_steps_indices:
-        step_to_references_map[index] = extract_references(decomposition_list[index - 1])
-    for index in range(1, len(decomposition_list) + 1):
-        # check if all target steps refer to one single step (potentially one of them)
-        steps_excluding_idx = [x for x in target_steps_indices if x != index]
-        if all_steps_refer_to_target(index, steps_excluding_idx) or \
-                all_steps_depend_on_target(index, steps_excluding_idx):
-            return True
-    return False
+    from decomposition_utils import steps_are_column_attributes
+    return steps_are_column_attributes(decomposition_list, target_steps_indices)
 
 
 def remove_list_step_identifier(qdmr_step):
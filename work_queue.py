@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Shared work queue for distributed MoNaCo evaluation runs.
+
+Instead of hand-splitting a run with --start_question/--max_questions, any number
+of workers (e.g. the tasks of a SLURM array job) point at the same SQLite queue on
+a shared filesystem and claim small chunks of questions until none are left:
+- the first worker to arrive splits the question list into chunks
+- a claimed chunk is leased; a background heartbeat renews the lease while the
+  worker is alive, and chunks whose lease expired (dead or killed workers) are
+  handed to the next worker that asks
+- once the queue is drained, idle workers can optionally steal long-running
+  chunks from stragglers (duplicate results are dropped at merge time)
+- each finished chunk is written to its own result file, and the worker that
+  completes the last chunk merges them into the final output
+
+Usage:
+    python work_queue.py status --queue results/queue.sqlite
+    python work_queue.py merge --queue results/queue.sqlite --output merged.json
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils import load_json, write_to_json_atomic
+
+CHUNK_PENDING = "pending"
+CHUNK_LEASED = "leased"
+CHUNK_DONE = "done"
+
+
+def default_worker_id() -> str:
+    """Identify this worker by host, SLURM array task (if any) and process id."""
+    task = os.environ.get("SLURM_ARRAY_TASK_ID")
+    host = socket.gethostname()
+    return f"{host}:task{task}:{os.getpid()}" if task is not None else f"{host}:{os.getpid()}"
+
+
+class WorkQueue:
+    """SQLite-backed queue of question chunks with leases.
+
+    Every state change runs in a BEGIN IMMEDIATE transaction, so concurrent workers
+    on different nodes serialize on the database lock. The rollback journal (not
+    WAL) is used because WAL needs shared memory, which network filesystems lack.
+    """
+
+    def __init__(self, queue_file: str, lease_seconds: float = 900.0, max_attempts: int = 3,
+                 steal_after: Optional[float] = None):
+        self.queue_file = queue_file
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.steal_after = steal_after
+        self.chunk_dir = f"{queue_file}.chunks"
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "chunk_id INTEGER PRIMARY KEY, questions TEXT, status TEXT, worker TEXT, "
+                "leased_at REAL, lease_expires REAL, attempts INTEGER DEFAULT 0, result_file TEXT)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.queue_file, timeout=120, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=DELETE")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def initialize(self, questions: List[str], chunk_size: int) -> bool:
+        """Split questions into chunks unless another worker already did; True if this call did."""
+        chunk_size = max(1, chunk_size)
+        with self._transaction() as conn:
+            if conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0] > 0:
+                return False
+            conn.executemany(
+                "INSERT INTO chunks (chunk_id, questions, status) VALUES (?, ?, ?)",
+                [(i // chunk_size, json.dumps(questions[i:i + chunk_size], ensure_ascii=False), CHUNK_PENDING)
+                 for i in range(0, len(questions), chunk_size)]
+            )
+            return True
+
+    def claim(self, worker_id: str) -> Optional[Tuple[int, List[str]]]:
+        """Lease the next pending (or expired) chunk; with steal_after set, steal a straggler's chunk."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT chunk_id, questions FROM chunks WHERE attempts < ? AND "
+                "(status = ? OR (status = ? AND lease_expires < ?)) ORDER BY chunk_id LIMIT 1",
+                (self.max_attempts, CHUNK_PENDING, CHUNK_LEASED, now)
+            ).fetchone()
+            if row is None and self.steal_after is not None:
+                row = conn.execute(
+                    "SELECT chunk_id, questions FROM chunks WHERE status = ? AND worker != ? AND "
+                    "attempts < ? AND leased_at < ? ORDER BY leased_at LIMIT 1",
+                    (CHUNK_LEASED, worker_id, self.max_attempts, now - self.steal_after)
+                ).fetchone()
+            if row is None:
+                return None
+            chunk_id, questions = row
+            conn.execute(
+                "UPDATE chunks SET status = ?, worker = ?, leased_at = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE chunk_id = ?",
+                (CHUNK_LEASED, worker_id, now, now + self.lease_seconds, chunk_id)
+            )
+        return chunk_id, json.loads(questions)
+
+    def renew(self, chunk_id: int, worker_id: str) -> bool:
+        """Extend this worker's lease on a chunk; False if the chunk is no longer ours."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE chunks SET lease_expires = ? WHERE chunk_id = ? AND worker = ? AND status = ?",
+                (time.time() + self.lease_seconds, chunk_id, worker_id, CHUNK_LEASED)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, chunk_id: int, worker_id: str, result_file: str) -> bool:
+        """Mark a chunk done; False if another worker already finished it first."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE chunks SET status = ?, worker = ?, result_file = ? WHERE chunk_id = ? AND status != ?",
+                (CHUNK_DONE, worker_id, result_file, chunk_id, CHUNK_DONE)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, chunk_id: int, worker_id: str):
+        """Hand a chunk back (e.g. after an error) so another worker can retry it."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE chunks SET status = ?, worker = NULL, lease_expires = NULL "
+                "WHERE chunk_id = ? AND worker = ? AND status = ?",
+                (CHUNK_PENDING, chunk_id, worker_id, CHUNK_LEASED)
+            )
+
+    @contextmanager
+    def heartbeat(self, chunk_id: int, worker_id: str) -> Iterator[None]:
+        """Renew the lease on chunk_id in the background while the block runs."""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.lease_seconds / 3):
+                try:
+                    if not self.renew(chunk_id, worker_id):
+                        logging.warning(f"Lease on chunk {chunk_id} was taken over by another worker")
+                        return
+                except sqlite3.Error as e:
+                    logging.warning(f"Could not renew lease on chunk {chunk_id}: {e}")
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def chunk_result_file(self, chunk_id: int) -> str:
+        return os.path.join(self.chunk_dir, f"chunk_{chunk_id:05d}.json")
+
+    def counts(self) -> Dict[str, int]:
+        """Number of chunks per status."""
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM chunks GROUP BY status").fetchall()
+        counts = {CHUNK_PENDING: 0, CHUNK_LEASED: 0, CHUNK_DONE: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def outstanding(self) -> int:
+        """Chunks that are not done and are still being worked on or can be retried."""
+        return self._count_unfinished(self._connection())
+
+    def _count_unfinished(self, conn: sqlite3.Connection) -> int:
+        # A chunk on its last attempt still counts while its lease is live
+        return conn.execute(
+            "SELECT COUNT(*) FROM chunks WHERE status != ? AND (attempts < ? OR (status = ? AND lease_expires >= ?))",
+            (CHUNK_DONE, self.max_attempts, CHUNK_LEASED, time.time())
+        ).fetchone()[0]
+
+    def result_files(self) -> List[str]:
+        """Result files of finished chunks, in chunk order."""
+        rows = self._connection().execute(
+            "SELECT result_file FROM chunks WHERE status = ? ORDER BY chunk_id", (CHUNK_DONE,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def failed_chunks(self) -> List[Dict[str, Any]]:
+        """Chunks that used up max_attempts without finishing, with their questions."""
+        rows = self._connection().execute(
+            "SELECT chunk_id, questions, attempts FROM chunks WHERE status != ? AND attempts >= ? "
+            "AND NOT (status = ? AND lease_expires >= ?) ORDER BY chunk_id",
+            (CHUNK_DONE, self.max_attempts, CHUNK_LEASED, time.time())
+        ).fetchall()
+        return [{"chunk_id": chunk_id, "attempts": attempts, "questions": json.loads(questions)}
+                for chunk_id, questions, attempts in rows]
+
+    def workers(self) -> List[str]:
+        rows = self._connection().execute(
+            "SELECT DISTINCT worker FROM chunks WHERE status = ? ORDER BY worker", (CHUNK_DONE,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def try_claim_merge(self, worker_id: str) -> bool:
+        """True for exactly one worker, once every chunk is done or out of attempts."""
+        with self._transaction() as conn:
+            if conn.execute("SELECT value FROM meta WHERE key = 'merged_by'").fetchone() is not None:
+                return False
+            if self._count_unfinished(conn):
+                return False
+            conn.execute("INSERT INTO meta (key, value) VALUES ('merged_by', ?)", (worker_id,))
+            return True
+
+
+def run_worker_loop(work_queue: WorkQueue, worker_id: str, process_chunk, poll_interval: float = 30.0,
+                    logger=None) -> int:
+    """Claim and process chunks until none are left; return the number of chunks this worker completed.
+
+    process_chunk(questions) returns the chunk's result dicts. While other workers
+    still hold leases, this worker polls so it can pick up chunks from workers that die.
+    """
+    logger = logger or logging.getLogger(__name__)
+    completed = 0
+    while True:
+        claim = work_queue.claim(worker_id)
+        if claim is None:
+            if work_queue.outstanding() == 0:
+                return completed
+            time.sleep(poll_interval)
+            continue
+        chunk_id, questions = claim
+        logger.info(f"📦 Worker {worker_id} claimed chunk {chunk_id} ({len(questions)} questions)")
+        try:
+            with work_queue.heartbeat(chunk_id, worker_id):
+                chunk_results = process_chunk(questions)
+        except Exception as e:
+            logger.error(f"Error processing chunk {chunk_id}: {e}")
+            work_queue.release(chunk_id, worker_id)
+            continue
+        result_file = work_queue.chunk_result_file(chunk_id)
+        write_to_json_atomic({"chunk_id": chunk_id, "worker": worker_id, "results": chunk_results}, result_file)
+        if work_queue.complete(chunk_id, worker_id, result_file):
+            completed += 1
+        else:
+            logger.info(f"Chunk {chunk_id} was already finished by another worker")
+
+
+def merge_chunk_results(result_files: List[str], output_file: str, metadata: Optional[Dict[str, Any]] = None,
+                        failed_chunks: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Merge chunk result files into one output, keeping the first result for each question.
+
+    failed_chunks (WorkQueue.failed_chunks()) are logged and recorded in the metadata,
+    so questions of chunks that ran out of attempts are not silently missing.
+    """
+    failed_chunks = failed_chunks or []
+    for chunk in failed_chunks:
+        logging.error(f"Chunk {chunk['chunk_id']} failed after {chunk['attempts']} attempts, "
+                      f"its {len(chunk['questions'])} questions are missing from {output_file}: {chunk['questions']}")
+    results = []
+    seen = set()
+    duplicates = 0
+    for result_file in result_files:
+        for result in load_json(result_file)["results"]:
+            if result["question"] in seen:
+                duplicates += 1
+                continue
+            seen.add(result["question"])
+            results.append(result)
+
+    total_score = sum(result["evaluation"]["scores"]["judge_score"] for result in results)
+    merged_metadata = dict(metadata or {})
+    merged_metadata.update({
+        "processed_questions": len(results),
+        "average_judge_score": total_score / len(results) if results else 0.0,
+        "merged_chunks": len(result_files),
+        "duplicate_results_dropped": duplicates,
+        "failed_chunks": failed_chunks,
+        "failed_questions": sum(len(chunk["questions"]) for chunk in failed_chunks)
+    })
+    output_data = {"metadata": merged_metadata, "results": results}
+    write_to_json_atomic(output_data, output_file)
+    return output_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or merge a distributed MoNaCo work queue")
+    parser.add_argument("command", choices=["status", "merge"])
+    parser.add_argument("--queue", required=True, help="SQLite work queue file")
+    parser.add_argument("--output", default="merged_oracle_results.json", help="Merged output file (merge)")
+    args = parser.parse_args()
+
+    work_queue = WorkQueue(args.queue)
+    counts = work_queue.counts()
+    failed_chunks = work_queue.failed_chunks()
+    print(f"📊 Chunks: {counts[CHUNK_DONE]} done, {counts[CHUNK_LEASED]} leased, {counts[CHUNK_PENDING]} pending "
+          f"({len(failed_chunks)} out of attempts)")
+    if args.command == "merge":
+        output_data = merge_chunk_results(work_queue.result_files(), args.output,
+                                          {"workers": work_queue.workers()}, failed_chunks)
+        print(f"✅ Merged {output_data['metadata']['processed_questions']} results into {args.output}")
+        if failed_chunks:
+            print(f"⚠️  {output_data['metadata']['failed_questions']} questions of {len(failed_chunks)} failed chunks "
+                  f"are missing (see failed_chunks in the metadata)")
+
+
+if __name__ == "__main__":
+    main()